@@ -1,9 +1,48 @@
-from .tools import task_tools
-from .llm import init_llm
-from .agent import get_agent
+"""
+LangGraph task agent.
+
+The LangChain/LangGraph/Gemini stack takes seconds to import, so the public
+names below are resolved on first access (PEP 562) instead of at import
+time: importing ``ai_agent.*`` submodules such as ``ai_agent.contracts``
+stays cheap and REST-only processes never load the AI stack.
+"""
+
+import importlib
+
+from django.conf import settings
+
+_LAZY_ATTRIBUTES = {
+    'task_tools': 'ai_agent.tools',
+    'init_llm': 'ai_agent.llm',
+    'get_agent': 'ai_agent.agent',
+}
 
 __all__ = [
     'task_tools',
     'init_llm',
-    'get_agent'
+    'get_agent',
+    'preload',
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def preload():
+    """
+    Import the AI stack now, e.g. in a pre-forking server's master process
+    so that workers share the imported modules. Creates no clients or
+    threads, which would not survive the fork.
+    """
+    for module_name in ('ai_agent.tools', 'ai_agent.llm', 'ai_agent.agent', 'ai_agent.chat_service'):
+        importlib.import_module(module_name)
+    if getattr(settings, 'AI_LLM_MODELS', ''):
+        importlib.import_module('ai_agent.llm_router')
+    if getattr(settings, 'AI_LLM_BACKEND', 'gemini') != 'stub':
+        importlib.import_module('langchain_google_genai')
@@ -2,15 +2,24 @@
 Chat service module for handling AI agent interactions.
 """
 
-import json
 import logging
+import queue
+import threading
+import time
+from contextlib import nullcontext
 from uuid import uuid4
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from django.db import connections
 
 from langchain_core.messages import ToolMessage, AIMessage
 from langgraph.checkpoint.memory import InMemorySaver
 
 from ai_agent import get_agent
+from ai_agent.run_context import RunContext
+from ai_agent.tracing import AgentTrace, ProfileThreads, recording, save_trace, tracing_enabled
+from task_manager import db_router, profiling
+from task_manager.log import bind_request_id, get_request_id, log_payload
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,13 +35,15 @@ class ChatService:
         self.checkpointer = InMemorySaver()
         self.agent = get_agent(self.checkpointer)
 
-    def process_chat(self, user_input: str, user_id: int) -> Dict[str, Any]:
+    def process_chat(self, user_input: str, user_id: int, trace: Optional[AgentTrace] = None) -> Dict[str, Any]:
         """
         Process chat input and return agent response.
 
         Args:
             user_input: The user's message
             user_id: The ID of the user
+            trace: Record the run into this trace (not stored); by default
+                runs are recorded and stored when AI_TRACE_ENABLED is set
 
         Returns:
             Dictionary containing processed tool messages
@@ -44,29 +55,124 @@ class ChatService:
         if not user_input or not user_input.strip():
             raise ValueError("Message cannot be empty")
 
+        # Outside a request (management commands, scripts) start a new id
+        request_id = get_request_id() or uuid4().hex
+        run = RunContext()
         config = {
             "configurable": {
                 "created_by": user_id,
-                "thread_id": str(uuid4())
+                "thread_id": str(uuid4()),
+                "request_id": request_id,
+                # Collapses repeated writes and memoizes reads of this run
+                "run": run,
             }
         }
 
-        logger.info(f"Processing chat for user {user_id}")
+        store_trace = trace is None and tracing_enabled()
+        if store_trace:
+            trace = AgentTrace(request_id, user_id, user_input)
+        if trace is not None:
+            config["callbacks"] = [trace]
+        profile = profiling.current_session()
+        if profile is not None:
+            # Follows the run into the graph's and the tools' threads
+            config["callbacks"] = config.get("callbacks", []) + [ProfileThreads(profile)]
 
-        try:
-            response = self.agent.invoke(
-                {"messages": [{"role": "user", "content": user_input}]},
-                config
-            )
+        with bind_request_id(request_id), (recording(trace) if trace is not None else nullcontext()):
+            logger.info("Processing chat for user %s", user_id)
 
-            tool_messages = self._extract_tool_messages(response["messages"])
-            logger.info(f"Successfully processed chat for user {user_id}")
+            try:
+                response = self.agent.invoke(
+                    {"messages": [{"role": "user", "content": user_input}]},
+                    config
+                )
+
+                tool_messages = self._extract_tool_messages(response["messages"])
+                logger.info("Successfully processed chat for user %s", user_id)
+                if run.read_counts["run_hits"] or run.read_counts["shared_hits"]:
+                    logger.info("Read tool cache for user %s: %s", user_id, run.read_counts)
+
+                if store_trace:
+                    save_trace(trace)
+                return {"data": tool_messages}
+
+            except Exception as e:
+                logger.error("Error processing chat for user %s: %s", user_id, e)
+                if store_trace:
+                    save_trace(trace, error=e)
+                raise
+
+    def process_batch(self, items: List[Tuple[str, int]], max_workers: int = 4,
+                      request_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Process several chat messages concurrently with this service's agent.
 
-            return {"data": tool_messages}
+        ``max_workers`` threads take messages in order; each thread keeps
+        one database connection for all the messages it handles and closes
+        it when the batch is done. Closing the iterator early stops handing
+        out messages (the ones in progress still finish).
 
-        except Exception as e:
-            logger.error(f"Error processing chat for user {user_id}: {str(e)}")
-            raise
+        Args:
+            items: (user_input, user_id) pairs
+            max_workers: Maximum number of messages processed at once
+            request_id: Id of the batch; message ``i`` is logged as
+                ``<request_id>.<i>``
+
+        Yields:
+            One result per message as it finishes, with its ``index`` in
+            ``items``, the ``duration_ms`` and either the ``data`` of
+            ``process_chat`` or an ``error``
+        """
+        pending = queue.SimpleQueue()
+        for index, item in enumerate(items):
+            pending.put((index, item))
+        results = queue.SimpleQueue()
+        stopped = threading.Event()
+        request_id = request_id or get_request_id() or uuid4().hex
+        profile = profiling.current_session()
+
+        def worker():
+            try:
+                while not stopped.is_set():
+                    try:
+                        index, (user_input, user_id) = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    start = time.perf_counter()
+                    result = {"index": index}
+                    # Every message is routed and logged like its own request
+                    routing = db_router.start_request()
+                    try:
+                        with bind_request_id(f"{request_id}.{index}"), profiling.track_thread(profile):
+                            result["data"] = self.process_chat(user_input, user_id)["data"]
+                    except ValueError as e:
+                        result["error"] = str(e)
+                    except Exception:
+                        result["error"] = "An unexpected error occurred while processing this message"
+                    finally:
+                        db_router.end_request(routing)
+                    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                    results.put(result)
+            finally:
+                connections.close_all()
+                results.put(None)
+
+        workers = [
+            threading.Thread(target=worker, name=f"chat-batch-{number}", daemon=True)
+            for number in range(max(1, min(max_workers, len(items))))
+        ]
+        for thread in workers:
+            thread.start()
+        running = len(workers)
+        try:
+            while running:
+                result = results.get()
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+        finally:
+            stopped.set()
 
     def _extract_tool_messages(self, messages: List[Any]) -> List[Dict[str, Any]]:
         """
@@ -82,22 +188,21 @@ class ChatService:
 
         for msg in messages:
             if isinstance(msg, ToolMessage):
-                content = self._parse_content(msg.content)
-                logger.debug(f"ToolMessage: {content}")
-                if content is not None:
-                    tool_messages.append({
-                        "content": content,
-                        "name": msg.name,
-                        "status": getattr(msg, "status", None),
-                        "tool_call_id": getattr(msg, "tool_call_id", None),
-                    })
+                content = self._tool_content(msg)
+                log_payload(logger, "ToolMessage", content)
+                tool_messages.append({
+                    "content": content,
+                    "name": msg.name,
+                    "status": getattr(msg, "status", None),
+                    "tool_call_id": getattr(msg, "tool_call_id", None),
+                })
 
         # Fallback to AIMessage if no tool messages were found
         if not tool_messages:
             # last AIMessage is usually the most relevant
             for msg in reversed(messages):
                 if isinstance(msg, AIMessage):
-                    logger.debug(f"Fallback AIMessage: {msg.content}")
+                    log_payload(logger, "Fallback AIMessage", msg.content)
                     tool_messages.append({
                         "content": msg.content,
                         "name": "AI",  # or msg.name if available
@@ -108,22 +213,20 @@ class ChatService:
         return tool_messages
 
     @staticmethod
-    def _parse_content(content: Any) -> Any:
+    def _tool_content(msg: ToolMessage) -> Any:
         """
-        Parse content, attempting JSON deserialization if it's a string.
+        Content of a tool message for the response.
 
         Args:
-            content: Content to parse
+            msg: Tool message from the agent run
 
         Returns:
-            Parsed content (JSON object if valid JSON string, otherwise original content)
+            The tool's structured result (its artifact) when it has one,
+            otherwise the message text, e.g. a tool error
         """
-        if isinstance(content, str):
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                return None
-        return None
+        if msg.artifact is not None:
+            return msg.artifact
+        return msg.content
 
 
 class ChatServiceFactory:
@@ -0,0 +1,243 @@
+"""
+Performance contracts for the agent tools.
+
+Each tool in ``ai_agent.tools`` declares its budget next to its definition:
+
+    @performance_contract(max_queries=1, max_rows=20, p95_ms=10,
+                          sample=lambda ref: {'limit': 5})
+    @tool
+    def get_tasks(...): ...
+
+* ``max_queries`` - SQL statements per call
+* ``max_rows`` - rows fetched from the database per call
+* ``p95_ms`` - 95th percentile latency per call
+* ``sample`` - builds the call's arguments from a ``ReferenceData``
+
+Budgets hold at the reference dataset size (``REFERENCE_TASKS_PER_USER``
+tasks per user). ``check_contracts`` measures every tool against its
+contract; ``python manage.py check_tool_contracts`` runs it on a seeded
+test database and compares the results with an earlier report.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils import timezone
+
+from benchmarks.utils import percentile
+
+REFERENCE_TASKS_PER_USER = 1000
+
+CONTRACTS: Dict[str, 'ToolContract'] = {}
+
+_TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+
+class ToolContract:
+    """Budget of one tool at the reference dataset size."""
+
+    __slots__ = ('tool', 'max_queries', 'max_rows', 'p95_ms', 'sample')
+
+    def __init__(self, tool, max_queries: int, max_rows: int, p95_ms: float,
+                 sample: Callable[['ReferenceData'], Dict[str, Any]]):
+        self.tool = tool
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+        self.p95_ms = p95_ms
+        self.sample = sample
+
+    @property
+    def name(self) -> str:
+        return self.tool.name
+
+
+def performance_contract(max_queries: int, max_rows: int, p95_ms: float,
+                         sample: Callable[['ReferenceData'], Dict[str, Any]]):
+    """Register the decorated tool's performance contract."""
+    def register(tool):
+        CONTRACTS[tool.name] = ToolContract(tool, max_queries, max_rows, p95_ms, sample)
+        return tool
+    return register
+
+
+class QueryMeter:
+    """
+    Count the SQL statements executed and the rows fetched inside a block.
+
+    Rows are counted at the DB-API cursor, so ``values()``, raw cursors and
+    model instances are all included. Transaction control statements are
+    not counted: whether a write opens a transaction or a savepoint depends
+    on the caller.
+    """
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.queries = 0
+        self.rows = 0
+        self.statements: List[str] = []
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self._execute)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def _execute(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith(_TRANSACTION_CONTROL):
+            return execute(sql, params, many, context)
+        self.queries += 1
+        self.statements.append(sql)
+        cursor = context['cursor']
+        raw = cursor.cursor
+        # Instance attributes win over CursorWrapper.__getattr__
+        cursor.fetchone = self._counting(raw.fetchone, single=True)
+        cursor.fetchmany = self._counting(raw.fetchmany)
+        cursor.fetchall = self._counting(raw.fetchall)
+        return execute(sql, params, many, context)
+
+    def _counting(self, fetch, single=False):
+        def counted(*args, **kwargs):
+            result = fetch(*args, **kwargs)
+            if single:
+                self.rows += result is not None
+            else:
+                self.rows += len(result)
+            return result
+        return counted
+
+
+class ReferenceData:
+    """
+    The seeded dataset contracts are measured against.
+
+    Attributes:
+        user_id: Reference user (owns ``tasks_per_user`` tasks)
+        other_username: Another user to assign tasks to
+        task_id: One of the reference user's tasks
+        title: The unique title of ``task_id``
+    """
+
+    TITLE = 'Contract reference task'
+
+    def __init__(self, tasks_per_user: int = REFERENCE_TASKS_PER_USER):
+        from django.contrib.auth.models import User
+        from tasks_app.archive import archive_done_tasks
+        from tasks_app.due import scan
+        from tasks_app.models import Task
+        from tasks_app.seeding import seed
+
+        seed(users=2, tasks_per_user=tasks_per_user, skew=0, username_prefix='contract_user', seed_value=0)
+        users = list(User.objects.filter(username__startswith='contract_user').order_by('username'))
+        self.user_id = users[0].id
+        self.other_username = users[1].username
+        self.tasks_per_user = tasks_per_user
+        task = Task.objects.create(
+            title=self.TITLE, description='Reference task for the tool contracts', created_by=users[0])
+        self.task_id = task.id
+        self.title = task.title
+        # Digests and the archive as the periodic jobs leave them
+        scan(full=True)
+        archive_done_tasks(days=0)
+
+    def disposable_task_id(self) -> int:
+        """Create a task the caller may delete."""
+        from tasks_app.models import Task
+
+        return Task.objects.create(
+            title=f'Disposable task {time.monotonic_ns()}', description='Deleted by the contract check',
+            created_by_id=self.user_id).id
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return {'configurable': {'created_by': self.user_id}}
+
+
+def check_contracts(reference: ReferenceData, iterations: int = 30, warmup: int = 1,
+                    names: Optional[List[str]] = None, latency_factor: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Call every tool ``warmup + iterations`` times and measure it.
+
+    Queries and rows are the maximum over the measured calls; warm-up calls
+    fill the per-process caches (title index, token cache) like a running
+    server has them.
+
+    Args:
+        reference: Seeded dataset to call the tools against
+        iterations: Measured calls per tool
+        warmup: Unmeasured calls per tool
+        names: Only check these tools
+        latency_factor: Multiplier for the p95 budgets (slow CI machines);
+            0 skips the latency check
+
+    Returns:
+        One result per tool with the measured values, the budget and the
+        list of ``violations``
+    """
+    import ai_agent.tools  # noqa: F401  (registers the contracts)
+
+    results = []
+    for name, contract in sorted(CONTRACTS.items()):
+        if names and name not in names:
+            continue
+        latencies, max_queries, max_rows, errors = [], 0, 0, []
+        for iteration in range(warmup + iterations):
+            args = contract.sample(reference)
+            with QueryMeter() as meter:
+                start = time.perf_counter()
+                try:
+                    contract.tool.invoke(args, config=reference.config)
+                except Exception as e:
+                    errors.append(str(e))
+                elapsed = time.perf_counter() - start
+            if iteration < warmup:
+                continue
+            latencies.append(elapsed)
+            max_queries = max(max_queries, meter.queries)
+            max_rows = max(max_rows, meter.rows)
+
+        p95_ms = round(percentile(latencies, 95) * 1000, 3)
+        violations = []
+        if errors:
+            violations.append(f"{len(errors)} calls failed: {errors[0]}")
+        if max_queries > contract.max_queries:
+            violations.append(f"{max_queries} queries > {contract.max_queries}")
+        if max_rows > contract.max_rows:
+            violations.append(f"{max_rows} rows > {contract.max_rows}")
+        if latency_factor and p95_ms > contract.p95_ms * latency_factor:
+            violations.append(f"p95 {p95_ms}ms > {contract.p95_ms * latency_factor:g}ms")
+        results.append({
+            'tool': name,
+            'queries': max_queries,
+            'rows': max_rows,
+            'p95_ms': p95_ms,
+            'budget': {'queries': contract.max_queries, 'rows': contract.max_rows, 'p95_ms': contract.p95_ms},
+            'violations': violations,
+        })
+    return results
+
+
+def compare_results(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]],
+                    threshold: float = 0.2) -> List[str]:
+    """
+    Regressions against an earlier run: any increase in queries or rows,
+    or a p95 latency more than ``threshold`` (a fraction) higher.
+    """
+    before = {result['tool']: result for result in baseline}
+    regressions = []
+    for result in current:
+        old = before.get(result['tool'])
+        if old is None:
+            continue
+        for metric in ('queries', 'rows'):
+            if result[metric] > old[metric]:
+                regressions.append(f"{result['tool']}: {metric} {old[metric]} -> {result[metric]}")
+        if old['p95_ms'] and (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] > threshold:
+            regressions.append(f"{result['tool']}: p95 {old['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+
+def report_metadata() -> Dict[str, Any]:
+    return {'time': timezone.now().isoformat(), 'vendor': connection.vendor}
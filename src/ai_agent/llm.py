@@ -1,15 +1,56 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-
 from django.conf import settings
 
 GOOGLE_API_KEY = settings.GOOGLE_API_KEY
 GOOGLE_AI_MODEL = settings.GOOGLE_AI_MODEL
 
+BACKENDS = ('gemini', 'stub')
+
+
+def create_model(backend: str, model: str, max_retries: int = 2, **options):
+    """
+    Chat model of a backend.
+
+    Args:
+        backend: ``gemini`` or ``stub``
+        model: Model name (for the stub only a label)
+        max_retries: Retries of a failed request (Gemini)
+        **options: ``temperature`` (Gemini); ``latency``, ``tail_latency``,
+            ``tail_ratio`` and ``failure_ratio`` (stub)
+
+    Raises:
+        ValueError: For an unknown backend or option
+    """
+    if backend == 'stub':
+        from ai_agent.stub_llm import StubChatModel
+
+        allowed = {'latency', 'tail_latency', 'tail_ratio', 'failure_ratio'}
+        if set(options) - allowed:
+            raise ValueError(f"Unknown stub model options: {', '.join(sorted(set(options) - allowed))}")
+        return StubChatModel(**options)
+
+    if backend == 'gemini':
+        # The Gemini SDK alone takes a noticeable part of the AI stack's import time
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        if set(options) - {'temperature'}:
+            raise ValueError(f"Unknown Gemini model options: {', '.join(sorted(set(options) - {'temperature'}))}")
+        return ChatGoogleGenerativeAI(
+            model=model,
+            api_key=settings.GOOGLE_API_KEY,
+            temperature=options.get('temperature', 0.0),
+            max_retries=max_retries
+        )
+
+    raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
 
 def init_llm():
-    return ChatGoogleGenerativeAI(
-        model=settings.GOOGLE_AI_MODEL,
-        api_key=settings.GOOGLE_API_KEY,
-        temperature=0.0,
-        max_retries=2
-    )
+    # Several models: route between them (ai_agent/llm_router.py)
+    if getattr(settings, 'AI_LLM_MODELS', ''):
+        from ai_agent.llm_router import build_router
+
+        return build_router(settings.AI_LLM_MODELS)
+
+    if getattr(settings, 'AI_LLM_BACKEND', 'gemini') == 'stub':
+        return create_model('stub', 'stub', latency=settings.AI_STUB_LLM_LATENCY)
+    return create_model('gemini', settings.GOOGLE_AI_MODEL)
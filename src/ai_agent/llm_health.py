@@ -0,0 +1,140 @@
+"""
+Per-model health of the LLM router: recent latencies, counters and a
+circuit breaker.
+
+Kept per process and shared by every agent the process builds. No AI stack
+imports: the health endpoint reads this module.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+# Latencies kept per model for the percentiles
+WINDOW = 200
+# Latencies needed before a model's percentiles are trusted
+MIN_SAMPLES = 10
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class ModelHealth:
+    """
+    Health of one model. Thread-safe.
+
+    The breaker opens after ``AI_LLM_BREAKER_FAILURES`` consecutive failures
+    and rejects requests for ``AI_LLM_BREAKER_COOLDOWN`` seconds; then one
+    probe request is let through, which closes it again on success.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.state = 'closed'
+        self._open_until = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether a request would be let through now (takes nothing)."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            return time.monotonic() >= self._open_until and not self._probing
+
+    def acquire(self) -> bool:
+        """Let a request through if the breaker allows it (takes the probe)."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() >= self._open_until:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.consecutive_failures = 0
+            self._latencies.append(seconds)
+            self.state, self._probing = 'closed', False
+
+    def record_failure(self):
+        threshold = getattr(settings, 'AI_LLM_BREAKER_FAILURES', 3)
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= threshold:
+                self.state = 'open'
+                self._open_until = time.monotonic() + getattr(settings, 'AI_LLM_BREAKER_COOLDOWN', 30.0)
+            self._probing = False
+
+    def record_hedge(self, won: bool = False):
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile in seconds, None until enough samples."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            return _percentile(sorted(self._latencies), pct)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._latencies)
+            state = self.state
+            if state == 'open' and time.monotonic() >= self._open_until:
+                state = 'half_open'
+            return {
+                'state': state,
+                'requests': self.requests,
+                'failures': self.failures,
+                'consecutive_failures': self.consecutive_failures,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'samples': len(ordered),
+                'p50_ms': round(_percentile(ordered, 50) * 1000, 1) if ordered else None,
+                'p95_ms': round(_percentile(ordered, 95) * 1000, 1) if ordered else None,
+            }
+
+
+_lock = threading.Lock()
+_models: Dict[str, ModelHealth] = {}
+
+
+def model_health(name: str) -> ModelHealth:
+    with _lock:
+        health = _models.get(name)
+        if health is None:
+            health = _models[name] = ModelHealth(name)
+        return health
+
+
+def health_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Health of every model used by this process, by model name."""
+    with _lock:
+        models = list(_models.values())
+    return {health.name: health.snapshot() for health in models}
+
+
+def reset():
+    with _lock:
+        _models.clear()
@@ -0,0 +1,217 @@
+"""
+LLM router: several configured models behind one chat model.
+
+``AI_LLM_MODELS`` lists the models as ``backend:model[?option=value&...]``,
+comma separated, e.g.::
+
+    gemini:gemini-1.5-flash,gemini:gemini-1.5-pro
+    stub:fast?latency=0.05&tail_latency=2&tail_ratio=0.1,stub:backup?latency=0.2
+
+For every request ``RouterChatModel``
+
+* orders the models by recent median latency (models without enough samples
+  keep their configured order after the measured ones, models whose circuit
+  breaker is open come last and are skipped),
+* sends the request to the first model and, when ``AI_LLM_HEDGE`` is set and
+  it has not answered by its p95 latency, to the next one too; the first
+  answer wins and the slower one is left to finish in the background,
+* falls back to the next model when a model fails.
+
+Model health (latency window, breaker, hedge counters) is kept per process
+in ``ai_agent.llm_health``.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from ai_agent.llm_health import model_health
+from task_manager import profiling
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Created on first use: threads do not survive a pre-forking server's fork
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AI_LLM_ROUTER_WORKERS', 32), thread_name_prefix='llm-router')
+        return _executor
+
+
+# Types of the model options of an AI_LLM_MODELS entry; others stay strings
+# and are rejected by create_model
+OPTION_TYPES = {
+    'max_retries': int,
+    'temperature': float,
+    'latency': float,
+    'tail_latency': float,
+    'tail_ratio': float,
+    'failure_ratio': float,
+}
+
+
+def _parse_options(entry: str, query: str) -> Dict[str, Any]:
+    options = {}
+    for name, value in parse_qsl(query):
+        try:
+            options[name] = OPTION_TYPES.get(name, str)(value)
+        except ValueError:
+            raise ImproperlyConfigured(f"Invalid value {value!r} for {name} in AI_LLM_MODELS entry {entry!r}")
+    return options
+
+
+def parse_model_specs(value: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(backend, model, options) for every entry of an AI_LLM_MODELS value."""
+    specs = []
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        spec, _, query = entry.partition('?')
+        backend, separator, model = spec.partition(':')
+        if not separator or not backend or not model:
+            raise ImproperlyConfigured(f"Invalid AI_LLM_MODELS entry {entry!r}, expected backend:model")
+        specs.append((backend, model, _parse_options(entry, query)))
+    return specs
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    Chat model that routes every request to one of several models.
+
+    Args:
+        names: Model names for the health stats, e.g. ``gemini:gemini-1.5-flash``
+        routes: The models, or their tool bindings, in configured order
+        hedge: Send a second request once the first model's p95 has passed
+        hedge_min_ms: Never hedge earlier than this
+    """
+
+    names: List[str]
+    routes: List[Any]
+    hedge: bool = True
+    hedge_min_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'router'
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={'routes': [route.bind_tools(tools, **kwargs) for route in self.routes]})
+
+    def _candidates(self) -> List[Tuple[str, Any]]:
+        ranked = []
+        for index, (name, route) in enumerate(zip(self.names, self.routes)):
+            health = model_health(name)
+            median = health.percentile(50)
+            ranked.append(((not health.available(), median is None, median or 0.0, index), name, route))
+        ranked.sort(key=lambda item: item[0])
+        return [(name, route) for _, name, route in ranked]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        candidates = iter(self._candidates())
+        pending = {}
+        errors = []
+        start = time.monotonic()
+
+        def launch(hedged: bool = False) -> Optional[str]:
+            for name, route in candidates:
+                health = model_health(name)
+                if not health.acquire():
+                    continue
+                if hedged:
+                    health.record_hedge()
+                # Keeps the request id of the log records
+                context = contextvars.copy_context()
+                future = _get_executor().submit(context.run, self._call, name, route, messages, stop, kwargs)
+                pending[future] = (name, hedged)
+                return name
+            return None
+
+        first = launch()
+        if first is None:
+            raise RuntimeError("No LLM model available: every circuit breaker is open")
+        hedge_at = None
+        if self.hedge and len(self.routes) > 1:
+            p95 = model_health(first).percentile(95)
+            if p95 is not None:
+                hedge_at = start + max(p95, self.hedge_min_ms / 1000)
+
+        while pending:
+            timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge_at = None
+                hedged = launch(hedged=True)
+                if hedged:
+                    logger.info("LLM %s slower than its p95, hedging with %s", first, hedged)
+                continue
+            for future in done:
+                name, hedged = pending.pop(future)
+                try:
+                    message = future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                    continue
+                if hedged:
+                    model_health(name).record_hedge(won=True)
+                return ChatResult(generations=[ChatGeneration(message=message)], llm_output={'model': name})
+            if not pending:
+                hedge_at = None
+                fallback = launch()
+                if fallback is None:
+                    break
+                logger.warning("Falling back to LLM %s after: %s", fallback, errors[-1])
+        raise RuntimeError(f"All LLM models failed: {'; '.join(errors)}")
+
+    @staticmethod
+    def _call(name: str, route, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]):
+        health = model_health(name)
+        start = time.perf_counter()
+        try:
+            # Without the caller's callbacks: the router's own run is traced
+            with profiling.track_thread():
+                message = route.invoke(messages, config={'callbacks': []}, stop=stop, **kwargs)
+        except Exception as e:
+            health.record_failure()
+            logger.warning("LLM %s failed: %s", name, e)
+            raise
+        health.record_success(time.perf_counter() - start)
+        return message
+
+
+def build_router(value: str) -> RouterChatModel:
+    """Router over the models of an AI_LLM_MODELS value."""
+    from ai_agent.llm import create_model
+
+    specs = parse_model_specs(value)
+    if not specs:
+        raise ImproperlyConfigured("AI_LLM_MODELS lists no model")
+    return RouterChatModel(
+        names=[f'{backend}:{model}' for backend, model, _ in specs],
+        # Falling back to another model replaces most retries of a model
+        routes=[create_model(backend, model, **{'max_retries': 0, **options}) for backend, model, options in specs],
+        hedge=getattr(settings, 'AI_LLM_HEDGE', True),
+        hedge_min_ms=getattr(settings, 'AI_LLM_HEDGE_MIN_MS', 0.0),
+    )
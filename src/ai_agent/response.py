@@ -0,0 +1,112 @@
+"""
+Assembly of the chat response from the tool messages of an agent run.
+
+``AI_CHAT_RESPONSE_MODE`` picks what is returned:
+
+* ``first`` (default) / ``last`` - that message alone; ``first`` is the
+  body the chat endpoint has always returned
+* ``full`` - ``{"data": [...], "truncated": false}`` with every message
+
+The response is capped at ``AI_CHAT_MAX_RESPONSE_BYTES``: messages that do
+not fit are dropped, the list or text content of the message that crosses
+the cap is cut to fit and marked ``"truncated": true``. Each message is
+encoded once; only the one that is cut is encoded again.
+
+This module has no AI stack imports so that views can use it directly.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+RESPONSE_MODES = ('full', 'first', 'last')
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(',', ':')).encode()
+
+
+def _fit(message: Dict[str, Any], budget: int) -> Optional[bytes]:
+    """``message`` with its content cut to encode in ``budget`` bytes, if possible."""
+    content = message.get('content')
+    shell = {**message, 'content': [] if isinstance(content, list) else '', 'truncated': True}
+    size = len(_dumps(shell))
+    if size > budget:
+        return None
+    if isinstance(content, list):
+        # Keep the leading items: tools return their results best first
+        items = []
+        for item in content:
+            item_size = len(_dumps(item)) + (1 if items else 0)
+            if size + item_size > budget:
+                break
+            items.append(item)
+            size += item_size
+        return _dumps({**shell, 'content': items})
+    if isinstance(content, str):
+        # Escaping can make the encoded text longer than the text itself
+        text = content[:budget - size]
+        while text:
+            encoded = _dumps({**shell, 'content': text})
+            if len(encoded) <= budget:
+                return encoded
+            text = text[:len(text) * 9 // 10]
+        return _dumps(shell)
+    # A single object cannot be cut meaningfully
+    return None
+
+
+def encode_messages(messages: List[Dict[str, Any]], max_bytes: int = 0) -> Tuple[List[bytes], bool]:
+    """
+    Encode tool messages until ``max_bytes`` (0: no cap) is reached.
+
+    Returns:
+        Tuple of the encoded messages and whether anything was cut or dropped
+    """
+    encoded, used = [], 0
+    for message in messages:
+        data = _dumps(message)
+        separator = 1 if encoded else 0
+        if max_bytes and used + separator + len(data) > max_bytes:
+            data = _fit(message, max_bytes - used - separator)
+            if data is not None:
+                encoded.append(data)
+            return encoded, True
+        encoded.append(data)
+        used += separator + len(data)
+    return encoded, False
+
+
+def render_chat_response(messages: List[Dict[str, Any]], mode: Optional[str] = None,
+                         max_bytes: Optional[int] = None) -> Optional[bytes]:
+    """
+    Encode the tool messages of a chat turn as the response body.
+
+    Args:
+        messages: Tool messages from ``ChatService.process_chat``
+        mode: ``full``, ``first`` or ``last`` (default: AI_CHAT_RESPONSE_MODE)
+        max_bytes: Size cap of the body, 0 for none (default:
+            AI_CHAT_MAX_RESPONSE_BYTES)
+
+    Returns:
+        The JSON body, or None when there is no message to return
+    """
+    mode = mode or getattr(settings, 'AI_CHAT_RESPONSE_MODE', 'first')
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'AI_CHAT_MAX_RESPONSE_BYTES', 0)
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"Unknown chat response mode {mode!r}, expected one of {', '.join(RESPONSE_MODES)}")
+    if not messages:
+        return None
+
+    if mode != 'full':
+        message = messages[0] if mode == 'first' else messages[-1]
+        encoded, _ = encode_messages([message], max_bytes)
+        # Not even the message's shell fits: return it without content
+        return encoded[0] if encoded else _dumps({**message, 'content': None, 'truncated': True})
+
+    # Room for the envelope around the messages
+    envelope = len(b'{"data":[],"truncated":false}')
+    encoded, truncated = encode_messages(messages, max(max_bytes - envelope, 1) if max_bytes else 0)
+    return b''.join((b'{"data":[', b','.join(encoded), b'],"truncated":', b'true' if truncated else b'false', b'}'))
@@ -0,0 +1,169 @@
+"""
+State shared by the tool calls of one agent run.
+
+``ChatService`` puts a ``RunContext`` in ``configurable['run']``; the tools
+find it in their ``config``. With a run context
+
+* write tools called again with the same arguments are applied once
+  (``collapse_repeated_writes``),
+* read tools are memoized (``memoize_read``): per run, and across the
+  user's runs in the shared cache when ``AI_TOOL_CACHE_ACROSS_RUNS`` is set.
+  Entries are keyed by the arguments and the user's task data version,
+  which the Task signal receivers bump, and a write tool of the run drops
+  the run's entries.
+
+Tools invoked without one (management commands, contract checks) behave
+as before. No AI stack imports: the cache stats endpoint reads this module.
+"""
+
+import json
+import logging
+import threading
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tasks_app.cache import cache_timeout, user_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class ToolCacheStats:
+    """Process-wide read tool cache counters per tool. Thread-safe."""
+
+    TIERS = ('run_hits', 'shared_hits', 'misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.TIERS, 0))
+
+    def record(self, tool_name: str, tier: str):
+        with self._lock:
+            self._counts[tool_name][tier] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters and ``hit_ratio`` per tool, plus ``total``."""
+        with self._lock:
+            counts = {name: dict(tiers) for name, tiers in self._counts.items()}
+        counts['total'] = {tier: sum(tiers[tier] for tiers in counts.values()) for tier in self.TIERS}
+        for tiers in counts.values():
+            calls = sum(tiers.values())
+            tiers['hit_ratio'] = round((tiers['run_hits'] + tiers['shared_hits']) / calls, 4) if calls else None
+        return counts
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+tool_cache_stats = ToolCacheStats()
+
+
+class RunContext:
+    """Per-run memory of the write and read tool calls. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writes: Dict[str, Any] = {}
+        self._reads: Dict[str, Any] = {}
+        self.collapsed_writes = 0
+        self.read_counts = dict.fromkeys(ToolCacheStats.TIERS, 0)
+
+    def write_once(self, key: str, write: Callable[[], Any]) -> Any:
+        """
+        Run ``write`` unless the same write already succeeded in this run
+        with no other write in between; then return its result again.
+
+        Write tools of a run are applied one at a time, so parallel
+        identical calls are collapsed too.
+        """
+        with self._lock:
+            if key in self._writes:
+                self.collapsed_writes += 1
+                logger.info("Collapsed repeated write tool call %s", key.partition(':')[0])
+                return self._writes[key]
+            result = write()
+            # Another write may have changed what an earlier result describes
+            self._writes = {key: result}
+            self._reads.clear()
+            return result
+
+    def cached_read(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if key in self._reads:
+                return True, self._reads[key]
+            return False, None
+
+    def store_read(self, key: str, result: Any):
+        with self._lock:
+            self._reads[key] = result
+
+    def count_read(self, tool_name: str, tier: str):
+        with self._lock:
+            self.read_counts[tier] += 1
+        tool_cache_stats.record(tool_name, tier)
+
+def get_run_context(config: Optional[Dict[str, Any]]) -> Optional[RunContext]:
+    return ((config or {}).get('configurable') or {}).get('run')
+
+
+def collapse_repeated_writes(func):
+    """
+    Apply identical calls of a write tool once per run, e.g. an LLM that
+    retries ``create_task`` after it already succeeded.
+
+    Goes between ``@tool`` and the function; the tool's signature is kept.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        run = get_run_context(kwargs.get('config'))
+        if run is None:
+            return func(*args, **kwargs)
+        arguments = {name: value for name, value in kwargs.items() if name != 'config'}
+        key = f"{func.__name__}:{json.dumps(arguments, sort_keys=True, default=str)}"
+        return run.write_once(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+
+def memoize_read(func):
+    """
+    Reuse the result of a read tool for the same user, arguments and task
+    data version, within the run and optionally across runs.
+
+    Goes between ``@tool`` and the function; the tool's signature is kept.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        config = kwargs.get('config')
+        run = get_run_context(config)
+        user_id = (config or {}).get('configurable', {}).get('created_by')
+        if run is None or not user_id:
+            return func(*args, **kwargs)
+
+        name = func.__name__
+        arguments = json.dumps({k: v for k, v in kwargs.items() if k != 'config'}, sort_keys=True, default=str)
+        # Embeds the version: a changed task makes it a miss
+        key = user_cache_key(user_id, f'tool:{name}', arguments)
+        hit, result = run.cached_read(key)
+        if hit:
+            run.count_read(name, 'run_hits')
+            return result
+
+        across_runs = getattr(settings, 'AI_TOOL_CACHE_ACROSS_RUNS', False)
+        if across_runs:
+            result = cache.get(key)
+            if result is not None:
+                run.count_read(name, 'shared_hits')
+                run.store_read(key, result)
+                return result
+
+        result = func(*args, **kwargs)
+        run.count_read(name, 'misses')
+        run.store_read(key, result)
+        if across_runs:
+            cache.set(key, result, cache_timeout())
+        return result
+    return wrapper
@@ -0,0 +1,130 @@
+"""
+Deterministic stand-in for the Gemini chat model.
+
+``StubChatModel`` picks a tool call from keywords in the user's message and
+answers with a short summary once the tool has run, optionally sleeping to
+simulate model latency. It lets the chat path be load tested and profiled
+without network access or API quota. Enable it with ``AI_LLM_BACKEND=stub``.
+Tail latency and failures can be injected to exercise the LLM router.
+
+    "create task 'Write report'"     -> create_task(title='Write report', description=<message>)
+    "complete 'Write report'"        -> update_task(title=..., status='done')
+    "delete 'Write report'"          -> delete_task(title=...)
+    "who is alice"                   -> find_user(query='alice')
+    "search report"                  -> search_tasks(query='report')
+    "search archived report"         -> search_task_history(query='report')
+    "what is overdue?"               -> get_due_digest(limit=5)
+    "show 'Write report'"            -> get_task(title=...) (quoted titles only)
+    anything else                    -> get_tasks(limit=5)
+"""
+
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_QUOTED = re.compile(r'["\']([^"\']+)["\']')
+
+# (keywords, tool name) in priority order
+_RULES = [
+    (('delete', 'remove'), 'delete_task'),
+    (('complete', 'finish', 'done'), 'update_task'),
+    (('create', 'add', 'new'), 'create_task'),
+    (('who is', 'find user'), 'find_user'),
+    (('history', 'archived', 'archive'), 'search_task_history'),
+    (('search', 'find'), 'search_tasks'),
+    (('overdue', 'due soon', 'deadlines'), 'get_due_digest'),
+    (('show', 'open', 'details'), 'get_task'),
+]
+
+
+def _subject(text: str, keyword: str) -> str:
+    """The quoted part of the message, or whatever follows the keyword."""
+    quoted = _QUOTED.search(text)
+    if quoted:
+        return quoted.group(1).strip()
+    rest = text.lower().split(keyword, 1)[-1]
+    return re.sub(r'^\s*(a\s+)?(new\s+)?tasks?\s*', '', rest).strip(' .:?') or 'Untitled task'
+
+
+def plan_tool_call(text: str) -> Tuple[str, Dict[str, Any]]:
+    """Map a user message to a (tool name, arguments) pair."""
+    lowered = text.lower()
+    for keywords, tool_name in _RULES:
+        keyword = next((k for k in keywords if re.search(rf'\b{k}\b', lowered)), None)
+        if keyword is None:
+            continue
+        if tool_name == 'get_due_digest':
+            return tool_name, {'limit': 5}
+        if tool_name == 'get_task' and not _QUOTED.search(text):
+            # "show my tasks" is a listing, not a lookup
+            continue
+        subject = _subject(text, keyword)
+        if tool_name == 'update_task':
+            return tool_name, {'title': subject, 'status': 'done'}
+        if tool_name == 'find_user':
+            return tool_name, {'query': subject, 'limit': 5}
+        if tool_name in ('search_tasks', 'search_task_history'):
+            return tool_name, {'query': subject, 'limit': 5}
+        if tool_name == 'create_task':
+            # The description is a required argument of create_task
+            return tool_name, {'title': subject, 'description': text}
+        return tool_name, {'title': subject}
+    return 'get_tasks', {'limit': 5}
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Keyword-driven chat model that calls the task tools.
+
+    Args:
+        latency: Seconds to sleep per model call (simulated inference time)
+        tail_latency: Seconds to sleep instead for a ``tail_ratio`` share of
+            the calls (simulated slow responses)
+        tail_ratio: Share of the calls that take ``tail_latency``
+        failure_ratio: Share of the calls that fail (simulated provider errors)
+    """
+
+    latency: float = 0.0
+    tail_latency: float = 0.0
+    tail_ratio: float = 0.0
+    failure_ratio: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub'
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool calls are planned from keywords, the schemas are not needed
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        slow = self.tail_ratio and random.random() < self.tail_ratio
+        delay = self.tail_latency if slow else self.latency
+        if delay:
+            time.sleep(delay)
+        if self.failure_ratio and random.random() < self.failure_ratio:
+            raise RuntimeError("Stub model failure (injected)")
+        last = messages[-1] if messages else None
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Done: {last.name} returned {str(last.content)[:200]}")
+        else:
+            text = next(
+                (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), '')
+            name, args = plan_tool_call(str(text))
+            message = AIMessage(
+                content='',
+                tool_calls=[{'name': name, 'args': args, 'id': f'call_{uuid4().hex[:12]}', 'type': 'tool_call'}],
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
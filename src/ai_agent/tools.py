@@ -1,18 +1,36 @@
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from django.db.models import Q
 from django.core.exceptions import ValidationError
 from langchain_core.tools import tool
 from django.contrib.auth import get_user_model
 from langchain_core.runnables import RunnableConfig
 
-from tasks_app.models import Task
-from tasks_app.serializers import TaskSerializer
+from tasks_app.due import get_digest
+from tasks_app.models import ArchivedTask, Task, TaskConflict
+from tasks_app.search import title_index
+from tasks_app.serializers import ArchivedTaskSerializer, TaskSerializer
+from tasks_app.user_directory import user_directory
+from tasks_app.working_set import task_working_set
 from tasks_app import STATUS_CHOICES, PRIORITY_CHOICES
+from ai_agent.contracts import performance_contract
+from ai_agent.run_context import collapse_repeated_writes, memoize_read
 from ai_agent.tools_validator import ToolsValidator, TaskToolsError
+from task_manager.sqlite import serialized_write
 
 
-@tool
+def _structured(data: Any) -> Tuple[str, Any]:
+    """
+    Tool result: JSON text for the LLM and the data itself as the artifact,
+    which the chat response uses as is instead of parsing the text again.
+    """
+    return json.dumps(data, ensure_ascii=False, default=str), data
+
+
+@performance_contract(max_queries=1, max_rows=20, p95_ms=10,
+                      sample=lambda ref: {'limit': 5})
+@tool(response_format="content_and_artifact")
+@memoize_read
 def get_tasks(config: RunnableConfig, limit: int = 5) -> List[Dict[str, Any]]:
     """
     Get a list of latest tasks for the authenticated user.
@@ -30,11 +48,16 @@ def get_tasks(config: RunnableConfig, limit: int = 5) -> List[Dict[str, Any]]:
         created_by = validator.get_user_from_config(config)
         validated_limit = validator.validate_limit(limit)
 
+        held = task_working_set.latest(created_by, validated_limit)
+        if held is not None:
+            return _structured(held)
+
+        # The serializer reads both usernames: join them instead of N+1
         tasks = Task.objects.filter(
             created_by=created_by
-        ).order_by('-created_at')[:validated_limit]
+        ).select_related('created_by', 'assigned_to').order_by('-created_at')[:validated_limit]
 
-        return validator.serialize_tasks(tasks)
+        return _structured(validator.serialize_tasks(tasks))
 
     except Exception as e:
         if isinstance(e, TaskToolsError):
@@ -42,7 +65,13 @@ def get_tasks(config: RunnableConfig, limit: int = 5) -> List[Dict[str, Any]]:
         raise TaskToolsError(f"Error retrieving tasks: {str(e)}")
 
 
-@tool
+@performance_contract(max_queries=5, max_rows=5, p95_ms=25,
+                      sample=lambda ref: {
+                          'title': 'Contract task', 'description': 'Created by the contract check',
+                          'priority': 'high', 'assigned_to': ref.other_username, 'due_date': '2030-01-01',
+                      })
+@tool(response_format="content_and_artifact")
+@collapse_repeated_writes
 def create_task(
     title: str,
     description: str,
@@ -95,8 +124,8 @@ def create_task(
         # 3. Use DRF serializer for validation + creation
         serializer = TaskSerializer(data=task_data)
         if serializer.is_valid():
-            task = serializer.save()
-            return serializer.data
+            task = serialized_write(serializer.save)()
+            return _structured(serializer.data)
         else:
             raise TaskToolsError(f"Validation error: {serializer.errors}")
 
@@ -106,7 +135,10 @@ def create_task(
     return task
 
 
-@tool
+@performance_contract(max_queries=2, max_rows=2, p95_ms=20,
+                      sample=lambda ref: {'title': ref.title, 'priority': 'low'})
+@tool(response_format="content_and_artifact")
+@collapse_repeated_writes
 def update_task(
     config: RunnableConfig,
     task_id: Optional[int] = None,
@@ -128,7 +160,8 @@ def update_task(
         due_date: New due date (optional)
         assigned_to: New assigned username (optional)
         priority: New priority (optional)
-        status: New status (optional)
+        status: New status (optional); a blocked task must be moved to todo
+            or in_progress before it can be done
 
     Returns:
         Updated task dictionary
@@ -137,40 +170,75 @@ def update_task(
         # Initialize validator instance
         validator = ToolsValidator()
         created_by = validator.get_user_from_config(config)
-        task = validator.get_task_by_id_or_title(task_id, title, created_by)
 
-        validated_priority = validator.validate_priority(priority)
-        validated_status = validator.validate_status(status)
+        # Only the fields that were passed are validated and written. When
+        # no task_id is given the title is the lookup key, not a new value.
+        changes = {}
+        if title and task_id is not None:
+            changes["title"] = title
+        if description:
+            changes["description"] = description
+        if due_date:
+            changes["due_date"] = due_date
+        if priority:
+            changes["priority"] = validator.validate_priority(priority)
+        if status:
+            changes["status"] = validator.validate_status(status)
 
         assigned_to_user = None
         if assigned_to is not None:
             assigned_to_user = validator.get_user_by_username(assigned_to)
 
-        update_data = {
-            "title": title if title else task.title,
-            "description": description if description else task.description,
-            "priority": validated_priority if priority else task.priority,
-            "status": validated_status if status else task.status,
-            "due_date": due_date if due_date else task.due_date,
-            "assigned_to": assigned_to_user.id if assigned_to_user else (task.assigned_to.id if task.assigned_to else None),
-        }
-        # Use DRF serializer for validation + update
-        serializer = TaskSerializer(task, data=update_data, partial=True)
-        if serializer.is_valid():
-            updated_task = serializer.save()
-            return serializer.data
-        else:
+        by_title = task_id is None
+        if by_title:
+            # The conditional UPDATE below checks ownership, no fetch needed.
+            # Never update a fuzzy match: near titles are only offered as
+            # candidates (AmbiguousTaskError) for the model to pick a task_id
+            task_id = validator.resolve_task_id(title, created_by, fuzzy=False)
+
+        if not changes and assigned_to_user is None:
+            task = validator.get_task_by_id_or_title(task_id, None, created_by)
+            return _structured(validator.serialize_task(task))
+
+        # Use DRF serializer for validation only, then write the changed
+        # columns with a single conditional UPDATE
+        serializer = TaskSerializer(data=changes, partial=True)
+        if not serializer.is_valid():
             raise TaskToolsError(f"Validation error: {serializer.errors}")
 
+        validated_data = dict(serializer.validated_data)
+        if assigned_to_user is not None:
+            validated_data["assigned_to"] = assigned_to_user
+
+        # Status transitions are checked in the same UPDATE (STATUS_TRANSITIONS)
+        tasks = serialized_write(
+            Task.objects.filter(id=task_id, created_by=created_by).update_versioned
+        )(**validated_data)
+        if not tasks:
+            if by_title:
+                # The title index was stale; rebuild it on the next lookup
+                title_index.invalidate(created_by)
+            raise TaskToolsError(f"Task with ID {task_id} does not exist")
+
+        updated_task = tasks[0]
+        if assigned_to_user is not None:
+            updated_task.assigned_to = assigned_to_user
+        return _structured(validator.serialize_task(updated_task))
+
     except ValidationError as e:
         raise TaskToolsError(f"Validation error: {str(e)}")
+    except TaskConflict as e:
+        raise TaskToolsError(str(e))
     except Exception as e:
         if isinstance(e, TaskToolsError):
             raise
         raise TaskToolsError(f"Error updating task: {str(e)}")
 
 
-@tool
+@performance_contract(max_queries=3, max_rows=2, p95_ms=25,
+                      sample=lambda ref: {'task_id': ref.disposable_task_id()})
+@tool(response_format="content_and_artifact")
+@collapse_repeated_writes
 def delete_task(
     config: RunnableConfig,
     task_id: Optional[int] = None,
@@ -191,11 +259,12 @@ def delete_task(
         # Initialize validator instance
         validator = ToolsValidator()
         created_by = validator.get_user_from_config(config)
-        task = validator.get_task_by_id_or_title(task_id, title, created_by)
+        # Never delete a fuzzy match: near titles are only offered as candidates
+        task = validator.get_task_by_id_or_title(task_id, title, created_by, fuzzy=False)
         task_identifier = f"'{task.title}' (ID: {task.id})"
-        task.delete()
+        serialized_write(task.delete)()
 
-        return {"message": f"Task {task_identifier} deleted successfully"}
+        return _structured({"message": f"Task {task_identifier} deleted successfully"})
 
     except Exception as e:
         if isinstance(e, TaskToolsError):
@@ -203,7 +272,10 @@ def delete_task(
         raise TaskToolsError(f"Error deleting task: {str(e)}")
 
 
-@tool
+@performance_contract(max_queries=1, max_rows=1, p95_ms=10,
+                      sample=lambda ref: {'title': ref.title})
+@tool(response_format="content_and_artifact")
+@memoize_read
 def get_task(
     config: RunnableConfig,
     task_id: Optional[int] = None,
@@ -224,8 +296,7 @@ def get_task(
         # Initialize validator instance
         validator = ToolsValidator()
         created_by = validator.get_user_from_config(config)
-        task = validator.get_task_by_id_or_title(task_id, title, created_by)
-        return validator.serialize_task(task)
+        return _structured(validator.get_task_data(task_id, title, created_by))
 
     except Exception as e:
         if isinstance(e, TaskToolsError):
@@ -233,7 +304,10 @@ def get_task(
         raise TaskToolsError(f"Error retrieving task: {str(e)}")
 
 
-@tool
+@performance_contract(max_queries=1, max_rows=20, p95_ms=20,
+                      sample=lambda ref: {'query': 'report', 'limit': 5})
+@tool(response_format="content_and_artifact")
+@memoize_read
 def search_tasks(
     query: str,
     config: RunnableConfig,
@@ -257,14 +331,18 @@ def search_tasks(
         validated_limit = validator.validate_limit(limit)
         validated_query = validator.validate_search_query(query)
 
+        held = task_working_set.search(created_by, validated_query, validated_limit)
+        if held is not None:
+            return _structured(held)
+
         tasks = Task.objects.filter(
             created_by=created_by
         ).filter(
             Q(title__icontains=validated_query) | Q(
                 description__icontains=validated_query)
-        ).order_by('-created_at')[:validated_limit]
+        ).select_related('created_by', 'assigned_to').order_by('-created_at')[:validated_limit]
 
-        return validator.serialize_tasks(tasks)
+        return _structured(validator.serialize_tasks(tasks))
 
     except Exception as e:
         if isinstance(e, TaskToolsError):
@@ -272,6 +350,123 @@ def search_tasks(
         raise TaskToolsError(f"Error searching tasks: {str(e)}")
 
 
+@performance_contract(max_queries=2, max_rows=40, p95_ms=30,
+                      sample=lambda ref: {'query': 'report', 'limit': 5})
+@tool(response_format="content_and_artifact")
+@memoize_read
+def search_task_history(
+    query: str,
+    config: RunnableConfig,
+    limit: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Search current and archived tasks by query string in title and
+    description. Use it for tasks completed long ago, which search_tasks
+    does not return.
+
+    Args:
+        query: Search query string
+        config: Configuration containing user information
+        limit: Number of results (default: 5, max: 20)
+
+    Returns:
+        List of matching task dictionaries, newest first; archived tasks
+        have ``archived`` set and an ``archived_at`` date
+    """
+    try:
+        # Initialize validator instance
+        validator = ToolsValidator()
+        created_by = validator.get_user_from_config(config)
+        validated_limit = validator.validate_limit(limit)
+        validated_query = validator.validate_search_query(query)
+        matches = Q(title__icontains=validated_query) | Q(description__icontains=validated_query)
+
+        current = task_working_set.search(created_by, validated_query, validated_limit)
+        if current is None:
+            current = validator.serialize_tasks(
+                Task.objects.filter(created_by=created_by).filter(matches).select_related(
+                    'created_by', 'assigned_to').order_by('-created_at')[:validated_limit])
+        archived = ArchivedTask.objects.filter(created_by=created_by).filter(matches).select_related(
+            'created_by', 'assigned_to').order_by('-created_at')[:validated_limit]
+
+        results = [{**task, 'archived': False} for task in current]
+        results += [{**task, 'archived': True} for task in ArchivedTaskSerializer(archived, many=True).data]
+        results.sort(key=lambda task: task['created_at'], reverse=True)
+        return _structured(results[:validated_limit])
+
+    except Exception as e:
+        if isinstance(e, TaskToolsError):
+            raise
+        raise TaskToolsError(f"Error searching task history: {str(e)}")
+
+
+@performance_contract(max_queries=1, max_rows=1, p95_ms=10,
+                      sample=lambda ref: {'limit': 5})
+@tool(response_format="content_and_artifact")
+def get_due_digest(config: RunnableConfig, limit: int = 5) -> Dict[str, Any]:
+    """
+    Get the user's overdue tasks and the tasks due in the next few days.
+
+    Args:
+        config: Configuration containing user information
+        limit: Tasks listed per section (default: 5, max: 20); the counts
+            include all of them
+
+    Returns:
+        Dictionary with the 'overdue' and 'due_soon' tasks, their counts and
+        the date the digest was computed for ('as_of')
+    """
+    try:
+        # Initialize validator instance
+        validator = ToolsValidator()
+        created_by = validator.get_user_from_config(config)
+        validated_limit = validator.validate_limit(limit)
+
+        # Precomputed by the due task scanner: one row, whatever the task count
+        digest = get_digest(created_by)
+        digest['overdue'] = digest['overdue'][:validated_limit]
+        digest['due_soon'] = digest['due_soon'][:validated_limit]
+        return _structured(digest)
+
+    except Exception as e:
+        if isinstance(e, TaskToolsError):
+            raise
+        raise TaskToolsError(f"Error retrieving due tasks: {str(e)}")
+
+
+@performance_contract(max_queries=0, max_rows=0, p95_ms=5,
+                      sample=lambda ref: {'query': ref.other_username[:-2], 'limit': 5})
+@tool(response_format="content_and_artifact")
+def find_user(query: str, config: RunnableConfig, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Find users by the start of or an approximate username, name or email,
+    e.g. to get the exact username to assign a task to.
+
+    Args:
+        query: Part of a username, first/last name or email
+        config: Configuration containing user information
+        limit: Number of results (default: 5, max: 20)
+
+    Returns:
+        List of user dictionaries (id, username, email, first_name,
+        last_name, score), best match first
+    """
+    try:
+        # Initialize validator instance
+        validator = ToolsValidator()
+        validator.get_user_from_config(config)
+        validated_limit = validator.validate_limit(limit)
+        validated_query = validator.validate_search_query(query)
+
+        # Served from the in-memory user directory, no query once loaded
+        return _structured(user_directory.search(validated_query, limit=validated_limit))
+
+    except Exception as e:
+        if isinstance(e, TaskToolsError):
+            raise
+        raise TaskToolsError(f"Error finding users: {str(e)}")
+
+
 # Export all tools
 task_tools = [
     get_tasks,
@@ -279,7 +474,10 @@ task_tools = [
     update_task,
     delete_task,
     get_task,
-    search_tasks
+    search_tasks,
+    search_task_history,
+    get_due_digest,
+    find_user,
 ]
 
 __all__ = [
@@ -290,4 +488,7 @@ __all__ = [
     'delete_task',
     'get_task',
     'search_tasks',
+    'search_task_history',
+    'get_due_digest',
+    'find_user',
 ]
@@ -1,18 +1,54 @@
+import logging
 from typing import Optional, List, Dict, Any
 from langchain_core.runnables import RunnableConfig
 from django.contrib.auth import get_user_model
 from langchain_core.runnables import RunnableConfig
 
 from tasks_app.models import Task
+from tasks_app.search import title_index
+from tasks_app.user_directory import user_directory
+from tasks_app.working_set import task_working_set
 from tasks_app.serializers import TaskSerializer
 from tasks_app import STATUS_CHOICES, PRIORITY_CHOICES
 
+logger = logging.getLogger(__name__)
+
 
 class TaskToolsError(Exception):
     """Custom exception for task tools operations."""
     pass
 
 
+class AmbiguousTaskError(TaskToolsError):
+    """Raised when a title matches several tasks; carries the candidates."""
+
+    def __init__(self, title: str, candidates: List[Dict[str, Any]]):
+        self.candidates = candidates
+        options = ', '.join(f"ID {c['id']}: '{c['title']}'" for c in candidates)
+        if all(c['score'] == 1.0 for c in candidates):
+            message = f"Multiple tasks match title '{title}': {options}."
+        else:
+            message = f"No task with title '{title}'. Closest matches: {options}."
+        super().__init__(f"{message} Use task_id instead.")
+
+
+def _describe(user: Dict[str, Any]) -> str:
+    details = ' '.join(filter(None, [user['first_name'], user['last_name']])) or user['email']
+    return f" ({details})" if details else ''
+
+
+class UnknownUserError(TaskToolsError):
+    """Raised when a username matches no user; carries the closest users."""
+
+    def __init__(self, username: str, candidates: List[Dict[str, Any]]):
+        self.candidates = candidates
+        message = f"User with username {username} does not exist"
+        if candidates:
+            options = ', '.join(c['username'] + _describe(c) for c in candidates)
+            message += f". Closest matches: {options}. Ask the user which one they mean."
+        super().__init__(message)
+
+
 class ToolsValidator:
     """Centralized validation and utilities for task operations."""
 
@@ -46,7 +82,7 @@ class ToolsValidator:
 
     @classmethod
     def validate_priority(cls, priority: Optional[str]) -> str:
-        print("Incoming priority type:", type(priority), "value:", priority)
+        logger.debug("Incoming priority %r (%s)", priority, type(priority).__name__)
 
         if priority is None:
             return cls.DEFAULT_PRIORITY
@@ -96,32 +132,83 @@ class ToolsValidator:
 
     @staticmethod
     def get_user_by_username(username: str):
-        """Get user by username with proper error handling."""
-        print("Incoming username type:", type(username), "value:", username)
+        """
+        Get user by exact username with proper error handling.
+
+        Writes never go to a user the caller did not name: on a miss the
+        error lists the closest users from the directory, for the agent to
+        confirm one.
+        """
+        logger.debug("Incoming username %r (%s)", username, type(username).__name__)
         User = get_user_model()
         try:
             return User.objects.get(username=username.strip())
         except User.DoesNotExist:
-            raise TaskToolsError(
-                f"User with username {username} does not exist")
+            raise UnknownUserError(username, user_directory.search(username, limit=5))
+
+    @staticmethod
+    def resolve_task_id(title: str, created_by: int, fuzzy: bool = True) -> int:
+        """
+        Resolve a title to one of the user's task ids without a query.
+
+        The id comes from the title index and may be stale; callers must
+        still scope their query to ``created_by``.
+        """
+        match = title_index.resolve(created_by, title, fuzzy=fuzzy)
+        if match.candidates:
+            raise AmbiguousTaskError(title, match.candidates)
+        if match.task_id is None:
+            raise TaskToolsError(f"Task with title '{title}' does not exist")
+        return match.task_id
 
     @staticmethod
-    def get_task_by_id_or_title(task_id: Optional[int] = None, title: Optional[str] = None, created_by: Optional[int] = None) -> Task:
-        """Get a single task by ID or title with proper error handling."""
+    def get_task_by_id_or_title(task_id: Optional[int] = None, title: Optional[str] = None, created_by: Optional[int] = None, fuzzy: bool = True) -> Task:
+        """
+        Get a single task by ID or title with proper error handling.
+
+        Titles are resolved through the user's fuzzy title index, so close
+        paraphrases still find the task. Raises AmbiguousTaskError with the
+        ranked candidates when several tasks match equally well, or when
+        ``fuzzy`` is False and only near matches exist.
+        """
         if not task_id and not title:
             raise TaskToolsError("Either task_id or title must be provided")
 
+        by_title = task_id is None
+        if by_title:
+            task_id = ToolsValidator.resolve_task_id(title, created_by, fuzzy=fuzzy)
+
         try:
-            if task_id is not None:
-                return Task.objects.get(id=task_id, created_by=created_by)
-            else:
-                return Task.objects.get(title=title, created_by=created_by)
+            return Task.objects.select_related('created_by', 'assigned_to').get(id=task_id, created_by=created_by)
         except Task.DoesNotExist:
-            identifier = f"ID {task_id}" if task_id else f"title '{title}'"
+            if by_title:
+                # The index was stale; drop it so the next lookup rebuilds
+                title_index.invalidate(created_by)
+            identifier = f"title '{title}'" if by_title else f"ID {task_id}"
             raise TaskToolsError(f"Task with {identifier} does not exist")
-        except Task.MultipleObjectsReturned:
-            raise TaskToolsError(
-                f"Multiple tasks found with title '{title}'. Use task_id instead.")
+
+    @staticmethod
+    def get_task_data(task_id: Optional[int] = None, title: Optional[str] = None, created_by: Optional[int] = None, fuzzy: bool = True) -> Dict[str, Any]:
+        """
+        Serialized ``get_task_by_id_or_title``, served from the user's task
+        working set when it holds the user's tasks.
+        """
+        if not task_id and not title:
+            raise TaskToolsError("Either task_id or title must be provided")
+
+        by_title = task_id is None
+        lookup_id = ToolsValidator.resolve_task_id(title, created_by, fuzzy=fuzzy) if by_title else task_id
+        try:
+            data = task_working_set.get(created_by, lookup_id)
+        except Task.DoesNotExist:
+            if by_title:
+                title_index.invalidate(created_by)
+            identifier = f"title '{title}'" if by_title else f"ID {task_id}"
+            raise TaskToolsError(f"Task with {identifier} does not exist")
+        if data is not None:
+            return data
+        return ToolsValidator.serialize_task(
+            ToolsValidator.get_task_by_id_or_title(task_id, title, created_by, fuzzy=fuzzy))
 
     @staticmethod
     def validate_search_query(query: str) -> str:
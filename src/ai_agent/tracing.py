@@ -0,0 +1,412 @@
+"""
+Recording and offline replay of agent runs.
+
+With ``AI_TRACE_ENABLED`` every chat turn handled by ``ChatService`` is
+recorded by an ``AgentTrace`` callback: the messages sent to the LLM and
+its answers, the tool calls with their inputs and outputs, the timing of
+every step and the SQL statements each step issued. Traces of turns slower
+than ``AI_TRACE_MIN_DURATION_MS`` are appended as one JSON line to a
+size-rotated file per process in ``AI_TRACE_DIR``.
+
+``replay`` re-executes a recorded turn with ``ReplayChatModel``, which
+answers with the recorded LLM outputs, so the tools run for real against a
+local (snapshot) database without calling the model.
+``python manage.py replay_trace`` wraps it.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult, LLMResult
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMAT_VERSION = 1
+
+
+def tracing_enabled() -> bool:
+    return getattr(settings, 'AI_TRACE_ENABLED', False)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class AgentTrace(BaseCallbackHandler):
+    """
+    Callback handler collecting one agent run.
+
+    Pass it in the run's ``callbacks`` and wrap the run in ``recording()``
+    so queries issued outside tools are captured too. Tools may run in
+    worker threads; every step wraps the database connection of the thread
+    it runs in.
+
+    Args:
+        trace_id: Id of the run (the request id)
+        user_id: User the agent acts for
+        user_input: The user's message
+        profile_tools: Profile every tool call in its own thread; the
+            profiles are collected in ``tool_profiles``
+    """
+
+    def __init__(self, trace_id: str, user_id: int, user_input: str, profile_tools: bool = False):
+        self.trace_id = trace_id
+        self.user_id = user_id
+        self.user_input = user_input
+        self.steps: List[Dict[str, Any]] = []
+        self.unattributed_queries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, Dict[str, Any]] = {}
+        self._wrappers: Dict[UUID, Any] = {}
+        self.profile_tools = profile_tools
+        self.tool_profiles: List[cProfile.Profile] = []
+        self._profiles: Dict[UUID, cProfile.Profile] = {}
+        # Messages already stored with an earlier LLM step
+        self._seen_messages = 0
+        self._started = time.perf_counter()
+        self._started_at = timezone.now()
+
+    # LLM steps
+
+    def on_chat_model_start(self, serialized, messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs):
+        prompt = messages[0] if messages else []
+        with self._lock:
+            new_messages = prompt[self._seen_messages:]
+            self._seen_messages = len(prompt)
+            self._begin(run_id, {'type': 'llm', 'input': messages_to_dict(new_messages)})
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, 'message', None)
+        with self._lock:
+            step = self._end(run_id)
+            if step is not None and message is not None:
+                step['output'] = messages_to_dict([message])[0]
+                # The answer comes back as input of the next LLM step
+                self._seen_messages += 1
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        with self._lock:
+            step = self._end(run_id)
+            if step is not None:
+                step['error'] = repr(error)
+
+    # Tool steps
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, inputs=None, **kwargs):
+        step = {'type': 'tool', 'name': serialized.get('name'), 'input': inputs if inputs is not None else input_str,
+                'queries': []}
+        with self._lock:
+            self._begin(run_id, step)
+        # Runs in the tool's thread: wrap that thread's connection
+        wrapper = connection.execute_wrapper(lambda *args: self._record_query(step, *args))
+        wrapper.__enter__()
+        self._wrappers[run_id] = wrapper
+        if self.profile_tools:
+            profile = self._profiles[run_id] = cProfile.Profile()
+            profile.enable()
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs):
+        self._unwrap(run_id)
+        with self._lock:
+            step = self._end(run_id)
+            if step is not None:
+                step['output'] = str(getattr(output, 'content', output))
+                step['status'] = getattr(output, 'status', 'success')
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._unwrap(run_id)
+        with self._lock:
+            step = self._end(run_id)
+            if step is not None:
+                step['error'] = repr(error)
+
+    # Queries
+
+    def _record_query(self, step: Optional[Dict[str, Any]], execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Inner wrappers finish first: a tool step's wrapper records the
+            # query, the run-level wrapper on the same connection skips it
+            if not context.get('traced'):
+                context['traced'] = True
+                query = {'sql': sql, 'duration_ms': _ms(time.perf_counter() - start)}
+                with self._lock:
+                    (step['queries'] if step is not None else self.unattributed_queries).append(query)
+
+    def _unwrap(self, run_id: UUID):
+        profile = self._profiles.pop(run_id, None)
+        if profile is not None:
+            profile.disable()
+            with self._lock:
+                self.tool_profiles.append(profile)
+        wrapper = self._wrappers.pop(run_id, None)
+        if wrapper is not None:
+            wrapper.__exit__(None, None, None)
+
+    def _begin(self, run_id: UUID, step: Dict[str, Any]):
+        step['start_ms'] = _ms(time.perf_counter() - self._started)
+        step['_start'] = time.perf_counter()
+        self._open[run_id] = step
+        self.steps.append(step)
+
+    def _end(self, run_id: UUID) -> Optional[Dict[str, Any]]:
+        step = self._open.pop(run_id, None)
+        if step is not None:
+            step['duration_ms'] = _ms(time.perf_counter() - step.pop('_start'))
+        return step
+
+    def to_record(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """The trace as a JSON serializable dictionary."""
+        with self._lock:
+            steps = [step for step in self.steps if '_start' not in step]
+            return {
+                'version': TRACE_FORMAT_VERSION,
+                'trace_id': self.trace_id,
+                'time': self._started_at.isoformat(),
+                'user_id': self.user_id,
+                'input': self.user_input,
+                'llm_backend': getattr(settings, 'AI_LLM_BACKEND', 'gemini'),
+                'duration_ms': _ms(time.perf_counter() - self._started),
+                'error': repr(error) if error is not None else None,
+                'queries': sum(len(step.get('queries', ())) for step in steps) + len(self.unattributed_queries),
+                'steps': steps,
+                'unattributed_queries': self.unattributed_queries,
+            }
+
+
+class ProfileThreads(BaseCallbackHandler):
+    """
+    Callback handler adding the threads an agent run executes its steps in
+    (graph nodes, tools, LLM calls) to a request's profile session, see
+    ``task_manager.profiling``.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._threads: Dict[UUID, int] = {}
+
+    def _enter(self, run_id: UUID):
+        self._threads[run_id] = threading.get_ident()
+        self.session.enter_thread()
+
+    def _exit(self, run_id: UUID):
+        # A step ending in another thread than it started in stays tracked
+        if self._threads.pop(run_id, None) == threading.get_ident():
+            self.session.exit_thread()
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, **kwargs):
+        self._enter(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        self._enter(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._enter(run_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._exit(run_id)
+
+
+@contextmanager
+def recording(trace: AgentTrace):
+    """Capture the queries the calling thread issues outside tool steps."""
+    with connection.execute_wrapper(lambda *args: trace._record_query(None, *args)):
+        yield trace
+
+
+class TraceStore:
+    """
+    Append-only JSONL trace files with size-based rotation.
+
+    Each process writes its own ``agent-<pid>.jsonl`` so rotation needs no
+    coordination between workers; rotated files get a numeric suffix.
+    """
+
+    def __init__(self, directory, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f'agent-{os.getpid()}.jsonl'
+
+    def write(self, record: Dict[str, Any]):
+        line = (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode()
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.path
+            if self.max_bytes and path.exists() and path.stat().st_size + len(line) > self.max_bytes:
+                self._rotate(path)
+            with open(path, 'ab') as file:
+                file.write(line)
+
+    def _rotate(self, path: Path):
+        for number in range(self.backup_count - 1, 0, -1):
+            older = path.with_name(f'{path.name}.{number}')
+            if older.exists():
+                older.replace(path.with_name(f'{path.name}.{number + 1}'))
+        if self.backup_count:
+            path.replace(path.with_name(f'{path.name}.1'))
+        else:
+            path.unlink()
+
+
+_store: Optional[TraceStore] = None
+_store_lock = threading.Lock()
+
+
+def trace_store() -> TraceStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TraceStore(
+                settings.AI_TRACE_DIR,
+                max_bytes=getattr(settings, 'AI_TRACE_MAX_BYTES', 10 * 1024 * 1024),
+                backup_count=getattr(settings, 'AI_TRACE_BACKUP_COUNT', 5),
+            )
+        return _store
+
+
+def save_trace(trace: AgentTrace, error: Optional[BaseException] = None) -> Optional[Dict[str, Any]]:
+    """Store the trace if the run was slow enough; returns the stored record."""
+    record = trace.to_record(error)
+    if record['duration_ms'] < getattr(settings, 'AI_TRACE_MIN_DURATION_MS', 0):
+        return None
+    try:
+        trace_store().write(record)
+    except OSError as e:
+        # Tracing must never fail the chat turn
+        logger.warning("Could not write agent trace %s: %s", trace.trace_id, e)
+        return None
+    return record
+
+
+def read_traces(path) -> Iterator[Dict[str, Any]]:
+    """Traces in a trace file, or in all trace files of a directory."""
+    path = Path(path)
+    files = sorted(path.glob('agent-*.jsonl*')) if path.is_dir() else [path]
+    for file in files:
+        with open(file, encoding='utf-8') as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model answering with the LLM outputs of a recorded trace, in order.
+
+    Args:
+        outputs: Recorded output messages (``messages_to_dict`` format)
+        latencies: Seconds to sleep before each answer (recorded LLM time)
+    """
+
+    outputs: List[Dict[str, Any]]
+    latencies: List[float] = []
+    position: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'replay'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        position = self.position
+        self.position += 1
+        if position < len(self.latencies):
+            time.sleep(self.latencies[position])
+        if position < len(self.outputs):
+            message = messages_from_dict([self.outputs[position]])[0]
+        else:
+            # The run took another path than the recorded one
+            message = AIMessage(content='Replay finished: no more recorded LLM outputs')
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def replay(record: Dict[str, Any], user_id: Optional[int] = None, llm_latency: bool = False,
+           trace: Optional[AgentTrace] = None) -> Dict[str, Any]:
+    """
+    Re-run a recorded chat turn with the recorded LLM outputs.
+
+    Args:
+        record: Trace as stored by ``save_trace``
+        user_id: Run as this user instead of the recorded one
+        llm_latency: Sleep for the recorded LLM time before each answer
+        trace: Record the replay into this trace (e.g. one profiling the
+            tools); a new one by default
+
+    Returns:
+        The trace of the replayed run (not stored)
+    """
+    from ai_agent.agent import get_agent
+    from ai_agent.chat_service import ChatServiceFactory
+
+    llm_steps = [step for step in record['steps'] if step['type'] == 'llm' and 'output' in step]
+    model = ReplayChatModel(
+        outputs=[step['output'] for step in llm_steps],
+        latencies=[step['duration_ms'] / 1000 for step in llm_steps] if llm_latency else [],
+    )
+    service = ChatServiceFactory.create_service_with_custom_agent(
+        lambda checkpointer: get_agent(checkpointer, llm=model))
+    if trace is None:
+        trace = AgentTrace(f"replay-{record['trace_id']}", user_id or record['user_id'], record['input'])
+    error = None
+    try:
+        service.process_chat(record['input'], trace.user_id, trace=trace)
+    except Exception as e:
+        error = e
+    return trace.to_record(error)
+
+
+def compare_traces(recorded: Dict[str, Any], replayed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Line up the steps of two runs of the same turn."""
+    rows = []
+    for number in range(max(len(recorded['steps']), len(replayed['steps']))):
+        before = recorded['steps'][number] if number < len(recorded['steps']) else {}
+        after = replayed['steps'][number] if number < len(replayed['steps']) else {}
+        rows.append({
+            'step': number,
+            'type': before.get('type') or after.get('type'),
+            'name': before.get('name') or after.get('name') or '',
+            'recorded_ms': before.get('duration_ms'),
+            'replayed_ms': after.get('duration_ms'),
+            'recorded_queries': len(before['queries']) if 'queries' in before else None,
+            'replayed_queries': len(after['queries']) if 'queries' in after else None,
+        })
+    return rows
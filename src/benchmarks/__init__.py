@@ -0,0 +1,31 @@
+"""
+Benchmark suite for the task manager.
+
+Each module in this package is one benchmark. It declares its tunable
+``PARAMS`` (name -> default value) and a ``run(**params)`` function that
+returns a JSON serializable dict of results.
+
+Run them with ``python manage.py benchmark <name> [--param key=value]``.
+"""
+
+import importlib
+import pkgutil
+
+# Helper modules that are not benchmarks themselves
+_NON_BENCHMARK_MODULES = {'utils', 'loadgen'}
+
+
+def available_benchmarks():
+    """Return the sorted names of all benchmark modules."""
+    return sorted(
+        module.name for module in pkgutil.iter_modules(__path__)
+        if module.name not in _NON_BENCHMARK_MODULES
+    )
+
+
+def load_benchmark(name: str):
+    """Import the benchmark module called ``name``."""
+    if name not in available_benchmarks():
+        raise ValueError(
+            f"Unknown benchmark '{name}'. Available: {', '.join(available_benchmarks())}")
+    return importlib.import_module(f'{__name__}.{name}')
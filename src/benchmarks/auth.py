@@ -0,0 +1,69 @@
+"""
+Per-request cost of token authentication: DRF's TokenAuthentication vs. CachedTokenAuthentication.
+
+Three cases are measured on the same token:
+
+* ``uncached`` - stock ``TokenAuthentication`` (one token+user query)
+* ``shared_cache`` - cached class with the per-process cache cleared before
+  every request, i.e. a hit in the shared Django cache only
+* ``local_cache`` - cached class with a warm per-process cache
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import summarize, test_database
+from tasks_app.authentication import CachedTokenAuthentication, token_cache
+
+PARAMS = {
+    'requests': 2000,
+}
+
+
+def _measure(authentication, request, iterations, before=None):
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            user, _ = authentication.authenticate(request)
+            latencies.append(time.perf_counter() - start)
+    return {
+        'queries_per_request': round(len(queries) / iterations, 3),
+        'latency': summarize(latencies),
+    }
+
+
+def run(requests):
+    results = {}
+    with test_database():
+        cache.clear()
+        user = User.objects.create_user('benchmark', password='benchmark')
+        token = Token.objects.create(user=user)
+        request = Request(APIRequestFactory().get(
+            '/api/tasks/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+
+        results['uncached'] = _measure(TokenAuthentication(), request, requests)
+
+        cached = CachedTokenAuthentication()
+        cached.authenticate(request)
+        results['shared_cache'] = _measure(cached, request, requests, before=token_cache.clear_local)
+        results['local_cache'] = _measure(cached, request, requests)
+        token_cache.clear_local()
+        cache.clear()
+
+    baseline = results['uncached']['latency']['mean_ms']
+    for case in ('shared_cache', 'local_cache'):
+        mean = results[case]['latency']['mean_ms']
+        if mean:
+            results[case]['speedup'] = round(baseline / mean, 1)
+    return results
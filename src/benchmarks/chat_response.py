@@ -0,0 +1,116 @@
+"""
+Encode/decode cost of turning a chat turn's tool messages into the response body.
+
+Each case is a turn of three tool calls (a task list of ``tasks`` items, a
+single task and a search result of half the list), measured from the
+``ToolMessage`` list to the response bytes:
+
+* ``legacy_first`` - what the chat endpoint used to do: ``json.loads`` of
+  every message's text, then ``JsonResponse`` of the first message only
+* ``legacy_full`` - the same parsing, returning every message
+* ``structured_full`` - tools' artifacts passed through, encoded once by
+  ``render_chat_response`` (``AI_CHAT_MAX_RESPONSE_BYTES`` not applied)
+* ``structured_capped`` - the same with ``cap_bytes``
+
+The JSON text the LLM reads is produced by the tools in both cases and is
+not part of the measurement.
+"""
+
+import json
+import time
+
+from django.http import JsonResponse
+from langchain_core.messages import ToolMessage
+
+from ai_agent.chat_service import ChatService
+from ai_agent.response import render_chat_response
+from benchmarks.utils import summarize
+
+PARAMS = {
+    # Sizes of the task list, comma separated
+    'tasks': '1,20,200',
+    'iterations': 500,
+    'cap_bytes': 16384,
+}
+
+
+def _task(number):
+    return {
+        'id': number,
+        'title': f'Benchmark task {number}: prepare the quarterly report',
+        'description': 'Collect the numbers from every team, check them and write the summary. ' * 3,
+        'status': ('todo', 'in_progress', 'done')[number % 3],
+        'priority': ('low', 'medium', 'high')[number % 3],
+        'due_date': '2026-11-01',
+        'assigned_to': number % 7 or None,
+        'created_by': 1,
+        'created_at': '2026-10-01T09:30:00.123456Z',
+        'updated_at': '2026-10-02T14:05:00.654321Z',
+    }
+
+
+def _turn(count):
+    """Tool messages of one turn, as the tools return them."""
+    results = [('get_tasks', [_task(n) for n in range(count)]),
+               ('get_task', _task(0)),
+               ('search_tasks', [_task(n) for n in range(count // 2)])]
+    return [
+        ToolMessage(content=json.dumps(data, ensure_ascii=False, default=str), artifact=data,
+                    name=name, tool_call_id=f'call-{number}')
+        for number, (name, data) in enumerate(results)
+    ]
+
+
+def _legacy_data(messages):
+    data = []
+    for msg in messages:
+        try:
+            content = json.loads(msg.content)
+        except json.JSONDecodeError:
+            continue
+        data.append({'content': content, 'name': msg.name, 'status': msg.status, 'tool_call_id': msg.tool_call_id})
+    return data
+
+
+def _legacy_first(messages):
+    return JsonResponse(_legacy_data(messages)[0]).content
+
+
+def _legacy_full(messages):
+    return JsonResponse({'data': _legacy_data(messages)}).content
+
+
+def _structured(service, max_bytes):
+    def render(messages):
+        return render_chat_response(service._extract_tool_messages(messages), mode='full', max_bytes=max_bytes)
+    return render
+
+
+def _measure(render, messages, iterations):
+    latencies, body = [], b''
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = render(messages)
+        latencies.append(time.perf_counter() - start)
+    return {'bytes': len(body), 'latency': summarize(latencies)}
+
+
+def run(tasks, iterations, cap_bytes):
+    # Only _extract_tool_messages is used: no agent is built
+    service = ChatService.__new__(ChatService)
+    cases = {
+        'legacy_first': _legacy_first,
+        'legacy_full': _legacy_full,
+        'structured_full': _structured(service, 0),
+        'structured_capped': _structured(service, cap_bytes),
+    }
+    results = {}
+    for count in (int(size) for size in tasks.split(',')):
+        messages = _turn(count)
+        report = {name: _measure(render, messages, iterations) for name, render in cases.items()}
+        baseline = report['legacy_full']['latency']['mean_ms']
+        mean = report['structured_full']['latency']['mean_ms']
+        if mean:
+            report['structured_full']['speedup'] = round(baseline / mean, 1)
+        results[f'{count}_tasks'] = report
+    return results
@@ -0,0 +1,131 @@
+"""
+Concurrent read-modify-write updates of the same tasks.
+
+``workers`` threads each make ``updates_per_worker`` changes that depend on
+the task as read, like an agent and a UI editing the same task: read the
+task, wait ``think_time`` seconds, append a token to its description and
+write it back. ``unguarded`` writes blindly with ``update_returning``, as
+the views and tools did before tasks were versioned; ``versioned`` writes
+with ``update_versioned`` against the version read and retries from the
+returned current task on a conflict. Neither takes row locks.
+
+``lost_updates`` counts tokens missing from the final descriptions;
+``conflicts`` counts the retries the versioned writers needed. On SQLite
+the test database is a temporary file in production mode: threads sharing
+the in-memory test database would fail on table locks instead.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import override_settings
+
+from benchmarks.utils import summarize, test_database
+from task_manager.sqlite import serialized_write
+from tasks_app.models import StaleTaskVersion, Task
+
+PARAMS = {
+    'workers': 8,
+    'updates_per_worker': 50,
+    # Hot tasks the workers share
+    'tasks': 1,
+    'think_time': 0.001,
+}
+
+
+def _update(task_id, token, versioned, think_time):
+    """One logical update; returns the number of conflicts it ran into."""
+    task = Task.objects.get(pk=task_id)
+    time.sleep(think_time)
+    conflicts = 0
+    while True:
+        description = f"{task.description} {token}"
+        if not versioned:
+            serialized_write(Task.objects.filter(pk=task_id).update_returning)(description=description)
+            return conflicts
+        try:
+            serialized_write(Task.objects.filter(pk=task_id).update_versioned)(
+                task.version, description=description)
+            return conflicts
+        except StaleTaskVersion as e:
+            conflicts += 1
+            task = e.current
+
+
+def _run_mode(task_ids, versioned, workers, updates_per_worker, think_time):
+    latencies, conflicts, errors = [], [], []
+    record_lock = threading.Lock()
+
+    def worker(number):
+        try:
+            for index in range(updates_per_worker):
+                task_id = task_ids[(number + index) % len(task_ids)]
+                start = time.perf_counter()
+                try:
+                    count = _update(task_id, f"w{number}-{index}", versioned, think_time)
+                except Exception as exc:
+                    with record_lock:
+                        errors.append(str(exc))
+                    continue
+                with record_lock:
+                    latencies.append(time.perf_counter() - start)
+                    conflicts.append(count)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    tokens = set()
+    for description in Task.objects.filter(pk__in=task_ids).values_list('description', flat=True):
+        tokens.update(description.split()[1:])
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'updates': len(latencies),
+        'failed': len(errors),
+        'updates_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'lost_updates': len(latencies) - len(tokens),
+        'conflicts': sum(conflicts),
+        'latency': summarize(latencies),
+    }
+
+
+@contextmanager
+def _file_test_database():
+    settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+    if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+        with test_database():
+            yield
+        return
+    test_settings = settings_dict.setdefault('TEST', {})
+    previous = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory() as directory:
+        test_settings['NAME'] = os.path.join(directory, 'contention.sqlite3')
+        try:
+            with override_settings(SQLITE_PRODUCTION_MODE=True), test_database():
+                yield
+        finally:
+            test_settings['NAME'] = previous
+
+
+def run(workers, updates_per_worker, tasks, think_time):
+    results = {}
+    with _file_test_database():
+        user = User.objects.create(username='contention_user')
+        for mode, versioned in (('unguarded', False), ('versioned', True)):
+            task_ids = [
+                Task.objects.create(title=f"Hot task {i}", description='start', created_by=user).pk
+                for i in range(tasks)
+            ]
+            results[mode] = _run_mode(task_ids, versioned, workers, updates_per_worker, think_time)
+    return results
@@ -0,0 +1,79 @@
+"""
+Cold start cost: wall time and heaviest imports of the main entry points.
+
+Each scenario runs in a fresh interpreter with ``-X importtime``:
+
+* ``django_setup`` - settings and app registry only (every manage.py command)
+* ``rest`` - plus the URLconf, i.e. what a REST-only worker loads
+* ``chat`` - plus the AI agent stack, i.e. the first chat request
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PARAMS = {
+    'repeats': 3,
+    # Heaviest packages reported per scenario
+    'top': 8,
+}
+
+_SETUP = (
+    "import os, django; "
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_manager.settings'); "
+    "django.setup(); "
+)
+
+SCENARIOS = {
+    'django_setup': _SETUP,
+    'rest': _SETUP + "import task_manager.urls",
+    'chat': _SETUP + "import task_manager.urls; from ai_agent import get_agent; import ai_agent.chat_service",
+}
+
+# "import time: self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+
+def _heaviest_packages(stderr: str, top: int):
+    """Cumulative import time per top-level package, wherever it was imported from."""
+    packages = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match and '.' not in match.group(3):
+            name = match.group(3)
+            packages[name] = max(packages.get(name, 0), int(match.group(2)))
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return [{'package': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in heaviest]
+
+
+def _run(code: str):
+    project_root = Path(__file__).resolve().parent.parent
+    env = dict(os.environ, PYTHONPATH=str(project_root))
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return elapsed, completed.stderr
+
+
+def run(repeats, top):
+    results = {}
+    for name, code in SCENARIOS.items():
+        timings, stderr = [], ''
+        for _ in range(max(1, repeats)):
+            elapsed, stderr = _run(code)
+            timings.append(elapsed)
+        results[name] = {
+            'median_s': round(statistics.median(timings), 3),
+            'min_s': round(min(timings), 3),
+            'heaviest_packages': _heaviest_packages(stderr, top),
+        }
+    return results
@@ -0,0 +1,78 @@
+"""
+LLM router latency with stub models that have injected tail latency and failures.
+
+Every case sends ``requests`` chat model calls, one at a time, to stub models
+answering in ``latency`` seconds except for a ``tail_ratio`` share answering
+in ``tail_latency`` seconds:
+
+* ``single`` - one stub model, no router (the previous setup)
+* ``fallback`` - router over two stubs without hedging
+* ``hedged`` - the same with hedging at the first model's p95
+* ``failing_primary`` - hedged router whose first model fails
+  ``failure_ratio`` of its calls, to exercise fallback and the breaker
+
+No database or network is used.
+"""
+
+import time
+
+from django.test.utils import override_settings
+from langchain_core.messages import HumanMessage
+
+from ai_agent import llm_health
+from ai_agent.llm import create_model
+from ai_agent.llm_router import RouterChatModel
+from benchmarks.utils import summarize
+
+PARAMS = {
+    'requests': 200,
+    'latency': 0.02,
+    'tail_latency': 0.3,
+    'tail_ratio': 0.03,
+    'failure_ratio': 0.3,
+    'hedge_min_ms': 0.0,
+}
+
+
+def _stub(latency, tail_latency, tail_ratio, failure_ratio=0.0):
+    return create_model('stub', 'stub', latency=latency, tail_latency=tail_latency,
+                        tail_ratio=tail_ratio, failure_ratio=failure_ratio)
+
+
+def _measure(model, requests):
+    messages = [HumanMessage(content='show my tasks')]
+    latencies, errors = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            model.invoke(messages)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return {'errors': errors, 'latency': summarize(latencies)}
+
+
+def run(requests, latency, tail_latency, tail_ratio, failure_ratio, hedge_min_ms):
+    stub = (latency, tail_latency, tail_ratio)
+    results = {'single': _measure(_stub(*stub), requests)}
+
+    cases = {
+        'fallback': (False, 0.0),
+        'hedged': (True, 0.0),
+        'failing_primary': (True, failure_ratio),
+    }
+    # A short cooldown lets the failing model's breaker close again during the run
+    with override_settings(AI_LLM_BREAKER_COOLDOWN=0.5):
+        for case, (hedge, primary_failures) in cases.items():
+            llm_health.reset()
+            names = [f'stub:{case}-primary', f'stub:{case}-secondary']
+            router = RouterChatModel(
+                names=names,
+                routes=[_stub(*stub, failure_ratio=primary_failures), _stub(*stub)],
+                hedge=hedge,
+                hedge_min_ms=hedge_min_ms,
+            )
+            results[case] = _measure(router, requests)
+            results[case]['models'] = llm_health.health_snapshot()
+    llm_health.reset()
+    return results
@@ -0,0 +1,292 @@
+"""
+Mixed-workload load generator for the REST and chat APIs.
+
+Worker threads act as seeded users (see ``tasks_app.seeding``) and issue
+requests drawn from a weighted mix of operations, either in-process through
+Django's test client or over HTTP against a running server that uses the
+same database. Task ids are learned from the API responses, so the workload
+only touches tasks the user can see.
+
+Used by ``python manage.py loadtest``.
+"""
+
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.db import connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from benchmarks.utils import histogram, summarize
+
+DEFAULT_MIX = {
+    'list_tasks': 35,
+    'retrieve_task': 20,
+    'create_task': 10,
+    'update_task': 10,
+    'complete_task': 5,
+    'list_users': 10,
+    'retrieve_user': 5,
+    'chat': 5,
+}
+
+CHAT_MESSAGES = [
+    "show my tasks",
+    "create task 'Prepare load test report'",
+    "search report",
+    "find invoice",
+]
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse ``"list_tasks=50,chat=5"``; operations not named are disabled."""
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation '{name}'. Use one of: {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class InProcessTransport:
+    """Requests through Django's test client (full middleware stack, no sockets)."""
+
+    def __init__(self, token: str):
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def request(self, method: str, path: str, payload=None):
+        send = getattr(self.client, method.lower())
+        if payload is None:
+            response = send(path)
+        else:
+            response = send(path, data=json.dumps(payload), content_type='application/json')
+        return response.status_code, response.content
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Requests over HTTP to ``base_url``."""
+
+    def __init__(self, token: str, base_url: str, timeout: float = 60):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers={
+            'Authorization': f'Token {self.token}',
+            'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def close(self):
+        pass
+
+
+class VirtualUser:
+    """One simulated client: a token, a transport and the task ids it has seen."""
+
+    def __init__(self, username: str, transport, rng: random.Random):
+        self.username = username
+        self.transport = transport
+        self.rng = rng
+        # Creators and assignees may all complete the tasks they can see
+        self.task_ids: List[int] = []
+        self.page_count = 1
+
+    def run(self, operation: str):
+        """Perform one operation; returns (operation actually run, status code)."""
+        if operation in ('retrieve_task', 'update_task', 'complete_task') and not self.task_ids:
+            # Nothing known yet: discover tasks first
+            operation = 'list_tasks'
+        status, _ = getattr(self, operation)()
+        return operation, status
+
+    def list_tasks(self):
+        page = self.rng.randint(1, self.page_count)
+        status, body = self.transport.request('GET', f'/api/tasks/?page={page}')
+        if status == 200:
+            data = json.loads(body)
+            self.page_count = max(1, min(10, -(-data.get('count', 0) // 10)))
+            for task in data.get('results', []):
+                self._remember(task)
+        return status, body
+
+    def retrieve_task(self):
+        return self.transport.request('GET', f'/api/tasks/{self.rng.choice(self.task_ids)}/')
+
+    def create_task(self):
+        status, body = self.transport.request('POST', '/api/tasks/', {
+            'title': f'Load test task {self.rng.randint(1, 10 ** 6)}',
+            'description': 'Created by the load generator.',
+            'priority': self.rng.choice(['low', 'medium', 'high']),
+        })
+        if status == 201:
+            self._remember(json.loads(body))
+        return status, body
+
+    def update_task(self):
+        return self.transport.request('PATCH', f'/api/tasks/{self.rng.choice(self.task_ids)}/', {
+            'priority': self.rng.choice(['low', 'medium', 'high']),
+        })
+
+    def complete_task(self):
+        return self.transport.request('POST', f'/api/tasks/{self.rng.choice(self.task_ids)}/complete/')
+
+    def list_users(self):
+        return self.transport.request('GET', '/api/users/')
+
+    def retrieve_user(self):
+        return self.transport.request('GET', f'/api/users/{self.username}/')
+
+    def chat(self):
+        return self.transport.request('POST', '/api/ai/chat/', {'message': self.rng.choice(CHAT_MESSAGES)})
+
+    def _remember(self, task):
+        if task['id'] not in self.task_ids:
+            self.task_ids.append(task['id'])
+            del self.task_ids[:-200]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load(
+    mix: Dict[str, int],
+    concurrency: int = 8,
+    requests: int = 1000,
+    duration: Optional[float] = None,
+    warmup: int = 0,
+    base_url: Optional[str] = None,
+    username_prefix: str = 'load_user',
+    seed_value: Optional[int] = None,
+) -> Dict:
+    """
+    Drive the mixed workload and report latency and throughput per operation.
+
+    Args:
+        mix: Relative weight per operation name
+        concurrency: Number of worker threads
+        requests: Total number of measured requests (ignored with ``duration``)
+        duration: Run for this many seconds instead of a request count
+        warmup: Requests per worker that are issued but not measured
+        base_url: Target server; None runs in-process
+        username_prefix: Prefix of the seeded users to act as
+        seed_value: Random seed for a reproducible request sequence
+
+    Returns:
+        JSON serializable report
+    """
+    tokens = list(Token.objects.filter(user__username__startswith=username_prefix)
+                  .values_list('user__username', 'key'))
+    if not tokens:
+        raise ValueError(f"No users named '{username_prefix}_*' with tokens, run seed_data first")
+    operations, weights = zip(*mix.items())
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [requests]
+    started = [None]
+    stop_at = [None]
+
+    def take() -> bool:
+        if duration is not None:
+            return time.perf_counter() < stop_at[0]
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(number: int):
+        rng = random.Random(None if seed_value is None else seed_value + number)
+        username, key = tokens[number % len(tokens)] if seed_value is None else rng.choice(tokens)
+        transport = HttpTransport(key, base_url) if base_url else InProcessTransport(key)
+        user = VirtualUser(username, transport, rng)
+        try:
+            for _ in range(warmup):
+                try:
+                    user.run(rng.choices(operations, weights)[0])
+                except Exception:
+                    pass
+            barrier.wait()
+            while take():
+                start = time.perf_counter()
+                try:
+                    operation, status = user.run(rng.choices(operations, weights)[0])
+                    failed = status >= 400
+                except Exception:
+                    operation, failed = 'transport_error', True
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies[operation].append(elapsed)
+                    if failed:
+                        errors[operation] += 1
+        finally:
+            transport.close()
+
+    def start_clock():
+        # Barrier action: runs before any thread is released, so workers
+        # never see the deadline unset
+        started[0] = time.perf_counter()
+        if duration is not None:
+            stop_at[0] = started[0] + duration
+
+    barrier = threading.Barrier(concurrency + 1, action=start_clock)
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started[0]
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    report_operations = {
+        name: {
+            'count': len(values),
+            'errors': errors[name],
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0,
+            'latency': summarize(values),
+            'histogram': histogram(values),
+        }
+        for name, values in sorted(latencies.items())
+    }
+    return {
+        'revision': _git_revision(),
+        'config': {
+            'mix': mix, 'concurrency': concurrency, 'requests': requests, 'duration': duration,
+            'warmup': warmup, 'target': base_url or 'in-process', 'users': len(tokens),
+        },
+        'elapsed_s': round(elapsed, 3),
+        'requests': len(all_latencies),
+        'errors': sum(errors.values()),
+        'throughput_rps': round(len(all_latencies) / elapsed, 2) if elapsed else 0,
+        'latency': summarize(all_latencies),
+        'histogram': histogram(all_latencies),
+        'operations': report_operations,
+    }
@@ -0,0 +1,136 @@
+"""
+Concurrent SQLite writers: default settings vs. SQLite production mode.
+
+Writers mimic ``create_task`` followed by ``update_task`` in one transaction
+while readers keep polling the table like dashboards do. The default mode
+uses Django's stock SQLite settings (rollback journal, deferred transactions);
+the production mode uses the pragmas, BEGIN IMMEDIATE and write serializer
+from ``task_manager.sqlite``.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import summarize
+from task_manager.sqlite import WriteSerializer, apply_pragmas, is_lock_error
+
+PARAMS = {
+    'writers': 8,
+    'readers': 4,
+    'writes_per_writer': 200,
+    # Django's default SQLite busy timeout in seconds
+    'timeout': 5.0,
+}
+
+SCHEMA = """
+CREATE TABLE task (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(255) NOT NULL,
+    description TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    priority VARCHAR(20) NOT NULL,
+    created_by_id INTEGER,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+)
+"""
+
+
+def _write_task(conn, writer, index, begin):
+    conn.execute(begin)
+    try:
+        cursor = conn.execute(
+            "INSERT INTO task (title, description, status, priority, created_by_id, created_at, updated_at) "
+            "VALUES (?, ?, 'todo', 'medium', ?, datetime('now'), datetime('now'))",
+            (f"Task {writer}-{index}", "Benchmark task", writer),
+        )
+        conn.execute(
+            "UPDATE task SET status = 'in_progress', updated_at = datetime('now') WHERE id = ?",
+            (cursor.lastrowid,),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _run_mode(path, production, writers, readers, writes_per_writer, timeout):
+    serializer = WriteSerializer(retries=10, backoff=0.01)
+    latencies, errors = [], []
+    record_lock = threading.Lock()
+    stop_readers = threading.Event()
+
+    def connect():
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        if production:
+            apply_pragmas(conn)
+        return conn
+
+    def writer(number):
+        conn = connect()
+        begin = "BEGIN IMMEDIATE" if production else "BEGIN"
+        for index in range(writes_per_writer):
+            start = time.perf_counter()
+            try:
+                if production:
+                    serializer.run(_write_task, conn, number, index, begin)
+                else:
+                    _write_task(conn, number, index, begin)
+            except sqlite3.OperationalError as exc:
+                with record_lock:
+                    errors.append('locked' if is_lock_error(exc) else str(exc))
+                continue
+            with record_lock:
+                latencies.append(time.perf_counter() - start)
+        conn.close()
+
+    def reader():
+        conn = connect()
+        while not stop_readers.is_set():
+            try:
+                conn.execute(
+                    "SELECT id, title, status FROM task WHERE created_by_id = 1 ORDER BY id DESC LIMIT 20"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                pass
+        conn.close()
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in reader_threads:
+        thread.start()
+    started = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop_readers.set()
+    for thread in reader_threads:
+        thread.join()
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'committed': len(latencies),
+        'failed': len(errors),
+        'writes_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'latency': summarize(latencies),
+    }
+
+
+def run(writers, readers, writes_per_writer, timeout):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, production in (('default', False), ('production', True)):
+            path = os.path.join(directory, f'{mode}.sqlite3')
+            with sqlite3.connect(path) as conn:
+                conn.execute(SCHEMA)
+            results[mode] = _run_mode(path, production, writers, readers, writes_per_writer, timeout)
+
+    default_rate = results['default']['writes_per_s']
+    if default_rate:
+        results['speedup'] = round(results['production']['writes_per_s'] / default_rate, 2)
+    return results
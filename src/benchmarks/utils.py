@@ -0,0 +1,109 @@
+"""
+Shared helpers for the benchmark suite.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as milliseconds."""
+    if not latencies:
+        return {'count': 0}
+    return {
+        'count': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def histogram(latencies: List[float]) -> Dict[str, int]:
+    """Count latencies given in seconds per bucket, e.g. ``{'<=5ms': 12}``."""
+    counts = {f'<={bound}ms': 0 for bound in HISTOGRAM_BUCKETS_MS}
+    counts[f'>{HISTOGRAM_BUCKETS_MS[-1]}ms'] = 0
+    labels = list(counts)
+    for latency in latencies:
+        ms = latency * 1000
+        index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if ms <= bound), len(HISTOGRAM_BUCKETS_MS))
+        counts[labels[index]] += 1
+    return counts
+
+
+def compare(baseline: Dict[str, Dict], current: Dict[str, Dict], threshold: float = 0.1) -> List[Dict]:
+    """
+    Compare per-operation reports (operation -> {'latency': summary, ...}).
+
+    A latency percentile that grew, or a throughput that dropped, by more
+    than ``threshold`` (a fraction) is flagged as a regression.
+
+    Returns:
+        One row per operation and metric with both values, the relative
+        change and a ``regression`` flag
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name], current[name]
+        metrics = [(key, before['latency'].get(key), after['latency'].get(key), 1)
+                   for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        metrics.append(('throughput_rps', before.get('throughput_rps'), after.get('throughput_rps'), -1))
+        for metric, old, new, direction in metrics:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append({
+                'operation': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 4),
+                'regression': change * direction > threshold,
+            })
+    return rows
+
+
+@contextmanager
+def stopwatch():
+    """Yield a dict whose ``seconds`` key is set when the block exits."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+
+@contextmanager
+def test_database():
+    """
+    Run the block against freshly migrated test databases, like the test
+    runner does, so benchmarks never touch real data.
+    """
+    setup_test_environment()
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(config, verbosity=0)
+        teardown_test_environment()
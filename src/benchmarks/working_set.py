@@ -0,0 +1,79 @@
+"""
+Read tool latency with and without the in-memory task working set.
+
+One user owns ``tasks`` tasks. ``get_tasks``, ``get_task`` and
+``search_tasks`` are invoked ``iterations`` times each with the working set
+off (queries as before) and on (served from memory after the first load).
+The run context memoization is not involved: the tools get no run context.
+``lookup`` times the working set reads alone, without LangChain's tool
+invocation overhead.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from ai_agent.tools import get_task, get_tasks, search_tasks
+from benchmarks.utils import summarize, test_database
+from tasks_app.models import Task
+from tasks_app.seeding import seed
+from tasks_app.working_set import task_working_set
+
+PARAMS = {
+    'tasks': 200,
+    'iterations': 500,
+}
+
+
+def _measure(tool, args, config, iterations):
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            tool.invoke(args, config=config)
+            latencies.append(time.perf_counter() - start)
+    return {
+        'queries_per_call': round(len(queries) / iterations, 3),
+        'latency': summarize(latencies),
+    }
+
+
+def run(tasks, iterations):
+    results = {}
+    with test_database():
+        cache.clear()
+        seed(users=1, tasks_per_user=tasks, skew=0, username_prefix='working_set_user', seed_value=0)
+        task = Task.objects.order_by('id').first()
+        config = {'configurable': {'created_by': task.created_by_id}}
+        calls = {
+            'get_tasks': (get_tasks, {'limit': 20}),
+            'get_task': (get_task, {'task_id': task.id}),
+            'search_tasks': (search_tasks, {'query': task.title.split()[0], 'limit': 20}),
+        }
+        for enabled in (False, True):
+            task_working_set.clear()
+            with override_settings(AI_TASK_WORKING_SET=enabled):
+                for name, (tool, args) in calls.items():
+                    results[f"{name}_{'working_set' if enabled else 'database'}"] = _measure(
+                        tool, args, config, iterations)
+        with override_settings(AI_TASK_WORKING_SET=True):
+            user_id = task.created_by_id
+            latencies = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                task_working_set.latest(user_id, 20)
+                task_working_set.get(user_id, task.id)
+                latencies.append(time.perf_counter() - start)
+            results['lookup'] = {'latency': summarize(latencies)}
+        results['working_set'] = task_working_set.stats()
+        task_working_set.clear()
+        cache.clear()
+
+    for name in ('get_tasks', 'get_task', 'search_tasks'):
+        before = results[f'{name}_database']['latency']['mean_ms']
+        after = results[f'{name}_working_set']['latency']['mean_ms']
+        if after:
+            results[f'{name}_working_set']['speedup'] = round(before / after, 1)
+    return results
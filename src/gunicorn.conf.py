@@ -0,0 +1,21 @@
+"""
+Gunicorn settings: ``gunicorn -c gunicorn.conf.py task_manager.wsgi``.
+
+With ``AI_AGENT_PRELOAD=true`` the application, including the AI stack, is
+imported once in the master process before the workers are forked. Workers
+then start in milliseconds and share the imported modules copy-on-write,
+and the first chat request in each worker skips the multi-second import.
+Without it every worker imports the application itself and the AI stack is
+loaded lazily on first use.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND") or "0.0.0.0:8000"
+workers = int(os.getenv("GUNICORN_WORKERS") or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.getenv("GUNICORN_THREADS") or "1")
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or "60")
+
+preload_app = (os.getenv("AI_AGENT_PRELOAD") or "false").lower() == "true"
+
@@ -3,6 +3,10 @@ ASGI config for task_manager project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides Django itself, the ASGI application serves the task event push
+channel (WebSocket ``/ws/tasks/`` and Server-Sent Events
+``/api/tasks/events/``), see ``tasks_app.realtime``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_manager.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, the push channel uses the ORM
+from tasks_app.realtime import TaskEventsApp  # noqa: E402
+
+application = TaskEventsApp(django_application)
+
+from django.conf import settings  # noqa: E402
+
+if settings.AI_AGENT_PRELOAD:
+    import ai_agent
+
+    ai_agent.preload()
@@ -0,0 +1,95 @@
+"""
+Database router sending reads to replicas and writes to the primary.
+
+Reads are spread across the aliases listed in ``settings.DATABASE_REPLICAS``.
+As soon as a request (or agent run) writes through the ORM it is pinned to the
+primary for the rest of its lifetime, so it always reads its own writes even
+when the replicas are lagging behind.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY_DATABASE = 'default'
+
+
+class RoutingState:
+    """Mutable per-request routing state.
+
+    The object itself is shared by reference, so a write performed in a
+    worker thread running with a copied context (e.g. a LangGraph tool call)
+    still pins the request that started it.
+    """
+
+    __slots__ = ('pinned',)
+
+    def __init__(self):
+        self.pinned = False
+
+
+_routing_state: ContextVar = ContextVar('db_routing_state', default=None)
+
+
+def _get_state() -> RoutingState:
+    state = _routing_state.get()
+    if state is None:
+        state = RoutingState()
+        _routing_state.set(state)
+    return state
+
+
+def start_request():
+    """Begin a fresh routing scope and return the token to reset it."""
+    return _routing_state.set(RoutingState())
+
+
+def end_request(token):
+    """Restore the routing scope that was active before ``start_request``."""
+    _routing_state.reset(token)
+
+
+def pin_to_primary():
+    """Route all further reads of the current scope to the primary."""
+    _get_state().pinned = True
+
+
+def is_pinned() -> bool:
+    state = _routing_state.get()
+    return state is not None and state.pinned
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to a random replica and writes to the primary.
+
+    Without configured replicas every query goes to the primary, so the
+    router is safe to keep enabled in single-database setups.
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas or is_pinned():
+            return PRIMARY_DATABASE
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias may relate.
+        databases = {PRIMARY_DATABASE, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema through replication.
+        if db in self._replicas():
+            return False
+        return None
@@ -0,0 +1,138 @@
+"""
+Structured, non-blocking logging.
+
+* ``NonBlockingQueueHandler`` puts records on an in-memory queue; a single
+  background thread formats them and does the actual (blocking) I/O.
+* ``CorrelationFilter`` stamps every record with the current request id,
+  which ``RequestIdMiddleware`` binds per request. The id lives in a context
+  variable, so it follows the agent into its tool threads.
+* ``JsonFormatter`` renders one JSON object per line.
+* ``log_payload`` logs bulky debug payloads (tool inputs/outputs) for only a
+  sample of calls, see ``settings.LOG_PAYLOAD_SAMPLE_RATE``.
+
+Use lazy %-style arguments (``logger.info("Task %s saved", pk)``) so nothing
+is formatted when the level is disabled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from django.conf import settings
+
+_request_id: ContextVar = ContextVar('request_id', default=None)
+
+# Attributes of a bare LogRecord; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def bind_request_id(request_id: Optional[str]):
+    """Bind ``request_id`` to all log records emitted inside the block."""
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """Add the current request id to every record."""
+
+    def filter(self, record):
+        request_id = _request_id.get()
+        if request_id is None:
+            # django.request logs 4xx/5xx after the middleware has returned
+            request_id = getattr(getattr(record, 'request', None), 'request_id', None)
+        record.request_id = request_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue records for a background listener thread.
+
+    The calling thread only renders the message and enqueues it; formatting
+    to the final line and writing to the stream happen on the listener.
+
+    Args:
+        stream: Stream the listener writes to (default: stderr)
+        json_format: Emit JSON lines instead of plain text
+    """
+
+    def __init__(self, stream=None, json_format: bool = True):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream or sys.stderr)
+        if json_format:
+            target.setFormatter(JsonFormatter())
+        else:
+            target.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s'))
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self._stop)
+        # Threads do not survive fork(): a preforking server's workers
+        # (gunicorn --preload) need their own listener
+        os.register_at_fork(after_in_child=self._restart_listener)
+
+    def _restart_listener(self):
+        self.listener = QueueListener(self.queue, *self.listener.handlers, respect_handler_level=False)
+        self.listener.start()
+
+    def _stop(self):
+        self.listener.stop()
+
+    def prepare(self, record):
+        # Render the message now (the arguments may change after the call)
+        # but leave the final formatting to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any):
+    """Log a debug payload for a sample of calls only."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= getattr(settings, 'LOG_PAYLOAD_SAMPLE_RATE', 1.0):
+        return
+    logger.debug("%s: %s", message, payload)
@@ -0,0 +1,94 @@
+"""
+Project-wide middleware.
+"""
+
+import logging
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from task_manager import db_router, profiling
+from task_manager.log import bind_request_id
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Give every request its own replica routing scope.
+
+    A write made while handling the request pins its remaining reads to the
+    primary; the pin is dropped once the response has been produced.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_router.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            db_router.end_request(token)
+
+
+class RequestIdMiddleware:
+    """
+    Bind a correlation id to everything logged while handling a request.
+
+    The id is taken from the ``X-Request-ID`` header when the proxy sets one
+    and is echoed back in the response.
+    """
+
+    header = 'HTTP_X_REQUEST_ID'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.META.get(self.header) or uuid4().hex
+        request.request_id = request_id
+        with bind_request_id(request_id):
+            response = self.get_response(request)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests ``task_manager.profiling`` selects (header, user
+    or sample rate) and write the profiles to ``PROFILING_DIR``.
+
+    Unless ``PROFILING_ENABLED`` is set the middleware is left out of the
+    stack. The profile's name is returned in ``X-Profile-Id``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = profiling.selected(request)
+        if reason is None:
+            return self.get_response(request)
+
+        request_id = getattr(request, 'request_id', None) or uuid4().hex
+        with profiling.profiling(profiling.profile_name(request_id)) as session:
+            response = self.get_response(request)
+            if response.streaming:
+                # Batch chat does its work while the body streams: buffer
+                # the body so that work is part of the profile
+                response.streaming_content = list(response.streaming_content)
+
+        metadata = {'request_id': request_id, 'method': request.method, 'path': request.get_full_path(),
+                    'status': response.status_code, 'reason': reason}
+        try:
+            files = session.write(settings.PROFILING_DIR, metadata)
+        except OSError as e:
+            logger.warning("Could not write profile %s: %s", session.name, e)
+        else:
+            logger.info("Profiled %s %s (%s) to %s", request.method, request.path, reason, files[0])
+            response['X-Profile-Id'] = session.name
+        return response
@@ -0,0 +1,419 @@
+"""
+On-demand profiling of selected requests.
+
+With ``PROFILING_ENABLED``, ``ProfilingMiddleware`` profiles a request when
+its ``X-Profile`` header carries ``PROFILING_SECRET``, when its user is one
+of ``PROFILING_USERS`` or when ``PROFILING_SAMPLE_RATE`` picks it, and
+writes the profile to ``PROFILING_DIR``. Without it the middleware removes
+itself from the stack, so requests pay nothing. ``manage.py
+profile_request`` profiles a request in-process whatever the settings.
+
+Engines (``PROFILING_ENGINE``):
+
+* ``sampling`` - samples the stacks of the request's threads every
+  ``PROFILING_INTERVAL`` seconds; ``<name>.folded`` holds the folded stacks
+  that flamegraph.pl, inferno and speedscope read
+* ``cprofile`` - deterministic profile of the request's threads;
+  ``<name>.prof`` for snakeviz, flameprof or gprof2dot
+* ``pyinstrument`` - request thread only, requires the pyinstrument
+  package; ``<name>.speedscope.json``
+
+Every profile comes with ``<name>.json``: the request, its duration, the
+hottest functions and the time per category (``orm``, ``serialization``,
+``tools``, ``llm``, ``waiting``, ``other``). A sample or function belongs to
+the innermost category frame of its stack, so a query issued by a tool
+counts as ``orm`` and the categories add up to the profiled time.
+
+Work a request hands to other threads (the agent's tool threads, the LLM
+router) is followed by ``track_thread``, which the chat code enters in
+threads running with the request's context.
+"""
+
+import contextvars
+import cProfile
+import json
+import logging
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('sampling', 'cprofile', 'pyinstrument')
+
+# Profile file names keep this much of the request id
+PROFILE_NAME_MAX_ID_LENGTH = 64
+_UNSAFE_NAME_CHARACTERS = re.compile(r'[^A-Za-z0-9_-]')
+
+# Innermost match wins; paths use forward slashes
+CATEGORIES = (
+    ('orm', ('/django/db/', '/sqlite3/', '/psycopg', "'sqlite3.")),
+    ('serialization', ('/rest_framework/serializers.py', '/rest_framework/fields.py',
+                       '/rest_framework/relations.py', '/rest_framework/renderers.py',
+                       '/tasks_app/serializers.py')),
+    ('tools', ('/ai_agent/tools.py', '/ai_agent/tools_validator.py')),
+    ('llm', ('/ai_agent/stub_llm.py', '/ai_agent/llm_router.py', '/langchain_google_genai/',
+             '/google/', '/httpx/', '/httpcore/', '/grpc/')),
+)
+# A thread whose innermost frame is one of these is blocked, not busy
+_WAITING = ('/threading.py', '/queue.py', '/concurrent/futures/', '/selectors.py', "'_thread.lock'",
+            "'acquire' of '_thread", 'lock.acquire')
+
+_active = contextvars.ContextVar('profile_session', default=None)
+_count_lock = threading.Lock()
+_running = 0
+_samplers = 0
+_switch_interval = None
+
+
+@lru_cache(maxsize=4096)
+def classify(location: str) -> Optional[str]:
+    """Category of a file path (or built-in function name), None if none."""
+    location = location.replace('\\', '/')
+    for category, patterns in CATEGORIES:
+        if any(pattern in location for pattern in patterns):
+            return category
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _is_waiting(location: str) -> bool:
+    location = location.replace('\\', '/')
+    return any(pattern in location for pattern in _WAITING)
+
+
+def _short(path: str) -> str:
+    path = path.replace('\\', '/')
+    marker = path.rfind('-packages/')
+    if marker != -1:
+        return path[marker + len('-packages/'):]
+    base = str(settings.BASE_DIR).replace('\\', '/') + '/'
+    return path[len(base):] if path.startswith(base) else path
+
+
+def _label(code) -> str:
+    # Folded stacks separate frames with ';' and the count with a space
+    return f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+def _sampler_started(interval: float):
+    global _samplers, _switch_interval
+    with _count_lock:
+        if not _samplers:
+            _switch_interval = sys.getswitchinterval()
+        _samplers += 1
+        # The sampler only runs when it holds the GIL, which busy threads
+        # hand over every switch interval (5 ms by default)
+        sys.setswitchinterval(min(_switch_interval, interval))
+
+
+def _sampler_stopped():
+    global _samplers
+    with _count_lock:
+        _samplers -= 1
+        if not _samplers:
+            sys.setswitchinterval(_switch_interval)
+
+
+def _category_times(samples: Dict[str, float], total: float) -> Dict[str, Dict[str, float]]:
+    names = [category for category, _ in CATEGORIES] + ['waiting', 'other']
+    return {
+        name: {'ms': round(samples.get(name, 0.0) * 1000, 3),
+               'share': round(samples.get(name, 0.0) / total, 4) if total else 0.0}
+        for name in names
+    }
+
+
+class ProfileSession:
+    """
+    One profiled request. Thread-safe.
+
+    Args:
+        name: File name stem of the written profile
+        engine: One of ``ENGINES``
+        interval: Seconds between samples (sampling and pyinstrument)
+    """
+
+    def __init__(self, name: str, engine: str, interval: float = 0.001):
+        if engine not in ENGINES:
+            raise ImproperlyConfigured(f"Unknown profiling engine {engine!r}, expected one of {', '.join(ENGINES)}")
+        self.name = name
+        self.engine = engine
+        self.interval = interval
+        self.duration = 0.0
+        self._lock = threading.Lock()
+        self._request_thread = threading.get_ident()
+        # Thread ident -> number of nested track_thread() blocks
+        self._threads: Dict[int, int] = {}
+        self._seen_threads = set()
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._finished_profiles: List[cProfile.Profile] = []
+        self._stacks: Counter = Counter()
+        self._ticks = 0
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._pyinstrument = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.engine == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImproperlyConfigured("PROFILING_ENGINE=pyinstrument requires the pyinstrument package")
+            self._pyinstrument = Profiler(interval=self.interval, async_mode='disabled')
+            self._pyinstrument.start()
+        self.enter_thread()
+        if self.engine == 'sampling':
+            _sampler_started(self.interval)
+            self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self.exit_thread()
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            _sampler_stopped()
+        if self._pyinstrument is not None:
+            self._pyinstrument.stop()
+        self.duration = time.perf_counter() - self._started
+
+    def enter_thread(self):
+        """Include the calling thread until the matching ``exit_thread``."""
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0)
+            self._threads[ident] = depth + 1
+            self._seen_threads.add(ident)
+            if depth or self.engine != 'cprofile':
+                return
+            profile = self._profiles[ident] = cProfile.Profile()
+        # Outside the lock: enable() profiles the calling thread only
+        profile.enable()
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+                return
+            self._threads.pop(ident, None)
+            profile = self._profiles.pop(ident, None)
+        if profile is not None:
+            profile.disable()
+            with self._lock:
+                self._finished_profiles.append(profile)
+
+    # Sampling engine
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads)
+            self._ticks += 1
+            for ident in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if stack:
+                    role = 'request' if ident == self._request_thread else 'worker'
+                    self._stacks[(role,) + tuple(reversed(stack))] += 1
+
+    def _stack_category(self, stack) -> str:
+        for code in reversed(stack[1:]):
+            category = classify(code.co_filename)
+            if category is not None:
+                return category
+        return 'waiting' if _is_waiting(stack[-1].co_filename) else 'other'
+
+    # Results
+
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        """Time per category and the ``top`` functions by self time."""
+        if self.engine == 'sampling':
+            seconds = self.duration / self._ticks if self._ticks else self.interval
+            categories, hot = Counter(), Counter()
+            for stack, count in self._stacks.items():
+                categories[self._stack_category(stack)] += count * seconds
+                hot[_label(stack[-1])] += count * seconds
+        elif self.engine == 'cprofile':
+            categories, hot = Counter(), Counter()
+            for (path, line, function), (_, _, self_time, _, _) in self._stats().stats.items():
+                location = path if path != '~' else function
+                category = classify(location) or ('waiting' if _is_waiting(location) else 'other')
+                categories[category] += self_time
+                label = f"{function} ({_short(path)}:{line})" if path != '~' else function
+                hot[label] += self_time
+        else:
+            categories, hot = Counter(), Counter()
+            root = self._pyinstrument.last_session.root_frame() if self._pyinstrument.last_session else None
+            if root is not None:
+                self._walk_pyinstrument(root, None, '', '', categories, hot)
+        total = sum(categories.values())
+        return {
+            'engine': self.engine,
+            'duration_ms': round(self.duration * 1000, 3),
+            'profiled_ms': round(total * 1000, 3),
+            'threads': len(self._seen_threads),
+            'categories': _category_times(categories, total),
+            'hot': [{'function': label, 'self_ms': round(seconds * 1000, 3)}
+                    for label, seconds in hot.most_common(top)],
+        }
+
+    def _walk_pyinstrument(self, frame, category, label, location, categories: Counter, hot: Counter):
+        # pyinstrument 5 keeps self time in synthetic '[self]' children
+        if not getattr(frame, 'is_synthetic', False):
+            location = f"{frame.file_path or ''} {frame.function}"
+            category = classify(location) or category
+            label = f"{frame.function} ({_short(frame.file_path or '')}:{frame.line_no})"
+        self_time = frame.time - sum(child.time for child in frame.children)
+        if self_time > 0:
+            waiting = category is None and _is_waiting(location)
+            categories[category or ('waiting' if waiting else 'other')] += self_time
+            hot[label] += self_time
+        for child in frame.children:
+            self._walk_pyinstrument(child, category, label, location, categories, hot)
+
+    def _stats(self) -> pstats.Stats:
+        profiles = list(self._finished_profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def write(self, directory, metadata: Optional[Dict[str, Any]] = None, top: int = 15) -> List[Path]:
+        """Write the profile and its summary; returns the written files."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        if self.engine == 'sampling':
+            path = directory / f'{self.name}.folded'
+            with open(path, 'w', encoding='utf-8') as output:
+                for stack, count in self._stacks.items():
+                    frames = [stack[0]] + [_label(code) for code in stack[1:]]
+                    output.write(f"{';'.join(frames)} {count}\n")
+        elif self.engine == 'cprofile':
+            path = directory / f'{self.name}.prof'
+            self._stats().dump_stats(path)
+        else:
+            from pyinstrument.renderers import SpeedscopeRenderer
+
+            path = directory / f'{self.name}.speedscope.json'
+            path.write_text(self._pyinstrument.output(renderer=SpeedscopeRenderer()), encoding='utf-8')
+        files.append(path)
+
+        summary_path = directory / f'{self.name}.json'
+        record = {**(metadata or {}), **self.summary(top), 'profile': path.name}
+        summary_path.write_text(json.dumps(record, indent=2, default=str), encoding='utf-8')
+        files.append(summary_path)
+        return files
+
+
+def current_session() -> Optional[ProfileSession]:
+    return _active.get()
+
+
+@contextmanager
+def profiling(name: str, engine: Optional[str] = None, interval: Optional[float] = None) -> Iterator[ProfileSession]:
+    """Profile the block and the threads it hands work to."""
+    global _running
+    session = ProfileSession(
+        name, engine or getattr(settings, 'PROFILING_ENGINE', 'sampling'),
+        interval or getattr(settings, 'PROFILING_INTERVAL', 0.001))
+    token = _active.set(session)
+    with _count_lock:
+        _running += 1
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _active.reset(token)
+        with _count_lock:
+            _running -= 1
+
+
+@contextmanager
+def track_thread(session: Optional[ProfileSession] = None):
+    """
+    Include the calling thread in ``session`` (default: the profile session
+    of the current context) while the block runs; a no-op without one.
+    """
+    session = session or _active.get()
+    if session is None:
+        yield
+        return
+    token = _active.set(session)
+    session.enter_thread()
+    try:
+        yield
+    finally:
+        session.exit_thread()
+        _active.reset(token)
+
+
+def selected(request) -> Optional[str]:
+    """Why the request should be profiled (header, user, sample), or None."""
+    if _active.get() is not None:
+        # Already profiled, e.g. by manage.py profile_request
+        return None
+    with _count_lock:
+        if _running >= getattr(settings, 'PROFILING_MAX_ACTIVE', 2):
+            return None
+    secret = getattr(settings, 'PROFILING_SECRET', '')
+    if secret and request.headers.get('X-Profile') == secret:
+        return 'header'
+    users = getattr(settings, 'PROFILING_USERS', [])
+    if users and _username(request) in users:
+        return 'user'
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def _username(request) -> Optional[str]:
+    # The API authenticates in the views: look the token up the same way,
+    # which leaves it in the token cache for the view
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Token '):
+        from rest_framework.exceptions import AuthenticationFailed
+        from tasks_app.authentication import CachedTokenAuthentication
+
+        try:
+            user, _ = CachedTokenAuthentication().authenticate_credentials(authorization[6:].strip())
+        except AuthenticationFailed:
+            return None
+        return user.username
+    user = getattr(request, 'user', None)
+    return user.username if user is not None and user.is_authenticated else None
+
+
+def profile_name(request_id: str) -> str:
+    """
+    File name stem of a request's profile.
+
+    The request id may come from the client's ``X-Request-ID`` header, so
+    only its ``[A-Za-z0-9_-]`` characters are kept (at most
+    ``PROFILE_NAME_MAX_ID_LENGTH``); an id with none gets a random one.
+    """
+    safe_id = _UNSAFE_NAME_CHARACTERS.sub('', request_id)[:PROFILE_NAME_MAX_ID_LENGTH] or uuid4().hex
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{safe_id}"
+
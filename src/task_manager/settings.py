@@ -50,13 +50,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'task_manager.middleware.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'task_manager.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'task_manager.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'task_manager.urls'
@@ -82,13 +85,70 @@ WSGI_APPLICATION = 'task_manager.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DB_ENGINE = os.getenv("DB_ENGINE") or "django.db.backends.sqlite3"
+DB_IS_SQLITE = DB_ENGINE == "django.db.backends.sqlite3"
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv("DB_NAME") or BASE_DIR / 'db.sqlite3',
+        'USER': os.getenv("DB_USER", ""),
+        'PASSWORD': os.getenv("DB_PASSWORD", ""),
+        'HOST': os.getenv("DB_HOST", ""),
+        'PORT': os.getenv("DB_PORT", ""),
+        # Keep connections open between requests and ping them before reuse
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE") or "60"),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Native connection pooling (PostgreSQL with psycopg 3). The pool manages
+# connection lifetime itself, so persistent connections must be disabled.
+if (os.getenv("DB_POOL") or "false").lower() == "true" and not DB_IS_SQLITE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv("DB_POOL_MIN_SIZE") or "2"),
+        'max_size': int(os.getenv("DB_POOL_MAX_SIZE") or "10"),
+        'timeout': int(os.getenv("DB_POOL_TIMEOUT") or "10"),
+    }
+
+# SQLite production mode: WAL journaling and tuned pragmas on every new
+# connection (see task_manager/sqlite.py), BEGIN IMMEDIATE transactions so
+# writers queue on the busy timeout instead of failing on lock upgrades, and
+# an in-process write serializer with retry.
+SQLITE_PRODUCTION_MODE = DB_IS_SQLITE and (os.getenv("SQLITE_PRODUCTION_MODE") or "false").lower() == "true"
+if SQLITE_PRODUCTION_MODE:
+    DATABASES['default']['OPTIONS'].update({
+        'timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT") or "20"),
+        'transaction_mode': 'IMMEDIATE',
+    })
+# Overrides for task_manager.sqlite.DEFAULT_PRAGMAS, e.g. {'mmap_size': 0}
+SQLITE_PRAGMAS = {}
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_BACKOFF = 0.05
+
+# Read replicas: a comma separated list of hosts (or database files for
+# SQLite). For local testing, "DB_REPLICAS=db.sqlite3,db.sqlite3" opens two
+# extra connections to the primary file as stand-in replicas.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1):
+    alias = f'replica_{index}'
+    location = replica.strip()
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests run against the primary only
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_IS_SQLITE:
+        DATABASES[alias]['NAME'] = BASE_DIR / location
+    else:
+        DATABASES[alias]['HOST'] = location
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['task_manager.db_router.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,6 +181,50 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Token authentication cache (tasks_app/authentication.py)
+
+# Seconds a validated token stays in the shared cache
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT") or "300")
+# Seconds a token stays in the per-process cache; bounds how long a token
+# revoked in another process is still accepted here
+AUTH_TOKEN_LOCAL_TTL = float(os.getenv("AUTH_TOKEN_LOCAL_TTL") or "5")
+AUTH_TOKEN_LOCAL_MAX_SIZE = 10000
+
+
+# Logging
+# Records are queued and written by a background thread (task_manager/log.py)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL") or "INFO"
+# Share of debug-level tool payloads that are actually logged (0.0 - 1.0)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE") or "0.1")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'correlation': {'()': 'task_manager.log.CorrelationFilter'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'task_manager.log.NonBlockingQueueHandler',
+            'json_format': (os.getenv("LOG_FORMAT") or "json") == "json",
+            'filters': ['correlation'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
@@ -132,6 +236,85 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Cache
+# A shared cache (Redis) is required for per-user cache invalidation to be
+# visible across processes; the local-memory cache only serves one process.
+
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached per-user task response is kept
+TASK_CACHE_TIMEOUT = int(os.getenv("TASK_CACHE_TIMEOUT") or "300")
+
+# Idempotency-Key support on task writes and chat (tasks_app/idempotency.py):
+# seconds a response is kept for retries, seconds a retry waits for the
+# identical request still in progress
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL") or "86400")
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT") or "60")
+
+
+# Delta sync (GET /api/tasks/changes/)
+# Days delete tombstones are kept; older cursors must resync from scratch
+TASK_TOMBSTONE_RETENTION_DAYS = int(os.getenv("TASK_TOMBSTONE_RETENTION_DAYS") or "30")
+# Changes younger than this many seconds wait for the next sync, so rows of
+# transactions that have not committed yet are not skipped. Changes are
+# ordered by when they were stamped: a write committing more than this long
+# after stamping its row is missed, so keep it above the longest write
+# transaction (e.g. queued SQLite writers).
+TASK_SYNC_SAFETY_WINDOW = float(os.getenv("TASK_SYNC_SAFETY_WINDOW") or "1.0")
+
+
+# Fuzzy task title resolution for the agent tools (tasks_app/search.py)
+# Minimum trigram similarity (0-1) for a title to be considered a match
+TASK_TITLE_MATCH_THRESHOLD = 0.5
+# How far the best match must lead the runner-up to be picked on its own
+TASK_TITLE_MATCH_MARGIN = 0.15
+# Users whose title index is kept in memory per process
+TASK_TITLE_INDEX_MAX_USERS = 1000
+
+# Approximate usernames, names and emails (tasks_app/user_directory.py)
+# Minimum trigram similarity (0-1) for a user to be suggested
+USER_MATCH_THRESHOLD = 0.5
+
+
+# Overdue / due-soon digests (tasks_app/due.py, manage.py scan_due_tasks)
+# Open tasks due within this many days count as due soon
+TASK_DUE_SOON_DAYS = int(os.getenv("TASK_DUE_SOON_DAYS") or "3")
+# Tasks listed per digest section (the counts include all of them)
+TASK_DIGEST_MAX_ITEMS = 20
+# Seconds between scans of scan_due_tasks --loop
+TASK_SCAN_INTERVAL = int(os.getenv("TASK_SCAN_INTERVAL") or "300")
+
+# Archival of completed tasks (tasks_app/archive.py, manage.py archive_tasks)
+# Tasks done for more than this many days leave the hot table
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv("TASK_ARCHIVE_AFTER_DAYS") or "30")
+# Tasks moved per write transaction, seconds between archive_tasks --loop runs
+TASK_ARCHIVE_BATCH_SIZE = int(os.getenv("TASK_ARCHIVE_BATCH_SIZE") or "500")
+TASK_ARCHIVE_INTERVAL = int(os.getenv("TASK_ARCHIVE_INTERVAL") or "3600")
+
+
+# Task event push (ASGI only, see tasks_app/realtime.py)
+# Use 'tasks_app.events.RedisBackend' when writes happen in other processes
+# than the ones serving push connections (requires REDIS_URL and redis-py)
+TASK_EVENTS_BACKEND = os.getenv("TASK_EVENTS_BACKEND") or "tasks_app.events.InProcessBackend"
+# Distinct pending tasks per connection before it is told to resync
+TASK_EVENTS_MAX_PENDING = 500
+# Seconds between SSE keepalive comments
+TASK_EVENTS_HEARTBEAT = 15
+
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -139,7 +322,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',  # If you use Token Auth
+        # TokenAuthentication with cached token lookups
+        'tasks_app.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
@@ -148,4 +332,75 @@ REST_FRAMEWORK = {
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 # Default to a Google model
-GOOGLE_AI_MODEL = os.getenv("GOOGLE_AI_MODEL", "gemini-1.5-flash")
+GOOGLE_AI_MODEL = os.getenv("GOOGLE_AI_MODEL") or "gemini-1.5-flash"
+
+# "gemini" or "stub" (ai_agent/stub_llm.py, for load tests and profiling)
+AI_LLM_BACKEND = os.getenv("AI_LLM_BACKEND") or "gemini"
+# Simulated seconds per model call of the stub backend
+AI_STUB_LLM_LATENCY = float(os.getenv("AI_STUB_LLM_LATENCY") or "0")
+
+# LLM router (ai_agent/llm_router.py): comma separated backend:model[?options]
+# entries, e.g. "gemini:gemini-1.5-flash,gemini:gemini-1.5-pro"; when set it
+# replaces AI_LLM_BACKEND/GOOGLE_AI_MODEL
+AI_LLM_MODELS = os.getenv("AI_LLM_MODELS", "")
+# Send a second request when the first model passes its p95 latency (not
+# earlier than AI_LLM_HEDGE_MIN_MS)
+AI_LLM_HEDGE = (os.getenv("AI_LLM_HEDGE") or "true").lower() == "true"
+AI_LLM_HEDGE_MIN_MS = float(os.getenv("AI_LLM_HEDGE_MIN_MS") or "200")
+# Consecutive failures that open a model's circuit breaker, seconds it stays open
+AI_LLM_BREAKER_FAILURES = int(os.getenv("AI_LLM_BREAKER_FAILURES") or "3")
+AI_LLM_BREAKER_COOLDOWN = float(os.getenv("AI_LLM_BREAKER_COOLDOWN") or "30")
+# Threads running the routed model requests
+AI_LLM_ROUTER_WORKERS = 32
+
+# POST /api/ai/chat/: first (the original single message body), last or full
+# ({"data": [...]}) tool messages; body size cap in bytes (0: none)
+AI_CHAT_RESPONSE_MODE = os.getenv("AI_CHAT_RESPONSE_MODE") or "first"
+AI_CHAT_MAX_RESPONSE_BYTES = int(os.getenv("AI_CHAT_MAX_RESPONSE_BYTES") or "1048576")
+
+# Also share read tool results (get_tasks, get_task, search_tasks) between a
+# user's chat turns through the shared cache, not only within one turn
+AI_TOOL_CACHE_ACROSS_RUNS = (os.getenv("AI_TOOL_CACHE_ACROSS_RUNS") or "false").lower() == "true"
+
+# Serve get_tasks, get_task and the search tools from an in-memory per-user
+# working set of task records (tasks_app/working_set.py)
+AI_TASK_WORKING_SET = (os.getenv("AI_TASK_WORKING_SET") or "false").lower() == "true"
+# Memory caps per process: users held, task records held, and users with
+# more tasks than this are always read from the database
+AI_TASK_WORKING_SET_MAX_USERS = int(os.getenv("AI_TASK_WORKING_SET_MAX_USERS") or "1000")
+AI_TASK_WORKING_SET_MAX_TASKS = int(os.getenv("AI_TASK_WORKING_SET_MAX_TASKS") or "100000")
+AI_TASK_WORKING_SET_MAX_TASKS_PER_USER = int(os.getenv("AI_TASK_WORKING_SET_MAX_TASKS_PER_USER") or "500")
+# Independently locked segments, each with its own LRU order
+AI_TASK_WORKING_SET_SHARDS = 16
+
+# POST /api/ai/chat/batch/: messages per request, messages processed at once
+AI_CHAT_BATCH_MAX_MESSAGES = int(os.getenv("AI_CHAT_BATCH_MAX_MESSAGES") or "50")
+AI_CHAT_BATCH_WORKERS = int(os.getenv("AI_CHAT_BATCH_WORKERS") or "4")
+
+# Agent run traces (ai_agent/tracing.py, replay with manage.py replay_trace)
+AI_TRACE_ENABLED = (os.getenv("AI_TRACE_ENABLED") or "false").lower() == "true"
+AI_TRACE_DIR = os.getenv("AI_TRACE_DIR") or BASE_DIR / 'traces'
+# Only keep traces of chat turns slower than this
+AI_TRACE_MIN_DURATION_MS = float(os.getenv("AI_TRACE_MIN_DURATION_MS") or "0")
+# Size of a trace file before it is rotated, and rotated files kept
+AI_TRACE_MAX_BYTES = 10 * 1024 * 1024
+AI_TRACE_BACKUP_COUNT = 5
+
+# On-demand request profiling (task_manager/profiling.py, manage.py profile_request)
+PROFILING_ENABLED = (os.getenv("PROFILING_ENABLED") or "false").lower() == "true"
+# Requests sending this value in an X-Profile header are profiled (empty: never)
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+# Usernames whose requests are all profiled, and the share of other requests
+PROFILING_USERS = [name.strip() for name in os.getenv("PROFILING_USERS", "").split(",") if name.strip()]
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE") or "0")
+# sampling (folded stacks), cprofile (.prof) or pyinstrument (speedscope JSON)
+PROFILING_ENGINE = os.getenv("PROFILING_ENGINE") or "sampling"
+# Seconds between stack samples
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL") or "0.001")
+PROFILING_DIR = os.getenv("PROFILING_DIR") or BASE_DIR / 'profiles'
+# Requests profiled at once per process; further selected ones run unprofiled
+PROFILING_MAX_ACTIVE = 2
+
+# Import the AI stack when the WSGI/ASGI application loads instead of on the
+# first chat request (see gunicorn.conf.py for preloading before fork)
+AI_AGENT_PRELOAD = (os.getenv("AI_AGENT_PRELOAD") or "false").lower() == "true"
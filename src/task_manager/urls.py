@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from tasks_app.views import chat_with_agent
+from tasks_app.views import chat_batch, chat_with_agent, llm_health, tool_cache_stats
 
 
 urlpatterns = [
@@ -24,4 +24,7 @@ urlpatterns = [
     path('api/', include('tasks_app.urls')),  # DRF API endpoints
     # AI interaction endpoint
     path('api/ai/chat/', chat_with_agent, name='ai_chat'),
+    path('api/ai/chat/batch/', chat_batch, name='ai_chat_batch'),
+    path('api/ai/tool-cache/', tool_cache_stats, name='ai_tool_cache'),
+    path('api/ai/llm-health/', llm_health, name='ai_llm_health'),
 ]
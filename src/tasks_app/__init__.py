@@ -1,3 +1,3 @@
-from tasks_app.constants import STATUS_CHOICES, PRIORITY_CHOICES
+from tasks_app.constants import STATUS_CHOICES, PRIORITY_CHOICES, STATUS_TRANSITIONS
 
-__all__ = ['STATUS_CHOICES', 'PRIORITY_CHOICES']
+__all__ = ['STATUS_CHOICES', 'PRIORITY_CHOICES', 'STATUS_TRANSITIONS']
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class TasksAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks_app'
+
+    def ready(self):
+        from task_manager.sqlite import configure_connection
+        from tasks_app import signals  # noqa: F401
+
+        connection_created.connect(
+            configure_connection, dispatch_uid='task_manager.sqlite.configure_connection')
@@ -0,0 +1,100 @@
+"""
+Archival of completed tasks.
+
+Tasks that have been ``done`` for more than ``TASK_ARCHIVE_AFTER_DAYS`` days
+are moved from ``Task`` to ``ArchivedTask`` in batches, one short write
+transaction per batch, so per-user scans of the hot table only see open
+and recently completed tasks however much history accumulates.
+
+A moved task disappears from the user's task list like a deleted one:
+delta sync clients get a tombstone, the users' cached task data and title
+indexes are invalidated through ``tasks_bulk_changed``. Archived tasks are
+read through ``TaskViewSet.archived`` and the ``search_task_history`` tool.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.sql import DeleteQuery
+from django.utils import timezone
+
+from task_manager.sqlite import serialized_write
+from tasks_app.models import ArchivedTask, Task, TaskTombstone
+from tasks_app.signals import tasks_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_STATUSES = ('done',)
+
+_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'due_date',
+           'assigned_to_id', 'created_by_id', 'created_at', 'updated_at')
+
+
+def archive_after_days() -> int:
+    return getattr(settings, 'TASK_ARCHIVE_AFTER_DAYS', 30)
+
+
+@serialized_write
+def _archive_batch(cutoff, batch_size: int, now) -> int:
+    """Move up to ``batch_size`` archivable tasks; returns how many were moved."""
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        # Read inside the transaction: a task reopened meanwhile stays
+        rows = list(
+            Task.objects.filter(status__in=ARCHIVED_STATUSES, updated_at__lt=cutoff)
+            .order_by('updated_at').values(*_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedTask.objects.bulk_create(
+            [ArchivedTask(archived_at=now, **row) for row in rows], ignore_conflicts=True)
+        # Nothing references tasks: delete without loading them or sending
+        # post_delete per task, the bulk signal below covers the receivers
+        DeleteQuery(Task).delete_batch([row['id'] for row in rows], DEFAULT_DB_ALIAS)
+
+        tombstones, user_ids = [], set()
+        for row in rows:
+            visible = {row['created_by_id'], row['assigned_to_id']} - {None}
+            user_ids |= visible
+            tombstones.extend(TaskTombstone(task_id=row['id'], user_id=user_id, deleted_at=now)
+                              for user_id in visible)
+        TaskTombstone.objects.bulk_create(tombstones)
+        tasks_bulk_changed.send(sender=Task, user_ids=user_ids, using=DEFAULT_DB_ALIAS)
+    return len(rows)
+
+
+def archive_done_tasks(days: Optional[int] = None, batch_size: int = 500, max_batches: Optional[int] = None,
+                       pause: float = 0.0, now=None) -> Dict[str, Any]:
+    """
+    Move tasks completed more than ``days`` days ago to the archive.
+
+    Args:
+        days: Age in days of the last change (default: TASK_ARCHIVE_AFTER_DAYS)
+        batch_size: Tasks moved per write transaction
+        max_batches: Stop after this many batches (default: until done)
+        pause: Seconds to sleep between batches, leaving room to other writers
+        now: Time to archive for (default: now)
+
+    Returns:
+        Dictionary with the number of tasks ``archived``, the ``batches``
+        and the ``cutoff`` used
+    """
+    now = now or timezone.now()
+    days = archive_after_days() if days is None else days
+    cutoff = now - timedelta(days=days)
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = _archive_batch(cutoff, batch_size, now)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    logger.info("Archived %d tasks done before %s in %d batches", archived, cutoff, batches)
+    return {'archived': archived, 'batches': batches, 'cutoff': cutoff.isoformat()}
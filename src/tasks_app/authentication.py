@@ -0,0 +1,163 @@
+"""
+Token authentication with cached token lookups.
+
+DRF's ``TokenAuthentication`` loads the token and its user with one query
+per request. ``CachedTokenAuthentication`` keeps validated tokens in a small
+per-process LRU backed by the shared Django cache:
+
+* a local hit costs a dict lookup and no I/O at all,
+* a shared cache hit costs one cache round trip,
+* only a miss in both queries the database.
+
+Only the token's creation time and the user's columns without the password
+hash are cached; every request gets fresh Token/User instances built from
+them, with the password deferred. The Token/User signal receivers in
+``tasks_app.signals`` drop a token from both levels when the token or its
+user changes. Local entries expire after
+``AUTH_TOKEN_LOCAL_TTL`` seconds, which bounds how long another process may
+keep accepting a token that was revoked elsewhere.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_KEY = 'auth:token:{digest}'
+
+# Never cached, loaded on access if ever needed
+UNCACHED_USER_FIELDS = ('password',)
+
+
+def _cache_key(key: str) -> str:
+    # Never put the raw token into cache keys (they show up in monitoring)
+    return TOKEN_CACHE_KEY.format(digest=hashlib.sha256(key.encode()).hexdigest())
+
+
+def _user_fields(user_model) -> List[str]:
+    # In concrete field order, as Model.from_db expects
+    return [field.attname for field in user_model._meta.concrete_fields if field.name not in UNCACHED_USER_FIELDS]
+
+
+def _to_entry(token: Token) -> Dict[str, Any]:
+    """Cache entry of a token: its creation time and its user's columns."""
+    fields = _user_fields(type(token.user))
+    return {'created': token.created, 'user': [getattr(token.user, name) for name in fields]}
+
+
+def _from_entry(key: str, entry: Dict[str, Any]) -> Token:
+    """New Token and User instances from a cache entry, without a query."""
+    user_model = Token._meta.get_field('user').related_model
+    user = user_model.from_db(DEFAULT_DB_ALIAS, _user_fields(user_model), entry['user'])
+    token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'], [key, user.pk, entry['created']])
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """Two-level cache of validated tokens keyed by token key."""
+
+    def __init__(self):
+        # key -> (expiry, entry)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_local(self, key: str) -> Optional[Token]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, entry = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return _from_entry(key, entry)
+
+    def get(self, key: str) -> Optional[Token]:
+        token = self.get_local(key)
+        if token is None:
+            entry = cache.get(_cache_key(key))
+            if entry is not None:
+                self._set_local(key, entry)
+                token = _from_entry(key, entry)
+        return token
+
+    def set(self, key: str, token: Token):
+        entry = _to_entry(token)
+        cache.set(_cache_key(key), entry, getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300))
+        self._set_local(key, entry)
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        cache.delete_many([_cache_key(key) for key in keys])
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, key: str, entry: Dict[str, Any]):
+        expires_at = time.monotonic() + getattr(settings, 'AUTH_TOKEN_LOCAL_TTL', 5)
+        with self._lock:
+            self._local[key] = (expires_at, entry)
+            self._local.move_to_end(key)
+            while len(self._local) > getattr(settings, 'AUTH_TOKEN_LOCAL_MAX_SIZE', 10000):
+                self._local.popitem(last=False)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for ``TokenAuthentication`` with cached lookups.
+
+    Clients authenticate with the ``Authorization: Token <key>`` header as
+    before. ``aauthenticate_credentials`` serves async code (the ASGI event
+    endpoints) and only leaves the event loop on a local cache miss.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            token = self._load(key)
+        return self._check(token)
+
+    async def aauthenticate_credentials(self, key):
+        token = token_cache.get_local(key)
+        if token is None:
+            token = await sync_to_async(self._load_shared)(key)
+        return self._check(token)
+
+    def _load_shared(self, key) -> Token:
+        token = token_cache.get(key)
+        return token if token is not None else self._load(key)
+
+    def _load(self, key) -> Token:
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').defer(
+                *(f'user__{name}' for name in UNCACHED_USER_FIELDS)).get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if token.user.is_active:
+            # Inactive users are not cached, they fail on every request
+            token_cache.set(key, token)
+        return token
+
+    def _check(self, token: Token):
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
@@ -0,0 +1,224 @@
+"""
+Streaming bulk import and export of tasks in CSV and JSONL.
+
+Imports are processed in chunks: assignee usernames of a chunk are resolved
+with one query, rows are validated with the same rules as ``TaskSerializer``
+and valid rows are written with ``bulk_create``. Exports stream rows from a
+server-side iterator, so memory use stays flat regardless of the row count.
+"""
+
+import csv
+import json
+from datetime import date
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework import serializers
+
+from task_manager.sqlite import serialized_write
+from tasks_app import PRIORITY_CHOICES, STATUS_CHOICES
+from tasks_app.models import Task
+from tasks_app.serializers import TaskSerializer
+from tasks_app.signals import tasks_bulk_changed
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+EXPORT_FIELDS = [
+    'id', 'title', 'description', 'status', 'priority', 'due_date',
+    'assigned_to', 'created_by', 'created_at', 'updated_at',
+]
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+_VALID_STATUSES = {choice[0] for choice in STATUS_CHOICES}
+_VALID_PRIORITIES = {choice[0] for choice in PRIORITY_CHOICES}
+_TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+
+def format_for_content_type(content_type: str) -> Optional[str]:
+    """Map a request content type to an import format."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'jsonl'
+    return None
+
+
+def read_records(text_stream, file_format: str) -> Iterator[Dict[str, Any]]:
+    """Lazily parse task records from a text stream."""
+    if file_format == 'csv':
+        yield from csv.DictReader(text_stream)
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {'__error__': f"Invalid JSON on line {line_number}: {e.msg}"}
+            yield record if isinstance(record, dict) else {'__error__': f"Line {line_number} is not an object"}
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'. Use one of: {', '.join(FORMATS)}")
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class TaskImporter:
+    """
+    Import task records for one user in batches.
+
+    Usage:
+        result = TaskImporter(user).run(read_records(stream, 'csv'))
+    """
+
+    def __init__(self, created_by: User, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.created_by = created_by
+        self.batch_size = max(1, batch_size)
+        # Reuse TaskSerializer's field rules without building a serializer per row
+        self._rules = TaskSerializer()
+        self._user_ids: Dict[str, Optional[int]] = {}
+
+    def run(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Validate and insert the records.
+
+        Returns:
+            Dictionary with the number of ``created`` and ``failed`` rows and
+            the first validation ``errors`` (row number and messages)
+        """
+        created, failed, errors = 0, 0, []
+        row_number = 0
+        for chunk in _chunks(records, self.batch_size):
+            self._resolve_usernames(chunk)
+            tasks = []
+            for record in chunk:
+                row_number += 1
+                task, row_errors = self._build_task(record)
+                if row_errors:
+                    failed += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': row_number, 'errors': row_errors})
+                else:
+                    tasks.append(task)
+            if tasks:
+                created += len(self._insert(tasks))
+        return {'created': created, 'failed': failed, 'errors': errors}
+
+    def _resolve_usernames(self, chunk: List[Dict[str, Any]]):
+        """Resolve the chunk's unknown assignee usernames with one query."""
+        usernames = {
+            str(record.get('assigned_to') or '').strip() for record in chunk
+        } - set(self._user_ids) - {''}
+        if not usernames:
+            return
+        found = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        for username in usernames:
+            self._user_ids[username] = found.get(username)
+
+    def _build_task(self, record: Dict[str, Any]):
+        if '__error__' in record:
+            return None, {'non_field_errors': [record['__error__']]}
+
+        errors = {}
+        values = {}
+
+        for field in ('title', 'description'):
+            value = str(record.get(field) or '')
+            try:
+                values[field] = getattr(self._rules, f'validate_{field}')(value)
+            except serializers.ValidationError as e:
+                errors[field] = list(e.detail)
+        if 'title' in values and len(values['title']) > _TITLE_MAX_LENGTH:
+            errors['title'] = [f"Ensure this field has no more than {_TITLE_MAX_LENGTH} characters."]
+
+        status = str(record.get('status') or 'todo').strip().lower()
+        if status not in _VALID_STATUSES:
+            errors['status'] = [f'"{status}" is not a valid choice.']
+        priority = str(record.get('priority') or 'medium').strip().lower()
+        if priority not in _VALID_PRIORITIES:
+            errors['priority'] = [f'"{priority}" is not a valid choice.']
+
+        due_date = None
+        if record.get('due_date'):
+            try:
+                due_date = date.fromisoformat(str(record['due_date']).strip()[:10])
+            except ValueError:
+                errors['due_date'] = ["Date has wrong format. Use YYYY-MM-DD."]
+
+        assigned_to_id = None
+        username = str(record.get('assigned_to') or '').strip()
+        if username:
+            assigned_to_id = self._user_ids.get(username)
+            if assigned_to_id is None:
+                errors['assigned_to'] = [f'User "{username}" does not exist.']
+
+        if errors:
+            return None, errors
+        return Task(
+            title=values['title'],
+            description=values['description'],
+            status=status,
+            priority=priority,
+            due_date=due_date,
+            assigned_to_id=assigned_to_id,
+            created_by=self.created_by,
+        ), None
+
+    def _insert(self, tasks: List[Task]) -> List[Task]:
+        @serialized_write
+        def insert():
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                created = Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+                user_ids = {self.created_by.id} | {task.assigned_to_id for task in tasks}
+                user_ids.discard(None)
+                tasks_bulk_changed.send(sender=Task, user_ids=user_ids, using=DEFAULT_DB_ALIAS)
+                return created
+
+        return insert()
+
+
+def export_rows(queryset) -> Iterator[Dict[str, Any]]:
+    """Stream task rows as plain dicts with usernames instead of user ids."""
+    rows = queryset.order_by('id').values(
+        'id', 'title', 'description', 'status', 'priority', 'due_date',
+        'assigned_to__username', 'created_by__username', 'created_at', 'updated_at',
+    ).iterator(chunk_size=2000)
+    for row in rows:
+        row['assigned_to'] = row.pop('assigned_to__username')
+        row['created_by'] = row.pop('created_by__username')
+        yield row
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def render_rows(rows: Iterable[Dict[str, Any]], file_format: str) -> Iterator[str]:
+    """Render rows to CSV or JSONL text, one line at a time."""
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(['' if row[f] is None else _isoformat(row[f]) for f in EXPORT_FIELDS])
+    elif file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps({f: _isoformat(row[f]) for f in EXPORT_FIELDS}) + '\n'
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'. Use one of: {', '.join(FORMATS)}")
@@ -0,0 +1,57 @@
+"""
+Per-user caching of task data.
+
+Every user owns a data version in the shared Django cache. Cache keys for
+that user's task data embed the version, and the Task signal receivers bump
+it whenever one of the user's tasks changes, so stale entries are never read
+again and simply expire.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+USER_VERSION_KEY = 'tasks:user-version:{user_id}'
+
+
+def _version_key(user_id) -> str:
+    return USER_VERSION_KEY.format(user_id=user_id)
+
+
+def get_user_data_version(user_id) -> int:
+    """Return the current task data version of a user."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1 so that an evicted version key
+        # can never resurrect entries cached under an older version.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_data_version(*user_ids):
+    """Invalidate all cached task data of the given users."""
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        key = _version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def user_cache_key(user_id, namespace: str, *parts) -> str:
+    """Build a versioned cache key for a user's task data."""
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode(), usedforsecurity=False
+    ).hexdigest()
+    version = get_user_data_version(user_id)
+    return f'tasks:{namespace}:{user_id}:{version}:{digest}'
+
+
+def cache_timeout() -> int:
+    return getattr(settings, 'TASK_CACHE_TIMEOUT', 300)
@@ -10,3 +10,14 @@ PRIORITY_CHOICES = [
     ('medium', 'Medium'),
     ('high', 'High'),
 ]
+
+# Statuses a task may move to from each status. Tasks can be created with
+# any status; setting the status a task already has is always allowed.
+STATUS_TRANSITIONS = {
+    'todo': ('in_progress', 'done', 'blocked'),
+    'in_progress': ('todo', 'done', 'blocked'),
+    # A blocked task has to be unblocked before it can be completed
+    'blocked': ('todo', 'in_progress'),
+    # Reopening
+    'done': ('todo', 'in_progress'),
+}
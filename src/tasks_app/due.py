@@ -0,0 +1,168 @@
+"""
+Incremental scanner for overdue and due-soon tasks.
+
+Each run computes ``TaskDigest`` rows for the users whose digest may have
+changed since the previous run, recorded in a ``ScanCheckpoint``:
+
+* tasks whose due date crossed a boundary because the date moved on, i.e.
+  entered the due-soon window or became overdue (range scan on the
+  ``(due_date, status)`` index),
+* tasks changed or removed since the previous run (range scans on
+  ``Task.updated_at`` and ``TaskTombstone.deleted_at``).
+
+The affected users' digests are then rebuilt from their open tasks due up to
+the horizon. The first run, or a ``full`` run, rebuilds every digest from a
+single range scan over all open tasks due up to the horizon.
+
+Only one scanner should run at a time.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from task_manager.sqlite import serialized_write
+from tasks_app.models import ScanCheckpoint, Task, TaskDigest, TaskTombstone
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'due_tasks'
+# Statuses that no longer need attention
+CLOSED_STATUSES = ('done',)
+USER_BATCH_SIZE = 200
+
+_DIGEST_FIELDS = ('id', 'title', 'status', 'priority', 'due_date', 'created_by_id', 'assigned_to_id')
+
+
+def due_soon_days() -> int:
+    return getattr(settings, 'TASK_DUE_SOON_DAYS', 3)
+
+
+def _open_tasks():
+    return Task.objects.exclude(status__in=CLOSED_STATUSES)
+
+
+def _item(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'status': row['status'],
+        'priority': row['priority'],
+        'due_date': row['due_date'].isoformat(),
+    }
+
+
+def _build_digests(rows: Iterable[Dict[str, Any]], user_ids: Optional[Set[int]], today: date) -> Dict[int, Dict]:
+    """Group open task rows due up to the horizon into per-user digests."""
+    max_items = getattr(settings, 'TASK_DIGEST_MAX_ITEMS', 20)
+    digests = defaultdict(lambda: {'overdue': [], 'due_soon': [], 'overdue_count': 0, 'due_soon_count': 0})
+    for row in rows:
+        kind = 'overdue' if row['due_date'] < today else 'due_soon'
+        for user_id in {row['created_by_id'], row['assigned_to_id']}:
+            if user_id is None or (user_ids is not None and user_id not in user_ids):
+                continue
+            digest = digests[user_id]
+            digest[f'{kind}_count'] += 1
+            # Rows arrive by due date, so the earliest tasks are kept
+            if len(digest[kind]) < max_items:
+                digest[kind].append(_item(row))
+    return digests
+
+
+@serialized_write
+def _save_digests(digests: Dict[int, Dict], user_ids: Iterable[int], today: date, now):
+    """Replace the digests of ``user_ids`` (users without rows get none)."""
+    user_ids = list(user_ids)
+    with transaction.atomic():
+        TaskDigest.objects.filter(user_id__in=user_ids).delete()
+        TaskDigest.objects.bulk_create([
+            TaskDigest(user_id=user_id, as_of=today, generated_at=now, **digests[user_id])
+            for user_id in user_ids if user_id in digests
+        ])
+
+
+def _changed_user_ids(since, today: date, horizon: date, checkpoint: ScanCheckpoint) -> Set[int]:
+    user_ids = set()
+
+    # The default ordering is dropped so the range scans need no sort
+    def collect(rows):
+        for created_by_id, assigned_to_id in rows:
+            user_ids.update((created_by_id, assigned_to_id))
+
+    # Entered the due-soon window or became overdue since the last run
+    collect(_open_tasks().filter(
+        Q(due_date__gt=checkpoint.horizon, due_date__lte=horizon)
+        | Q(due_date__gte=checkpoint.today, due_date__lt=today)
+    ).order_by().values_list('created_by_id', 'assigned_to_id'))
+    # Changed since the last run (any status: completing a task removes it)
+    collect(Task.objects.filter(updated_at__gte=since).order_by().values_list('created_by_id', 'assigned_to_id'))
+    user_ids.update(TaskTombstone.objects.filter(deleted_at__gte=since).values_list('user_id', flat=True))
+    user_ids.discard(None)
+    return user_ids
+
+
+def scan(full: bool = False, now=None) -> Dict[str, Any]:
+    """
+    Bring the task digests up to date.
+
+    Args:
+        full: Rebuild every digest instead of only the affected ones
+        now: Time to scan for (default: now)
+
+    Returns:
+        Dictionary with the run ``mode``, the number of ``users`` whose
+        digest was rebuilt and the ``horizon`` covered
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    horizon = today + timedelta(days=due_soon_days())
+    checkpoint = ScanCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+
+    rows = _open_tasks().filter(due_date__lte=horizon).order_by('due_date', 'id').values(*_DIGEST_FIELDS)
+    # A clock that went backwards would hide changes from the range scans
+    if full or checkpoint is None or checkpoint.scanned_at > now or checkpoint.today > today:
+        digests = _build_digests(rows.iterator(chunk_size=2000), None, today)
+        stale = set(TaskDigest.objects.values_list('user_id', flat=True)) - set(digests)
+        _save_digests(digests, [*digests, *stale], today, now)
+        mode, users = 'full', len(digests) + len(stale)
+    else:
+        # Commits can land slightly after the timestamps they write
+        since = checkpoint.scanned_at - timedelta(seconds=getattr(settings, 'TASK_SYNC_SAFETY_WINDOW', 1.0))
+        changed = _changed_user_ids(since, today, horizon, checkpoint)
+        iterator = iter(sorted(changed))
+        while batch := set(islice(iterator, USER_BATCH_SIZE)):
+            batch_rows = rows.filter(Q(created_by_id__in=batch) | Q(assigned_to_id__in=batch))
+            _save_digests(_build_digests(batch_rows, batch, today), batch, today, now)
+        mode, users = 'incremental', len(changed)
+
+    ScanCheckpoint.objects.update_or_create(
+        name=CHECKPOINT_NAME, defaults={'scanned_at': now, 'today': today, 'horizon': horizon})
+    logger.info("Due task scan (%s) rebuilt %d digests up to %s", mode, users, horizon)
+    return {'mode': mode, 'users': users, 'horizon': horizon.isoformat()}
+
+
+def get_digest(user_id: int) -> Dict[str, Any]:
+    """The user's precomputed digest (empty if the scanner found nothing)."""
+    digest = TaskDigest.objects.filter(user_id=user_id).first()
+    if digest is None:
+        checkpoint = ScanCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        return {
+            'overdue': [], 'due_soon': [], 'overdue_count': 0, 'due_soon_count': 0,
+            'as_of': checkpoint.today.isoformat() if checkpoint else None,
+            'generated_at': checkpoint.scanned_at.isoformat() if checkpoint else None,
+        }
+    return {
+        'overdue': digest.overdue,
+        'due_soon': digest.due_soon,
+        'overdue_count': digest.overdue_count,
+        'due_soon_count': digest.due_soon_count,
+        'as_of': digest.as_of.isoformat(),
+        'generated_at': digest.generated_at.isoformat(),
+    }
@@ -0,0 +1,207 @@
+"""
+Task change events pushed to subscribed users.
+
+Task signal receivers publish an event for every committed create, update
+and delete. The event goes through the configured backend
+(``settings.TASK_EVENTS_BACKEND``) and ends up in the ``broker`` of every
+process serving push connections, which hands it to the subscriptions of
+the affected users.
+
+Subscriptions coalesce pending events per task, so a slow consumer only
+receives the latest state of each task. When a consumer falls further
+behind than ``TASK_EVENTS_MAX_PENDING`` distinct tasks, its queue is dropped
+and it receives a single ``resync`` event instead.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = {'type': 'resync'}
+
+
+class Subscription:
+    """Pending events of one push connection. Lives on the event loop."""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_pending = max_pending
+        self._pending: 'OrderedDict[Any, Dict[str, Any]]' = OrderedDict()
+        self._overflowed = False
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]):
+        """Queue an event, coalescing it with a pending one for the same task."""
+        key = event.get('id')
+        previous = self._pending.pop(key, None)
+        if previous is not None and previous['type'] == 'task.created' and event['type'] == 'task.updated':
+            # The consumer has not seen the task yet: it is still a creation
+            event = {**event, 'type': 'task.created'}
+        if previous is None and len(self._pending) >= self.max_pending:
+            self._pending.clear()
+            self._overflowed = True
+        elif not self._overflowed:
+            self._pending[key] = event
+        self._wakeup.set()
+
+    async def get(self) -> List[Dict[str, Any]]:
+        """Wait for and return the next batch of events."""
+        await self._wakeup.wait()
+        self._wakeup.clear()
+        if self._overflowed:
+            self._overflowed = False
+            self._pending.clear()
+            return [RESYNC_EVENT]
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class TaskEventBroker:
+    """Process-local registry of subscriptions, safe to publish to from any thread."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Subscribe to the events of ``user_id``. Must run on the event loop."""
+        subscription = Subscription(
+            user_id, asyncio.get_running_loop(),
+            getattr(settings, 'TASK_EVENTS_MAX_PENDING', 500),
+        )
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        get_backend().start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_ids: Iterable[int]) -> bool:
+        return any(user_id in self._subscriptions for user_id in user_ids)
+
+    def deliver(self, user_ids: Iterable[int], event: Dict[str, Any]):
+        """Hand an event to the local subscriptions of the given users."""
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The connection's event loop is gone
+                self.unsubscribe(subscription)
+
+
+broker = TaskEventBroker()
+
+
+class InProcessBackend:
+    """Deliver events to the subscriptions of the current process only."""
+
+    def start(self):
+        pass
+
+    def publish(self, user_ids: List[int], event: Dict[str, Any]):
+        if broker.has_subscribers(user_ids):
+            broker.deliver(user_ids, event)
+
+
+class RedisBackend:
+    """
+    Fan events out to every process through Redis pub/sub.
+
+    Requires the ``redis`` package and ``settings.REDIS_URL``.
+    """
+
+    channel = 'tasks:events'
+
+    def __init__(self):
+        import redis
+
+        self._client = redis.Redis.from_url(settings.REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='task-events', daemon=True)
+                self._listener.start()
+
+    def publish(self, user_ids: List[int], event: Dict[str, Any]):
+        self._client.publish(self.channel, json.dumps({'user_ids': user_ids, 'event': event}))
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            try:
+                payload = json.loads(message['data'])
+                broker.deliver(payload['user_ids'], payload['event'])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Dropping malformed task event: %s", e)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured event backend (created once per process)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'TASK_EVENTS_BACKEND', 'tasks_app.events.InProcessBackend')
+                _backend = import_string(backend_path)()
+    return _backend
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def task_event(event_type: str, task) -> Dict[str, Any]:
+    """Build the event payload from a task without touching related rows."""
+    event = {'type': event_type, 'id': task.pk, 'at': timezone.now().isoformat()}
+    if event_type != 'task.deleted':
+        event['task'] = {
+            'id': task.pk,
+            'title': task.title,
+            'status': task.status,
+            'priority': task.priority,
+            'due_date': _isoformat(task.due_date),
+            'assigned_to': task.assigned_to_id,
+            'created_by': task.created_by_id,
+            'updated_at': _isoformat(task.updated_at),
+            'version': task.version,
+        }
+    return event
+
+
+def publish(user_ids: Iterable[int], event: Dict[str, Any]):
+    """Publish an event to the given users, never failing the caller."""
+    try:
+        get_backend().publish(sorted(set(user_ids)), event)
+    except Exception as e:
+        logger.error("Failed to publish task event %s: %s", event.get('type'), e)
@@ -0,0 +1,200 @@
+"""
+Idempotency keys and in-flight de-duplication for write endpoints.
+
+A client that retries a write (e.g. after a timeout) sends the same
+``Idempotency-Key`` header with each attempt. The response of the first
+attempt is stored in the shared cache for ``IDEMPOTENCY_KEY_TTL`` seconds and
+replayed for the retries, marked with ``Idempotent-Replayed: true``; reusing
+a key for another request is rejected with 422.
+
+Concurrent requests with the same key, or identical requests on endpoints
+that de-duplicate them without a key, share one execution in a process:
+the later ones wait for the first and get a copy of its response. Across
+processes a keyed request that is still running is answered with 409.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+# Seconds between checks for the response of a request running in another process
+_POLL_INTERVAL = 0.1
+
+
+class _Call:
+    """A request in progress in this process and the response it produced."""
+
+    __slots__ = ('fingerprint', 'done', 'snapshot')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.snapshot: Optional[Dict[str, Any]] = None
+
+
+_lock = threading.Lock()
+_in_flight: Dict[str, _Call] = {}
+
+
+def _ttl() -> int:
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+
+
+def _wait_timeout() -> float:
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 60.0)
+
+
+def _fingerprint(request) -> str:
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path()):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _snapshot(response) -> Optional[Dict[str, Any]]:
+    """A picklable copy of the response, None if it cannot be replayed."""
+    if isinstance(response, StreamingHttpResponse):
+        return None
+    if isinstance(response, Response):
+        return {'data': response.data, 'status': response.status_code}
+    return {
+        'content': response.content,
+        'status': response.status_code,
+        'content_type': response.get('Content-Type'),
+    }
+
+
+def _replay(snapshot: Dict[str, Any], replayed: bool):
+    if 'data' in snapshot:
+        response = Response(snapshot['data'], status=snapshot['status'])
+    else:
+        response = HttpResponse(snapshot['content'], status=snapshot['status'],
+                                content_type=snapshot['content_type'])
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _error(message: str, status_code: int, drf: bool):
+    if drf:
+        return Response({'error': message}, status=status_code)
+    return JsonResponse({'error': message}, status=status_code)
+
+
+def idempotent(scope: str, dedupe_identical: bool = False):
+    """
+    Make a view (function or viewset method) honour ``Idempotency-Key``.
+
+    Args:
+        scope: Namespace of the stored responses, e.g. ``tasks`` or ``chat``
+        dedupe_identical: Also let concurrent identical requests without a
+            key share one execution (nothing is stored for them)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            drf = isinstance(request, Request)
+            key = request.META.get(IDEMPOTENCY_HEADER)
+            if not key and not dedupe_identical:
+                return view(*args, **kwargs)
+            if key and len(key) > MAX_KEY_LENGTH:
+                return _error(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters",
+                              status.HTTP_400_BAD_REQUEST, drf)
+
+            fingerprint = _fingerprint(request)
+            user_id = request.user.id
+            if key:
+                key_digest = hashlib.sha256(key.encode()).hexdigest()
+                cache_key = f'idempotency:{scope}:{user_id}:{key_digest}'
+            else:
+                cache_key = f'idempotency:{scope}:{user_id}:request:{fingerprint}'
+
+            if key:
+                stored = cache.get(cache_key)
+                if stored is not None:
+                    if stored['fingerprint'] != fingerprint:
+                        return _error("Idempotency-Key was already used for another request",
+                                      status.HTTP_422_UNPROCESSABLE_ENTITY, drf)
+                    logger.info("Replaying %s response for idempotency key of user %s", scope, user_id)
+                    return _replay(stored['response'], replayed=True)
+
+            with _lock:
+                call = _in_flight.get(cache_key)
+                first = call is None
+                if first:
+                    call = _in_flight[cache_key] = _Call(fingerprint)
+            if not first:
+                if call.fingerprint != fingerprint:
+                    return _error("Idempotency-Key is in use by another request",
+                                  status.HTTP_422_UNPROCESSABLE_ENTITY, drf)
+                logger.info("Waiting for identical in-flight %s request of user %s", scope, user_id)
+                if call.done.wait(_wait_timeout()) and call.snapshot is not None:
+                    return _replay(call.snapshot, replayed=bool(key))
+                # The first request failed or takes too long: run this one
+                return view(*args, **kwargs)
+
+            try:
+                if key:
+                    blocked = _claim(cache_key, fingerprint, drf)
+                    if blocked is not None:
+                        return blocked
+                try:
+                    response = view(*args, **kwargs)
+                    snapshot = _snapshot(response)
+                    # Server errors are not stored: a retry may succeed
+                    if snapshot is not None and response.status_code < 500:
+                        call.snapshot = snapshot
+                        if key:
+                            cache.set(cache_key, {'fingerprint': fingerprint, 'response': snapshot}, _ttl())
+                    return response
+                finally:
+                    if key:
+                        cache.delete(f'{cache_key}:lock')
+            finally:
+                with _lock:
+                    _in_flight.pop(cache_key, None)
+                call.done.set()
+        return wrapper
+    return decorator
+
+
+def _claim(cache_key: str, fingerprint: str, drf: bool):
+    """
+    Take the key across processes, waiting for another process that holds
+    it. Returns None once claimed, otherwise the response to send.
+    """
+    deadline = time.monotonic() + _wait_timeout()
+    while True:
+        claimed = cache.add(f'{cache_key}:lock', fingerprint, int(_wait_timeout()) + 1)
+        # The holder may have stored its response just before releasing the key
+        stored = cache.get(cache_key)
+        if stored is not None:
+            if claimed:
+                cache.delete(f'{cache_key}:lock')
+            if stored['fingerprint'] != fingerprint:
+                return _error("Idempotency-Key was already used for another request",
+                              status.HTTP_422_UNPROCESSABLE_ENTITY, drf)
+            return _replay(stored['response'], replayed=True)
+        if claimed:
+            return None
+        if time.monotonic() >= deadline:
+            return _error("A request with this Idempotency-Key is still in progress",
+                          status.HTTP_409_CONFLICT, drf)
+        time.sleep(_POLL_INTERVAL)
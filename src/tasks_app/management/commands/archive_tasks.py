@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks_app.archive import archive_done_tasks
+
+
+class Command(BaseCommand):
+    help = "Move tasks completed more than TASK_ARCHIVE_AFTER_DAYS days ago to the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help="Archive tasks done for more than N days")
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help="Tasks moved per write transaction")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches per run")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep archiving every --interval seconds")
+        parser.add_argument('--interval', type=float, default=settings.TASK_ARCHIVE_INTERVAL,
+                            help="Seconds between runs with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            result = archive_done_tasks(
+                days=options['days'], batch_size=options['batch_size'],
+                max_batches=options['max_batches'], pause=options['pause'])
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {result['archived']} tasks done before {result['cutoff']} "
+                f"in {result['batches']} batches ({elapsed:.2f}s)"))
+            if not options['loop']:
+                break
+            time.sleep(max(0.0, options['interval'] - elapsed))
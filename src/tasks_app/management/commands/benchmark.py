@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import available_benchmarks, load_benchmark
+
+
+class Command(BaseCommand):
+    help = "Run benchmarks from the benchmarks package and print JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help="Benchmarks to run (default: list them)")
+        parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                            help="Override a benchmark parameter")
+        parser.add_argument('--output', help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        if not options['names']:
+            for name in available_benchmarks():
+                module = load_benchmark(name)
+                summary = (module.__doc__ or '').strip().splitlines()[0:1]
+                self.stdout.write(f"{name}: {summary[0] if summary else ''}")
+            return
+
+        overrides = {}
+        for item in options['param']:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid --param '{item}', expected KEY=VALUE")
+            overrides[key] = value
+
+        results = {}
+        for name in options['names']:
+            try:
+                module = load_benchmark(name)
+            except ValueError as e:
+                raise CommandError(str(e))
+            params = self._build_params(module.PARAMS, overrides)
+            self.stderr.write(f"Running {name} with {params}")
+            results[name] = {'params': params, 'results': module.run(**params)}
+
+        output = json.dumps(results, indent=2, default=str)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+
+    @staticmethod
+    def _build_params(defaults, overrides):
+        """Merge overrides into the defaults, casting to the default's type."""
+        params = dict(defaults)
+        for key, value in overrides.items():
+            if key not in defaults:
+                continue
+            default = defaults[key]
+            if isinstance(default, bool):
+                params[key] = value.lower() in ('1', 'true', 'yes')
+            elif default is None:
+                params[key] = value
+            else:
+                params[key] = type(default)(value)
+        return params
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_agent.contracts import REFERENCE_TASKS_PER_USER, ReferenceData, check_contracts, compare_results, report_metadata
+from benchmarks.utils import test_database
+
+
+class Command(BaseCommand):
+    help = ("Measure every agent tool against its performance contract on a seeded "
+            "test database; exits with an error on violations or regressions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('tools', nargs='*', help="Only check these tools")
+        parser.add_argument('--tasks', type=int, default=REFERENCE_TASKS_PER_USER,
+                            help="Reference dataset size in tasks per user")
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--latency-factor', type=float, default=1.0,
+                            help="Scale the p95 budgets (0 skips latency checks)")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--baseline', help="Flag regressions against an earlier --output report")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative p95 increase counted as a regression (default: 0.2)")
+
+    def handle(self, *args, **options):
+        with test_database():
+            reference = ReferenceData(options['tasks'])
+            results = check_contracts(
+                reference,
+                iterations=options['iterations'],
+                names=options['tools'],
+                latency_factor=options['latency_factor'],
+            )
+            report = {**report_metadata(), 'tasks_per_user': options['tasks'], 'results': results}
+
+        self.stdout.write(f"{'tool':<20}{'queries':>12}{'rows':>12}{'p95 ms':>18}")
+        for result in results:
+            budget = result['budget']
+            line = (f"{result['tool']:<20}{result['queries']:>6}/{budget['queries']:<5}"
+                    f"{result['rows']:>6}/{budget['rows']:<5}{result['p95_ms']:>10}/{budget['p95_ms']:<7}")
+            if result['violations']:
+                self.stdout.write(self.style.ERROR(f"{line}  {'; '.join(result['violations'])}"))
+            else:
+                self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+        problems = [f"{r['tool']}: {v}" for r in results for v in r['violations']]
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+            regressions = compare_results(baseline['results'], results, options['threshold'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(f"Regression: {regression}"))
+            problems += regressions
+
+        if problems:
+            raise CommandError(f"{len(problems)} contract violations or regressions")
+        self.stdout.write(self.style.SUCCESS("All tool contracts hold"))
@@ -0,0 +1,33 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from tasks_app.bulk import FORMATS, export_rows, render_rows
+from tasks_app.models import Task
+
+
+class Command(BaseCommand):
+    help = "Export tasks as CSV or JSONL to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only tasks created by or assigned to this username")
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output', help="Output file (default: stdout)")
+
+    def handle(self, *args, **options):
+        queryset = Task.objects.all()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+            queryset = queryset.filter(Q(created_by=user) | Q(assigned_to=user))
+
+        lines = render_rows(export_rows(queryset), options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
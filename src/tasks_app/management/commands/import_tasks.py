@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks_app.bulk import DEFAULT_BATCH_SIZE, FORMATS, TaskImporter, read_records
+
+
+class Command(BaseCommand):
+    help = "Import tasks from a CSV or JSONL file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Username the tasks are created by")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Cannot tell the format of '{path}', pass --format")
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        importer = TaskImporter(user, options['batch_size'])
+        if path == '-':
+            result = importer.run(read_records(sys.stdin, file_format))
+        else:
+            with open(path, encoding='utf-8', newline='') as fh:
+                result = importer.run(read_records(fh, file_format))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} tasks, {result['failed']} rows failed"))
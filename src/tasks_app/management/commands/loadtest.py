@@ -0,0 +1,119 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from benchmarks.loadgen import DEFAULT_MIX, parse_mix, run_load
+from benchmarks.utils import compare
+
+
+class Command(BaseCommand):
+    help = ("Replay a mixed REST/chat workload as the users created by seed_data and "
+            "report latency histograms and throughput.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default='',
+                            help="Operation weights, e.g. list_tasks=50,chat=5 (default: "
+                                 + ','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()) + ")")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--duration', type=float, help="Run for N seconds instead of --requests")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per worker")
+        parser.add_argument('--base-url',
+                            help="Target a running server (start it with AI_LLM_BACKEND=stub); "
+                                 "default: in-process")
+        parser.add_argument('--prefix', default='load_user', help="Username prefix of the seeded users")
+        parser.add_argument('--real-llm', action='store_true',
+                            help="In-process only: call the configured LLM instead of the stub")
+        parser.add_argument('--stub-latency', type=float, default=0.0,
+                            help="Simulated seconds per stub LLM call")
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--histogram', action='store_true', help="Print latency histograms")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help="Compare against an earlier --output report")
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help="Relative change flagged as a regression (default: 0.1)")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        overrides = {}
+        if not options['base_url']:
+            # The test client sends Host: testserver
+            overrides['ALLOWED_HOSTS'] = [*settings.ALLOWED_HOSTS, 'testserver']
+            if not options['real_llm']:
+                overrides.update(AI_LLM_BACKEND='stub', AI_STUB_LLM_LATENCY=options['stub_latency'])
+        if options['verbosity'] < 2:
+            # Keep per-request log lines from drowning the report
+            logging.disable(logging.CRITICAL)
+        try:
+            with override_settings(**overrides):
+                report = run_load(
+                    mix,
+                    concurrency=options['concurrency'],
+                    requests=options['requests'],
+                    duration=options['duration'],
+                    warmup=options['warmup'],
+                    base_url=options['base_url'],
+                    username_prefix=options['prefix'],
+                    seed_value=options['seed'],
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self._print_report(report, options['histogram'])
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            rows = compare(baseline['operations'], report['operations'], options['threshold'])
+            regressions = self._print_comparison(baseline, rows)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} metrics regressed by more than {options['threshold']:.0%}")
+
+    def _print_report(self, report, show_histogram):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['elapsed_s']}s "
+            f"({report['throughput_rps']} req/s, {report['errors']} errors, "
+            f"{report['config']['concurrency']} workers, {report['config']['target']})")
+        self.stdout.write(f"{'operation':<16}{'count':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+        rows = list(report['operations'].items()) + [('total', report)]
+        for name, data in rows:
+            latency = data['latency']
+            self.stdout.write(
+                f"{name:<16}{latency.get('count', 0):>8}{data['throughput_rps']:>10}"
+                f"{latency.get('p50_ms', 0):>10}{latency.get('p95_ms', 0):>10}"
+                f"{latency.get('p99_ms', 0):>10}{latency.get('max_ms', 0):>10}{data['errors']:>8}")
+        if not show_histogram:
+            return
+        for name, data in rows:
+            self.stdout.write(f"\n{name}")
+            peak = max(data['histogram'].values()) or 1
+            for bucket, count in data['histogram'].items():
+                self.stdout.write(f"  {bucket:>9} {'#' * round(40 * count / peak):<40} {count}")
+
+    def _print_comparison(self, baseline, rows):
+        self.stdout.write(f"\nCompared with {baseline.get('revision') or 'baseline'}:")
+        regressions = 0
+        for row in rows:
+            flag = ''
+            if row['regression']:
+                regressions += 1
+                flag = '  REGRESSION'
+            line = (f"{row['operation']:<16}{row['metric']:<16}{row['baseline']:>10} -> "
+                    f"{row['current']:<10}{row['change']:+.1%}{flag}")
+            self.stdout.write(self.style.ERROR(line) if flag else line)
+        return regressions
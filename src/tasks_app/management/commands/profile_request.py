@@ -0,0 +1,94 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from task_manager.profiling import ENGINES, profiling
+
+
+class Command(BaseCommand):
+    help = ("Profile requests in-process through the full middleware stack and write "
+            "flamegraph-ready profiles with a per-category breakdown (see PROFILING_*).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='/api/tasks/', help="Request path (default: /api/tasks/)")
+        parser.add_argument('--user', required=True, help="Username to authenticate as (token auth)")
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', help="JSON request body")
+        parser.add_argument('--chat', metavar='MESSAGE', help="Shortcut for POST /api/ai/chat/ with this message")
+        parser.add_argument('--engine', choices=ENGINES, help="Default: PROFILING_ENGINE")
+        parser.add_argument('--interval', type=float, help="Seconds between samples (default: PROFILING_INTERVAL)")
+        parser.add_argument('--repeat', type=int, default=1, help="Profiled requests, one profile each")
+        parser.add_argument('--warmup', type=int, default=1,
+                            help="Unprofiled requests first (imports, caches)")
+        parser.add_argument('--top', type=int, default=15, help="Functions listed by self time")
+        parser.add_argument('--output-dir', help="Default: PROFILING_DIR")
+        parser.add_argument('--real-llm', action='store_true', help="Call the configured LLM instead of the stub")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}")
+        token, _ = Token.objects.get_or_create(user=user)
+
+        method, path, body = options['method'].upper(), options['path'], options['data']
+        if options['chat']:
+            method, path, body = 'POST', '/api/ai/chat/', json.dumps({'message': options['chat']})
+        if body is not None:
+            try:
+                json.loads(body)
+            except ValueError as e:
+                raise CommandError(f"--data is not JSON: {e}")
+
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        def send():
+            kwargs = {'data': body, 'content_type': 'application/json'} if body is not None else {}
+            response = client.generic(method, path, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        # The test client sends Host: testserver
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['real_llm']:
+            overrides['AI_LLM_BACKEND'] = 'stub'
+        directory = options['output_dir'] or settings.PROFILING_DIR
+        if options['verbosity'] < 2:
+            logging.disable(logging.CRITICAL)
+        try:
+            with override_settings(**overrides):
+                for _ in range(options['warmup']):
+                    send()
+                for number in range(max(1, options['repeat'])):
+                    name = f"{time.strftime('%Y%m%dT%H%M%S')}-cli-{number}"
+                    with profiling(name, options['engine'], options['interval']) as session:
+                        response = send()
+                    metadata = {'method': method, 'path': path, 'status': response.status_code,
+                                'reason': 'command', 'user': user.username}
+                    files = session.write(directory, metadata, top=options['top'])
+                    self._print_summary(session.summary(options['top']), response.status_code, files)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _print_summary(self, summary, status, files):
+        self.stdout.write(
+            f"\n{summary['engine']}: HTTP {status} in {summary['duration_ms']:.1f}ms, "
+            f"{summary['profiled_ms']:.1f}ms profiled over {summary['threads']} threads")
+        for category, data in summary['categories'].items():
+            self.stdout.write(f"  {category:<14}{data['ms']:>10.1f}ms {data['share']:>7.1%}")
+        self.stdout.write(f"  {'self ms':>10}  function")
+        for row in summary['hot']:
+            self.stdout.write(f"  {row['self_ms']:>10.2f}  {row['function']}")
+        for path in files:
+            self.stdout.write(f"Wrote {path}")
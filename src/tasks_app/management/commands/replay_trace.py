@@ -0,0 +1,139 @@
+import cProfile
+import io
+import json
+import pstats
+import shutil
+import statistics
+import tempfile
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ai_agent.tracing import AgentTrace, compare_traces, read_traces, replay
+
+
+class Command(BaseCommand):
+    help = ("Re-run a recorded agent trace with its recorded LLM outputs and compare "
+            "step timings and queries (see AI_TRACE_ENABLED).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Trace file or directory (default: AI_TRACE_DIR)")
+        parser.add_argument('--trace-id', help="Trace to replay (default: the slowest)")
+        parser.add_argument('--list', action='store_true', help="List the traces and exit")
+        parser.add_argument('--snapshot', help="SQLite database file to replay against; "
+                                               "each run uses a fresh copy, the file is not modified")
+        parser.add_argument('--user', type=int, help="Run as this user id instead of the recorded one")
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--llm-latency', action='store_true',
+                            help="Sleep for the recorded LLM time before each answer")
+        parser.add_argument('--profile', type=int, metavar='N', default=0,
+                            help="Profile the last run, tools included, and print its N most "
+                                 "expensive functions")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'] or settings.AI_TRACE_DIR)
+        if not path.exists():
+            raise CommandError(f"No traces at {path}")
+        traces = list(read_traces(path))
+        if not traces:
+            raise CommandError(f"No traces in {path}")
+
+        if options['list']:
+            for record in traces:
+                self.stdout.write(
+                    f"{record['trace_id']}  {record['time']}  {record['duration_ms']:>10.1f}ms  "
+                    f"{len(record['steps']):>3} steps  {record['queries']:>4} queries  {record['input'][:60]!r}")
+            return
+
+        if options['trace_id']:
+            record = next((t for t in traces if t['trace_id'] == options['trace_id']), None)
+            if record is None:
+                raise CommandError(f"Trace {options['trace_id']} not found in {path}")
+        else:
+            record = max(traces, key=lambda t: t['duration_ms'])
+        self.stdout.write(f"Replaying {record['trace_id']} ({record['duration_ms']}ms): {record['input']!r}")
+
+        repeat = max(1, options['repeat'])
+        user_id = options['user'] or record['user_id']
+        runs, profile, trace = [], None, None
+        for number in range(repeat):
+            with self._database(options['snapshot']):
+                if options['profile'] and number == repeat - 1:
+                    # Tools run in worker threads: the trace profiles those
+                    trace = AgentTrace(f"replay-{record['trace_id']}", user_id, record['input'], profile_tools=True)
+                    profile = cProfile.Profile()
+                    profile.enable()
+                runs.append(replay(record, user_id=user_id, llm_latency=options['llm_latency'], trace=trace))
+                if profile is not None:
+                    profile.disable()
+
+        self._report(record, runs)
+        if profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            for tool_profile in trace.tool_profiles:
+                stats.add(tool_profile)
+            stats.sort_stats('cumulative').print_stats(options['profile'])
+            self.stdout.write(stream.getvalue())
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({'recorded': record, 'replays': runs}, fh, indent=2, default=str)
+
+    def _report(self, record, runs):
+        last = runs[-1]
+        self.stdout.write(f"{'#':>3} {'step':<22}{'recorded ms':>13}{'replayed ms':>13}{'queries':>12}")
+        for row in compare_traces(record, last):
+            # Median over the runs that took the same path
+            durations = [run['steps'][row['step']]['duration_ms'] for run in runs
+                         if len(run['steps']) > row['step'] and 'duration_ms' in run['steps'][row['step']]]
+            replayed = round(statistics.median(durations), 3) if durations else None
+            queries = '' if row['type'] == 'llm' else f"{row['recorded_queries']} -> {row['replayed_queries']}"
+            label = f"{row['type']} {row['name']}".strip()
+            self.stdout.write(f"{row['step']:>3} {label:<22}{row['recorded_ms'] or '-':>13}"
+                              f"{replayed or '-':>13}{queries:>12}")
+        totals = [run['duration_ms'] for run in runs]
+        self.stdout.write(
+            f"Total: recorded {record['duration_ms']}ms ({record['queries']} queries), replayed median "
+            f"{round(statistics.median(totals), 3)}ms ({last['queries']} queries) over {len(runs)} runs")
+        if last['error']:
+            self.stdout.write(self.style.ERROR(f"Replay failed: {last['error']}"))
+        elif len(last['steps']) != len(record['steps']):
+            self.stdout.write(self.style.WARNING("The replay took another path than the recorded run"))
+
+    @staticmethod
+    def _database(snapshot):
+        """Point the default database at a fresh copy of the snapshot."""
+        if not snapshot:
+            return nullcontext()
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("--snapshot needs the SQLite backend")
+        return _SnapshotCopy(snapshot)
+
+
+class _SnapshotCopy:
+    def __init__(self, snapshot):
+        self.snapshot = Path(snapshot)
+        if not self.snapshot.exists():
+            raise CommandError(f"Snapshot {snapshot} does not exist")
+
+    def __enter__(self):
+        # settings_dict is shared with the connections of other threads
+        self.directory = tempfile.TemporaryDirectory()
+        copy = Path(self.directory.name) / self.snapshot.name
+        shutil.copyfile(self.snapshot, copy)
+        connection = connections['default']
+        connection.close()
+        self.original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = str(copy)
+        return copy
+
+    def __exit__(self, *exc_info):
+        connection = connections['default']
+        connection.close()
+        connection.settings_dict['NAME'] = self.original
+        self.directory.cleanup()
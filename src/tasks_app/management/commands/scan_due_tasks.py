@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks_app.due import scan
+
+
+class Command(BaseCommand):
+    help = "Refresh the overdue and due-soon task digests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Rebuild every digest instead of only the changed ones")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep scanning every --interval seconds")
+        parser.add_argument('--interval', type=float, default=settings.TASK_SCAN_INTERVAL,
+                            help="Seconds between scans with --loop")
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            start = time.monotonic()
+            result = scan(full=full)
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['mode'].capitalize()} scan rebuilt {result['users']} digests "
+                f"up to {result['horizon']} in {elapsed:.2f}s"))
+            if not options['loop']:
+                break
+            # Only the first scan of a loop is a full one
+            full = False
+            time.sleep(max(0.0, options['interval'] - elapsed))
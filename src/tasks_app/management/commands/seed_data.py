@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks_app.seeding import DEFAULT_PRIORITY_WEIGHTS, DEFAULT_STATUS_WEIGHTS, parse_weights, seed
+
+
+class Command(BaseCommand):
+    help = "Generate users (with API tokens) and tasks for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tasks-per-user', type=int, default=50,
+                            help="Mean number of tasks per user")
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help="0 = equal counts, higher = a few users own most tasks")
+        parser.add_argument('--status-weights', default='',
+                            help="e.g. todo=45,in_progress=30,done=20,blocked=5")
+        parser.add_argument('--priority-weights', default='',
+                            help="e.g. low=30,medium=50,high=20")
+        parser.add_argument('--due-ratio', type=float, default=0.7,
+                            help="Share of tasks with a due date")
+        parser.add_argument('--due-range', default='-14:60', metavar='FROM:TO',
+                            help="Due dates in days relative to today")
+        parser.add_argument('--assign-ratio', type=float, default=0.3,
+                            help="Share of tasks assigned to another user")
+        parser.add_argument('--prefix', default='load_user', help="Username prefix")
+        parser.add_argument('--password', default='load-test')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, help="Random seed for reproducible data")
+
+    def handle(self, *args, **options):
+        try:
+            status_weights = parse_weights(options['status_weights'], DEFAULT_STATUS_WEIGHTS)
+            priority_weights = parse_weights(options['priority_weights'], DEFAULT_PRIORITY_WEIGHTS)
+            low, _, high = options['due_range'].partition(':')
+            due_range = (int(low), int(high))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = seed(
+            users=options['users'],
+            tasks_per_user=options['tasks_per_user'],
+            skew=options['skew'],
+            status_weights=status_weights,
+            priority_weights=priority_weights,
+            due_ratio=options['due_ratio'],
+            due_range=due_range,
+            assign_ratio=options['assign_ratio'],
+            username_prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            seed_value=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['users']} users, {result['tokens']} tokens and {result['tasks']} tasks"))
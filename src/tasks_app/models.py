@@ -1,9 +1,182 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
 # Using Django's built-in User model
 from django.contrib.auth.models import User
-from tasks_app import STATUS_CHOICES, PRIORITY_CHOICES
+from tasks_app import STATUS_CHOICES, PRIORITY_CHOICES, STATUS_TRANSITIONS
 # Create your models here.
 
+# Backends that support UPDATE ... RETURNING (SQLite from 3.35)
+RETURNING_VENDORS = ('postgresql', 'sqlite')
+
+# UPDATE attempts of ``update_versioned`` when the task changed between its
+# UPDATE and the read explaining why nothing matched
+VERSIONED_UPDATE_ATTEMPTS = 3
+
+
+def status_sources(status: str):
+    """Statuses a task can move to ``status`` from, including ``status`` itself."""
+    return [source for source, targets in STATUS_TRANSITIONS.items()
+            if source == status or status in targets]
+
+
+class TaskConflict(Exception):
+    """A versioned write to a task did not apply; ``current`` is the task as stored."""
+
+    def __init__(self, message: str, current: 'Task'):
+        self.current = current
+        super().__init__(message)
+
+
+class StaleTaskVersion(TaskConflict):
+    """The task changed since the version the write was based on."""
+
+    def __init__(self, current: 'Task', expected_version: int):
+        self.expected_version = expected_version
+        super().__init__(
+            f"Task {current.pk} was modified: version {current.version}, expected {expected_version}", current)
+
+
+class InvalidStatusTransition(TaskConflict):
+    """The task's stored status cannot move to the requested status."""
+
+    def __init__(self, current: 'Task', status: str):
+        self.status = status
+        allowed = ', '.join(STATUS_TRANSITIONS.get(current.status, ())) or 'none'
+        super().__init__(
+            f"Task {current.pk} cannot move from '{current.status}' to '{status}' (allowed: {allowed})", current)
+
+
+class TaskContention(TaskConflict):
+    """The task changed under every attempt of a write that was not based on a version."""
+
+    def __init__(self, current: 'Task', attempts: int):
+        self.attempts = attempts
+        super().__init__(
+            f"Task {current.pk} kept changing during the update, gave up after {attempts} attempts", current)
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def update_returning(self, **fields):
+        """
+        Update the matching tasks with a single UPDATE and return them.
+
+        Only the given columns (plus ``updated_at`` and ``version``, which
+        is incremented) are written. Where the backend supports it the fresh
+        rows come back through ``RETURNING``. Elsewhere (MySQL) each matching
+        row gets its own UPDATE under the queryset's filters, so a row only
+        counts as updated if the filters still held when it was written, and
+        the updated rows are read back. ``post_save`` is sent for every
+        returned task, as ``save(update_fields=...)`` would.
+
+        Returns:
+            List of updated Task instances (empty if nothing matched)
+        """
+        fields.setdefault('version', F('version') + 1)
+        queryset = self._chain()
+        queryset._for_write = True
+        db = queryset.db
+        connection = connections[db]
+
+        with transaction.atomic(using=db):
+            # Stamped inside the transaction, as close to its commit as
+            # possible (delta sync orders changes by updated_at)
+            fields.setdefault('updated_at', timezone.now())
+            # Receivers need the previous assignee to invalidate their data
+            previous_assignees = {}
+            if 'assigned_to' in fields or 'assigned_to_id' in fields:
+                previous_assignees = dict(queryset.values_list('pk', 'assigned_to_id'))
+
+            if connection.vendor in RETURNING_VENDORS and connection.features.can_return_columns_from_insert:
+                tasks = queryset._update_returning(connection, fields)
+            else:
+                # The row count of each guarded UPDATE tells whether a row
+                # still matched at write time; a row changed by a concurrent
+                # writer after the SELECT is left alone
+                updated = [pk for pk in queryset.values_list('pk', flat=True)
+                           if queryset.filter(pk=pk).update(**fields)]
+                tasks = list(self.model._base_manager.using(db).filter(pk__in=updated))
+
+        update_fields = frozenset(fields)
+        for task in tasks:
+            if task.pk in previous_assignees:
+                task._loaded_assigned_to_id = previous_assignees[task.pk]
+            post_save.send(sender=self.model, instance=task, created=False,
+                           update_fields=update_fields, raw=False, using=db)
+        return tasks
+
+    def update_versioned(self, expected_version=None, **fields):
+        """
+        Compare-and-swap update of a single task without row locks.
+
+        Like ``update_returning``, but the UPDATE only matches while the task
+        still has ``expected_version`` and, when ``status`` is written, a
+        status it may move to ``status`` from (``STATUS_TRANSITIONS``). The
+        check and the write are one statement, so concurrent writers cannot
+        slip in between. When nothing matched, the stored task is read once
+        to tell a missing task from a conflict.
+
+        Args:
+            expected_version: Version the change was based on (None: any)
+            **fields: Columns to write
+
+        Returns:
+            The updated task in a list, empty if no task matched the queryset
+
+        Raises:
+            StaleTaskVersion: The task no longer has ``expected_version``
+            InvalidStatusTransition: The stored status cannot move to ``status``
+            TaskContention: The task kept changing between the attempts
+        """
+        guarded = self
+        if expected_version is not None:
+            guarded = guarded.filter(version=expected_version)
+        target = fields.get('status')
+        if target is not None:
+            guarded = guarded.filter(status__in=status_sources(target))
+
+        current = None
+        for _ in range(VERSIONED_UPDATE_ATTEMPTS):
+            tasks = guarded.update_returning(**fields)
+            if tasks:
+                return tasks
+            current = self.select_related('created_by', 'assigned_to').first()
+            if current is None:
+                return []
+            if expected_version is not None and current.version != expected_version:
+                raise StaleTaskVersion(current, expected_version)
+            if target is not None and current.status not in status_sources(target):
+                raise InvalidStatusTransition(current, target)
+            # Changed again between the UPDATE and the read: try again
+        raise TaskContention(current, VERSIONED_UPDATE_ATTEMPTS)
+
+    def _update_returning(self, connection, fields):
+        query = self.query.chain(UpdateQuery)
+        query.add_update_values(fields)
+        compiler = query.get_compiler(self.db)
+        compiler.pre_sql_setup()
+        sql, params = compiler.as_sql()
+        if not sql:
+            return []
+
+        concrete_fields = self.model._meta.concrete_fields
+        table = self.model._meta.db_table
+        columns = [field.get_col(table) for field in concrete_fields]
+        returning = ', '.join(connection.ops.quote_name(field.column) for field in concrete_fields)
+        with transaction.mark_for_rollback_on_error(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{sql} RETURNING {returning}", params)
+                rows = cursor.fetchall()
+
+        converters = compiler.get_converters(columns)
+        if converters:
+            rows = compiler.apply_converters(rows, converters)
+        attnames = [field.attname for field in concrete_fields]
+        return [self.model.from_db(self.db, attnames, row) for row in rows]
+
 
 class Task(models.Model):
 
@@ -20,9 +193,166 @@ class Task(models.Model):
         User, on_delete=models.CASCADE, null=True, blank=True, related_name='tasks_created')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every write; clients send it back to update only the
+    # task they have seen (optimistic concurrency, see update_versioned)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = TaskQuerySet.as_manager()
 
     class Meta:
         ordering = ['due_date', 'priority']
+        indexes = [
+            # Per-user listings (created_by OR assigned_to, newest first)
+            models.Index(fields=['created_by', '-created_at'], name='task_created_by_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], name='task_assigned_to_idx'),
+            # Delta sync scans changes per user in (updated_at, id) order
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='task_created_by_sync_idx'),
+            models.Index(fields=['assigned_to', 'updated_at', 'id'], name='task_assigned_to_sync_idx'),
+            # The due date scanner reads open tasks by due date range
+            models.Index(fields=['due_date', 'status'], name='task_due_status_idx'),
+            # ... and the tasks changed since its previous run
+            models.Index(fields=['updated_at'], name='task_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored assignee so a reassignment can invalidate
+        # the previous assignee's cached data
+        instance._loaded_assigned_to_id = instance.__dict__.get('assigned_to_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save, updating an existing task only if it still has the version it
+        was loaded with (raises StaleTaskVersion otherwise).
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        self._expected_version = self.version
+        self.version += 1
+        try:
+            super().save(*args, **kwargs)
+        except BaseException:
+            self.version = self._expected_version
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected_version = getattr(self, '_expected_version', None)
+        if expected_version is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if super()._do_update(base_qs.filter(version=expected_version), using, pk_val, values,
+                              update_fields, forced_update):
+            return True
+        current = base_qs.filter(pk=pk_val).first()
+        if current is None:
+            return False
+        raise StaleTaskVersion(current, expected_version)
+
+    def visible_user_ids(self):
+        """Ids of the users whose task data this task is part of."""
+        user_ids = {self.created_by_id, self.assigned_to_id,
+                    getattr(self, '_loaded_assigned_to_id', None)}
+        user_ids.discard(None)
+        return user_ids
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of ``Task`` by the archiver (``tasks_app.archive``).
+
+    Keeps the task's id and fields so the hot table only holds open and
+    recently completed tasks. Read only; included in queries on request.
+    """
+
+    # The id the task had in ``Task`` (ids are never reused)
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES)
+    due_date = models.DateField(null=True, blank=True)
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_tasks_assigned')
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='archived_tasks_created')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', '-created_at'], name='archived_created_by_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], name='archived_assigned_to_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TaskTombstone(models.Model):
+    """
+    Trace of a task that disappeared from a user's task list.
+
+    Written when a task is deleted, and for the previous assignee when a task
+    is reassigned away, so delta sync clients can drop their local copy.
+    """
+
+    task_id = models.BigIntegerField()
+    # No database constraint: tombstones are written while users (and their
+    # tasks) are being deleted and are pruned independently.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_sync_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} removed for user {self.user_id}"
+
+
+class ScanCheckpoint(models.Model):
+    """Progress of an incremental background scan, see ``tasks_app.due``."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    # Start of the last completed run; changes after it are scanned next
+    scanned_at = models.DateTimeField()
+    # Local date of the last run and the last due date it covered
+    today = models.DateField()
+    horizon = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} at {self.scanned_at:%Y-%m-%d %H:%M:%S}"
+
+
+class TaskDigest(models.Model):
+    """
+    Precomputed overdue and due-soon tasks of a user.
+
+    Written by the due date scanner (``manage.py scan_due_tasks``) and read
+    as is by the REST API and the agent.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_digest')
+    overdue = models.JSONField(default=list)
+    due_soon = models.JSONField(default=list)
+    overdue_count = models.PositiveIntegerField(default=0)
+    due_soon_count = models.PositiveIntegerField(default=0)
+    # Local date the digest was computed for
+    as_of = models.DateField()
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Digest of user {self.user_id}: {self.overdue_count} overdue, {self.due_soon_count} due soon"
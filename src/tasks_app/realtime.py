@@ -0,0 +1,148 @@
+"""
+ASGI push channel for task events.
+
+``TaskEventsApp`` wraps the Django ASGI application and serves two
+endpoints directly on the event loop, without occupying a Django worker
+thread per connection:
+
+* ``/ws/tasks/`` - WebSocket, one JSON array of events per message
+* ``/api/tasks/events/`` - Server-Sent Events, one ``data:`` line per batch
+
+Clients authenticate with the same DRF token as the REST API, either in the
+``Authorization: Token <key>`` header or in the ``token`` query parameter
+(browsers cannot set headers on WebSocket/EventSource connections).
+"""
+
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from tasks_app.authentication import CachedTokenAuthentication
+from tasks_app.events import broker
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = '/ws/tasks/'
+SSE_PATH = '/api/tasks/events/'
+
+
+def _token_from_scope(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword.lower() == 'token' and key:
+                return key.strip()
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return query.get('token', [None])[0]
+
+
+async def authenticate(scope):
+    """Return the active user owning the connection's token, or None."""
+    key = _token_from_scope(scope)
+    if not key:
+        return None
+    try:
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+class TaskEventsApp:
+    """ASGI application serving task events, delegating the rest to Django."""
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path')
+        if scope['type'] == 'websocket':
+            if path == WEBSOCKET_PATH:
+                return await self.websocket(scope, receive, send)
+            await receive()
+            return await send({'type': 'websocket.close', 'code': 4404})
+        if scope['type'] == 'http' and path == SSE_PATH and scope['method'] == 'GET':
+            return await self.server_sent_events(scope, receive, send)
+        return await self.django_application(scope, receive, send)
+
+    async def websocket(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        user = await authenticate(scope)
+        if user is None:
+            return await send({'type': 'websocket.close', 'code': 4401})
+        await send({'type': 'websocket.accept'})
+
+        async def send_batch(batch):
+            await send({'type': 'websocket.send', 'text': json.dumps(batch)})
+
+        await self._stream(user, receive, send_batch, disconnect_type='websocket.disconnect')
+
+    async def server_sent_events(self, scope, receive, send):
+        user = await authenticate(scope)
+        if user is None:
+            await send({
+                'type': 'http.response.start',
+                'status': 401,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            return await send({
+                'type': 'http.response.body',
+                'body': json.dumps({'detail': 'Authentication credentials were not provided.'}).encode(),
+            })
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+
+        async def send_batch(batch):
+            body = b': keepalive\n\n' if batch is None else f"data: {json.dumps(batch)}\n\n".encode()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        await self._stream(user, receive, send_batch, disconnect_type='http.disconnect')
+
+    async def _stream(self, user, receive, send_batch, disconnect_type):
+        """Forward the user's events until the client disconnects."""
+        subscription = broker.subscribe(user.id)
+        heartbeat = getattr(settings, 'TASK_EVENTS_HEARTBEAT', 15)
+
+        async def pump():
+            while True:
+                try:
+                    batch = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    batch = None
+                if batch is None:
+                    # Keep proxies from closing idle connections (SSE only)
+                    if disconnect_type == 'http.disconnect':
+                        await send_batch(None)
+                    continue
+                # A slow client blocks here; meanwhile the subscription
+                # coalesces new events instead of growing without bound.
+                await send_batch(batch)
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != disconnect_type:
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_for_disconnect())]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    logger.warning("Task event stream for user %s ended: %s", user.id, task.exception())
+        finally:
+            for task in tasks:
+                task.cancel()
+            broker.unsubscribe(subscription)
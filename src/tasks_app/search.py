@@ -0,0 +1,227 @@
+"""
+In-memory fuzzy matching over short strings.
+
+``TrigramIndex`` ranks stored strings against a query by trigram overlap
+(Dice coefficient) after normalizing case, punctuation and whitespace.
+``TaskTitleIndex`` keeps one such index per user over their task titles so
+paraphrased titles coming from the LLM can be resolved without a query.
+"""
+
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from django.conf import settings
+
+from tasks_app.cache import get_user_data_version
+
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Case-fold and reduce punctuation/whitespace runs to single spaces."""
+    return _NON_ALNUM.sub(' ', (text or '').casefold()).strip()
+
+
+def trigrams(normalized: str) -> frozenset:
+    """Trigrams of a normalized string, padded so short words still match."""
+    padded = f'  {normalized} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Trigram postings over strings keyed by an id. Not thread-safe."""
+
+    def __init__(self):
+        self._texts: Dict[Hashable, str] = {}
+        self._grams: Dict[Hashable, frozenset] = {}
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, key: Hashable, text: str):
+        self.remove(key)
+        normalized = normalize(text)
+        grams = trigrams(normalized)
+        self._texts[key] = normalized
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def remove(self, key: Hashable):
+        grams = self._grams.pop(key, None)
+        if grams is None:
+            return
+        del self._texts[key]
+        for gram in grams:
+            keys = self._postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[gram]
+
+    def exact(self, text: str) -> List[Hashable]:
+        """Keys whose normalized text equals the normalized ``text``."""
+        normalized = normalize(text)
+        candidates = self._candidates(trigrams(normalized))
+        return [key for key in candidates if self._texts[key] == normalized]
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[Tuple[float, Hashable]]:
+        """
+        Rank stored strings against ``query``.
+
+        Returns:
+            Up to ``limit`` (score, key) pairs, best first. Scores are in
+            [0, 1]; 1 is an exact match after normalization.
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        query_grams = trigrams(normalized)
+        results = []
+        for key, shared in self._candidates(query_grams).items():
+            text = self._texts[key]
+            if text == normalized:
+                score = 1.0
+            else:
+                score = 2 * shared / (len(query_grams) + len(self._grams[key]))
+                # A query that is a whole part of the title (or vice versa)
+                # is a strong hint even if the lengths differ a lot
+                if normalized in text or text in normalized:
+                    score = max(score, 0.6 + 0.3 * score)
+            if score >= min_score:
+                results.append((round(score, 4), key))
+        results.sort(key=lambda item: (-item[0], str(item[1])))
+        return results[:limit]
+
+    def _candidates(self, grams) -> Counter:
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        return counts
+
+
+class TitleMatch:
+    """Outcome of a title lookup: a single task id or ambiguous candidates."""
+
+    __slots__ = ('task_id', 'candidates')
+
+    def __init__(self, task_id: Optional[int] = None, candidates: Optional[List[Dict]] = None):
+        self.task_id = task_id
+        self.candidates = candidates or []
+
+
+class _UserTitles:
+    __slots__ = ('version', 'index', 'titles')
+
+    def __init__(self, version, index, titles):
+        self.version = version
+        self.index = index
+        self.titles = titles
+
+
+class TaskTitleIndex:
+    """
+    Per-user fuzzy index over the titles of the tasks a user created.
+
+    A user's index is built with one query on first use, updated in place by
+    the Task signal receivers and rebuilt when the user's data version (see
+    ``tasks_app.cache``) was bumped by another process. Least recently used
+    users are evicted beyond ``TASK_TITLE_INDEX_MAX_USERS``.
+    """
+
+    def __init__(self):
+        self._users: 'OrderedDict[int, _UserTitles]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, user_id: int, title: str, fuzzy: bool = True) -> TitleMatch:
+        """
+        Resolve a possibly paraphrased title to one of the user's tasks.
+
+        Args:
+            user_id: Owner of the tasks
+            title: Title as given by the user or the LLM
+            fuzzy: Accept a clear fuzzy winner; when False only an exact
+                (normalized) match resolves and near matches are returned
+                as candidates
+
+        Returns:
+            TitleMatch with ``task_id`` set when one task clearly matches, or
+            with the ranked ``candidates`` when several do. Neither is set
+            when nothing is close enough.
+        """
+        threshold = getattr(settings, 'TASK_TITLE_MATCH_THRESHOLD', 0.5)
+        margin = getattr(settings, 'TASK_TITLE_MATCH_MARGIN', 0.15)
+        entry = self._entry(user_id)
+        with self._lock:
+            exact = entry.index.exact(title)
+            if len(exact) == 1:
+                return TitleMatch(task_id=exact[0])
+            if exact:
+                ranked = [(1.0, key) for key in sorted(exact)]
+            else:
+                ranked = entry.index.search(title, limit=5, min_score=threshold)
+            candidates = [
+                {'id': key, 'title': entry.titles[key], 'score': score} for score, key in ranked
+            ]
+
+        if not candidates:
+            return TitleMatch()
+        if exact or not fuzzy:
+            return TitleMatch(candidates=candidates)
+        if len(candidates) == 1 or candidates[0]['score'] - candidates[1]['score'] >= margin:
+            return TitleMatch(task_id=candidates[0]['id'])
+        return TitleMatch(candidates=candidates)
+
+    def apply(self, user_id: int, task_id: int, title: Optional[str]):
+        """
+        Update a loaded user index right after a committed write bumped the
+        user's data version (``title=None`` removes the task).
+        """
+        version = get_user_data_version(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            if version != entry.version + 1:
+                # Someone else changed the user's tasks too: rebuild lazily
+                del self._users[user_id]
+                return
+            if title is None:
+                entry.index.remove(task_id)
+                entry.titles.pop(task_id, None)
+            else:
+                entry.index.add(task_id, title)
+                entry.titles[task_id] = title
+            entry.version = version
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._users.pop(user_id, None)
+
+    def _entry(self, user_id: int) -> _UserTitles:
+        version = get_user_data_version(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry.version == version:
+                self._users.move_to_end(user_id)
+                return entry
+
+        from tasks_app.models import Task
+
+        titles = dict(Task.objects.filter(created_by_id=user_id).values_list('id', 'title'))
+        index = TrigramIndex()
+        for task_id, title in titles.items():
+            index.add(task_id, title)
+        entry = _UserTitles(version, index, titles)
+        with self._lock:
+            self._users[user_id] = entry
+            self._users.move_to_end(user_id)
+            while len(self._users) > getattr(settings, 'TASK_TITLE_INDEX_MAX_USERS', 1000):
+                self._users.popitem(last=False)
+        return entry
+
+
+title_index = TaskTitleIndex()
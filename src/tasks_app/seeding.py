@@ -0,0 +1,164 @@
+"""
+Synthetic users and tasks for load tests and benchmarks.
+
+``seed`` creates users (each with an API token) and their tasks in bulk.
+Task counts, statuses, priorities, due dates and assignees follow
+configurable distributions so that the data resembles a real workspace:
+a few heavy users own most tasks, most tasks are not done yet and some are
+overdue.
+"""
+
+import random
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from task_manager.sqlite import serialized_write
+from tasks_app import PRIORITY_CHOICES, STATUS_CHOICES
+from tasks_app.models import Task
+from tasks_app.signals import tasks_bulk_changed
+from tasks_app.user_directory import bump_directory_version
+
+# One weight per model choice; choices without a share here get 0
+DEFAULT_STATUS_WEIGHTS = {
+    value: {'todo': 45, 'in_progress': 30, 'done': 20, 'blocked': 5}.get(value, 0)
+    for value, _ in STATUS_CHOICES
+}
+DEFAULT_PRIORITY_WEIGHTS = {
+    value: {'low': 30, 'medium': 50, 'high': 20}.get(value, 0)
+    for value, _ in PRIORITY_CHOICES
+}
+
+_VERBS = ['Write', 'Review', 'Fix', 'Plan', 'Update', 'Prepare', 'Test', 'Deploy', 'Call', 'Draft']
+_OBJECTS = [
+    'quarterly report', 'login bug', 'release notes', 'team meeting', 'invoice',
+    'onboarding docs', 'database backup', 'API client', 'budget', 'design mockups',
+    'customer feedback', 'sprint backlog', 'landing page', 'test suite', 'roadmap',
+]
+
+
+def parse_weights(value: str, defaults: Dict[str, int]) -> Dict[str, int]:
+    """Parse ``"todo=50,done=20"`` into weights, keeping unnamed defaults."""
+    weights = dict(defaults)
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        key, _, weight = item.partition('=')
+        if key not in defaults:
+            raise ValueError(f"Unknown choice '{key}'. Use one of: {', '.join(defaults)}")
+        weights[key] = int(weight)
+    if any(weight < 0 for weight in weights.values()) or not sum(weights.values()):
+        raise ValueError("Weights must not be negative and at least one must be positive")
+    return weights
+
+
+def _task_counts(rng: random.Random, users: int, tasks_per_user: int, skew: float) -> List[int]:
+    """Tasks per user with the given mean; ``skew`` > 0 gives a long tail."""
+    if skew <= 0:
+        return [tasks_per_user] * users
+    # Pareto-distributed shares scaled to the requested total
+    shares = [rng.paretovariate(1 + 1 / skew) for _ in range(users)]
+    total = tasks_per_user * users
+    scale = total / sum(shares)
+    return [int(share * scale) for share in shares]
+
+
+def seed(
+    users: int = 100,
+    tasks_per_user: int = 50,
+    skew: float = 1.0,
+    status_weights: Optional[Dict[str, int]] = None,
+    priority_weights: Optional[Dict[str, int]] = None,
+    due_ratio: float = 0.7,
+    due_range: tuple = (-14, 60),
+    assign_ratio: float = 0.3,
+    username_prefix: str = 'load_user',
+    password: str = 'load-test',
+    batch_size: int = 1000,
+    seed_value: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Create ``users`` users with tokens and about ``tasks_per_user`` tasks each.
+
+    Args:
+        users: Number of users to create
+        tasks_per_user: Mean number of tasks per user
+        skew: 0 gives every user the same count, higher values concentrate
+            tasks on fewer users
+        status_weights: Relative weights per status
+        priority_weights: Relative weights per priority
+        due_ratio: Share of tasks with a due date
+        due_range: Due dates are drawn uniformly from this range of days
+            relative to today (negative values are overdue)
+        assign_ratio: Share of tasks assigned to another seeded user
+        username_prefix: Usernames are ``<prefix>_<n>``; existing users with
+            the prefix are reused
+        password: Password of the seeded users
+        batch_size: Rows per INSERT
+        seed_value: Random seed for reproducible data
+
+    Returns:
+        Dictionary with the number of ``users``, ``tokens`` and ``tasks`` created
+    """
+    rng = random.Random(seed_value)
+    status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+    priority_weights = priority_weights or DEFAULT_PRIORITY_WEIGHTS
+
+    usernames = [f'{username_prefix}_{n:05d}' for n in range(users)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    # Hashing is deliberately slow: hash once and share it
+    password_hash = make_password(password)
+    User.objects.bulk_create(
+        [User(username=name, password=password_hash) for name in usernames if name not in existing],
+        batch_size=batch_size,
+    )
+    # bulk_create sends no post_save
+    bump_directory_version()
+    user_ids = list(User.objects.filter(username__in=usernames).order_by('username').values_list('id', flat=True))
+    with_token = set(Token.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    tokens = Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids if user_id not in with_token],
+        batch_size=batch_size,
+    )
+
+    statuses, status_w = zip(*status_weights.items())
+    priorities, priority_w = zip(*priority_weights.items())
+    today = timezone.localdate()
+    created = 0
+    batch = []
+
+    @serialized_write
+    def flush():
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            Task.objects.bulk_create(batch, batch_size=batch_size)
+            affected = {task.created_by_id for task in batch} | {task.assigned_to_id for task in batch}
+            affected.discard(None)
+            tasks_bulk_changed.send(sender=Task, user_ids=affected, using=DEFAULT_DB_ALIAS)
+
+    for user_id, count in zip(user_ids, _task_counts(rng, len(user_ids), tasks_per_user, skew)):
+        for _ in range(count):
+            due_date = None
+            if rng.random() < due_ratio:
+                due_date = today + timedelta(days=rng.randint(*due_range))
+            assigned_to_id = rng.choice(user_ids) if rng.random() < assign_ratio else None
+            batch.append(Task(
+                title=f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)} #{rng.randint(1, 9999)}",
+                description=f"Seeded task for load testing ({rng.choice(_OBJECTS)}).",
+                status=rng.choices(statuses, status_w)[0],
+                priority=rng.choices(priorities, priority_w)[0],
+                due_date=due_date,
+                created_by_id=user_id,
+                assigned_to_id=assigned_to_id,
+            ))
+            if len(batch) >= batch_size:
+                flush()
+                created += len(batch)
+                batch = []
+    if batch:
+        flush()
+        created += len(batch)
+
+    return {'users': users - len(existing), 'tokens': len(tokens), 'tasks': created}
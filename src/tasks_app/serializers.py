@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
-from .models import Task
+from .models import ArchivedTask, Task
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -24,10 +24,12 @@ class TaskSerializer(serializers.ModelSerializer):
             'assigned_to', 'assigned_to_username',
             # created_by for write, created_by_username for read
             'created_by', 'created_by_username',
-            'created_at', 'updated_at'
+            'created_at', 'updated_at',
+            # Send back as If-Match (or "version") to update only this version
+            'version',
         ]
 
-        read_only_fields = ['created_at', 'updated_at',
+        read_only_fields = ['created_at', 'updated_at', 'version',
                             'assigned_to_username', 'created_by_username']
 
     def get_assigned_to_username(self, obj):
@@ -45,3 +47,22 @@ class TaskSerializer(serializers.ModelSerializer):
         if not value.strip():
             raise serializers.ValidationError("Description cannot be empty.")
         return value
+
+
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    """Read-only representation of an archived task."""
+
+    assigned_to_username = serializers.SerializerMethodField()
+    created_by_username = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedTask
+        # Archived tasks are read only and not versioned
+        fields = [f for f in TaskSerializer.Meta.fields if f != 'version'] + ['archived_at']
+        read_only_fields = fields
+
+    def get_assigned_to_username(self, obj):
+        return obj.assigned_to.username if obj.assigned_to else None
+
+    def get_created_by_username(self, obj):
+        return obj.created_by.username if obj.created_by else None
@@ -0,0 +1,128 @@
+"""
+Signal receivers keeping derived task data in sync with the Task table,
+cached tokens in sync with the Token and User tables and the user directory
+in sync with the User table.
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+from tasks_app import events
+from tasks_app.authentication import token_cache
+from tasks_app.cache import bump_user_data_version
+from tasks_app.models import Task, TaskTombstone
+from tasks_app.search import title_index
+from tasks_app.user_directory import bump_directory_version, user_directory
+from tasks_app.working_set import task_working_set
+
+# Sent after bulk writes that bypass post_save/post_delete (bulk_create,
+# raw deletes). Arguments: user_ids (set of affected user ids), using.
+tasks_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Task, dispatch_uid='tasks_app.task_saved')
+def task_saved(sender, instance, created=False, **kwargs):
+    user_ids = instance.visible_user_ids()
+    event = events.task_event('task.created' if created else 'task.updated', instance)
+
+    # A task reassigned away disappears from the previous assignee's list
+    previous_assignee = getattr(instance, '_loaded_assigned_to_id', None)
+    removed_for = None
+    if previous_assignee not in (None, instance.assigned_to_id, instance.created_by_id):
+        TaskTombstone.objects.using(kwargs.get('using')).create(
+            task_id=instance.pk, user_id=previous_assignee)
+        removed_for = previous_assignee
+    instance._loaded_assigned_to_id = instance.assigned_to_id
+
+    def on_commit():
+        # Bump after commit: bumping earlier would let a concurrent reader
+        # cache the not yet committed state under the new version.
+        bump_user_data_version(*user_ids)
+        for user_id in user_ids:
+            # Title indexes only cover the tasks a user created
+            title = instance.title if user_id == instance.created_by_id else None
+            title_index.apply(user_id, instance.pk, title)
+            task_working_set.apply(user_id, instance.pk, instance)
+        if removed_for is not None:
+            events.publish([removed_for], events.task_event('task.deleted', instance))
+        events.publish(user_ids - {removed_for}, event)
+
+    transaction.on_commit(on_commit, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Task, dispatch_uid='tasks_app.task_deleted')
+def task_deleted(sender, instance, **kwargs):
+    user_ids = instance.visible_user_ids()
+    event = events.task_event('task.deleted', instance)
+    TaskTombstone.objects.using(kwargs.get('using')).bulk_create([
+        TaskTombstone(task_id=instance.pk, user_id=user_id) for user_id in user_ids
+    ])
+
+    task_id = instance.pk
+
+    def on_commit():
+        bump_user_data_version(*user_ids)
+        for user_id in user_ids:
+            title_index.apply(user_id, task_id, None)
+            task_working_set.apply(user_id, task_id)
+        events.publish(user_ids, event)
+
+    transaction.on_commit(on_commit, using=kwargs.get('using'))
+
+
+@receiver(tasks_bulk_changed, dispatch_uid='tasks_app.tasks_bulk_changed')
+def tasks_changed_in_bulk(sender, user_ids, **kwargs):
+    user_ids = set(user_ids)
+
+    def on_commit():
+        bump_user_data_version(*user_ids)
+        title_index.invalidate(*user_ids)
+        task_working_set.invalidate(*user_ids)
+        # Too many changes to push one by one: let clients reload
+        events.publish(user_ids, dict(events.RESYNC_EVENT))
+
+    transaction.on_commit(on_commit, using=kwargs.get('using'))
+
+
+def _invalidate_tokens(keys, using):
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache.invalidate(*keys)
+    # Again after commit, in case a concurrent request cached the old row
+    transaction.on_commit(lambda: token_cache.invalidate(*keys), using=using)
+
+
+@receiver(post_save, sender=Token, dispatch_uid='tasks_app.token_saved')
+@receiver(post_delete, sender=Token, dispatch_uid='tasks_app.token_deleted')
+def token_changed(sender, instance, **kwargs):
+    _invalidate_tokens([instance.key], kwargs.get('using'))
+
+
+@receiver(post_save, sender=User, dispatch_uid='tasks_app.user_saved')
+def user_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    # New users have no token yet and logins only touch last_login
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    keys = Token.objects.using(kwargs.get('using')).filter(user_id=instance.pk).values_list('key', flat=True)
+    _invalidate_tokens(keys, kwargs.get('using'))
+
+
+@receiver(post_save, sender=User, dispatch_uid='tasks_app.user_directory_saved')
+@receiver(post_delete, sender=User, dispatch_uid='tasks_app.user_directory_deleted')
+def user_directory_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+    fields = None
+    if kwargs['signal'] is post_save:
+        fields = (instance.username, instance.first_name, instance.last_name, instance.email)
+
+    def on_commit():
+        bump_directory_version()
+        user_directory.apply(user_id, fields)
+
+    transaction.on_commit(on_commit, using=kwargs.get('using'))
@@ -0,0 +1,141 @@
+"""
+Delta sync of a user's tasks.
+
+Clients pass the opaque cursor from their previous sync and receive only the
+tasks changed and the tasks removed since then, in the order they happened.
+Both streams are read through (user, timestamp, id) indexes with keyset
+pagination, so the cost depends on the amount of change only.
+
+Changes are ordered by the time they were stamped, not by commit. Changes
+younger than ``TASK_SYNC_SAFETY_WINDOW`` seconds are held back for the next
+sync; a write whose transaction commits later than that after stamping its
+row is missed by clients that synced past it in between.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks_app.models import Task, TaskTombstone
+from tasks_app.serializers import TaskSerializer
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.get_fixed_timezone(0))
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that cannot be decoded."""
+
+
+def encode_cursor(position: Dict[str, tuple]) -> str:
+    payload = {key: [value[0].isoformat(), value[1]] for key, value in position.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, tuple]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position = {
+            key: (datetime.fromisoformat(payload[key][0]), int(payload[key][1]))
+            for key in ('tasks', 'tombstones')
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, IndexError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    # Cursors carry aware timestamps; naive ones cannot be compared
+    if any(timezone.is_naive(timestamp) for timestamp, _ in position.values()):
+        raise InvalidCursor("Invalid cursor: timestamps must include a UTC offset")
+    return position
+
+
+def _after(queryset, field: str, position: tuple):
+    timestamp, last_id = position
+    return queryset.filter(
+        Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': last_id})
+    )
+
+
+def get_changes(user, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Return the task changes visible to ``user`` since ``cursor``.
+
+    Args:
+        user: The user whose tasks are synced
+        cursor: Cursor returned by the previous call (None for a full sync)
+        limit: Maximum number of changes to return
+
+    Returns:
+        Dictionary with the ordered ``changes``, the ``cursor`` for the next
+        call and ``has_more``. ``reset`` is true when the cursor is older than
+        the tombstone retention and the client must resync from scratch.
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    now = timezone.now()
+
+    if cursor:
+        position = decode_cursor(cursor)
+        retention = timedelta(days=getattr(settings, 'TASK_TOMBSTONE_RETENTION_DAYS', 30))
+        if position['tombstones'][0] < now - retention:
+            return {'changes': [], 'cursor': None, 'has_more': False, 'reset': True}
+    else:
+        # A full sync starts with an empty client: earlier deletes are moot
+        position = {'tasks': (EPOCH, 0), 'tombstones': (now, 0)}
+
+    # Rows stamped just now may belong to transactions that have not
+    # committed yet; leave them for the next sync instead of skipping them.
+    horizon = now - timedelta(seconds=getattr(settings, 'TASK_SYNC_SAFETY_WINDOW', 1.0))
+
+    tasks = list(
+        _after(Task.objects.filter(Q(created_by=user) | Q(assigned_to=user)), 'updated_at', position['tasks'])
+        .filter(updated_at__lte=horizon)
+        .select_related('assigned_to', 'created_by')
+        .order_by('updated_at', 'id')[:limit + 1]
+    )
+    tombstones = list(
+        _after(TaskTombstone.objects.filter(user=user), 'deleted_at', position['tombstones'])
+        .filter(deleted_at__lte=horizon)
+        .order_by('deleted_at', 'id')[:limit + 1]
+    )
+
+    merged = sorted(
+        [(task.updated_at, 0, task) for task in tasks]
+        + [(tombstone.deleted_at, 1, tombstone) for tombstone in tombstones],
+        key=lambda item: (item[0], item[1], item[2].id),
+    )
+    page = merged[:limit]
+
+    changes = []
+    for changed_at, kind, row in page:
+        if kind == 0:
+            position['tasks'] = (row.updated_at, row.id)
+            changes.append({
+                'type': 'upsert',
+                'id': row.id,
+                'changed_at': changed_at,
+                'task': TaskSerializer(row).data,
+            })
+        else:
+            position['tombstones'] = (row.deleted_at, row.id)
+            changes.append({'type': 'delete', 'id': row.task_id, 'changed_at': changed_at})
+
+    # With every tombstone up to the horizon consumed, move the tombstone
+    # position forward so an idle stream does not age past the retention.
+    consumed_tombstones = sum(1 for _, kind, _ in page if kind == 1)
+    if consumed_tombstones == len(tombstones) and position['tombstones'][0] < horizon:
+        position['tombstones'] = (horizon, 0)
+
+    return {
+        'changes': changes,
+        'cursor': encode_cursor(position),
+        'has_more': len(merged) > limit,
+        'reset': False,
+    }
@@ -1,3 +1,834 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from ai_agent.contracts import ReferenceData, check_contracts
+from ai_agent.run_context import RunContext
+from task_manager import db_router
+from task_manager.db_router import PrimaryReplicaRouter
+from task_manager.sqlite import WriteSerializer
+from tasks_app import PRIORITY_CHOICES, STATUS_CHOICES
+from tasks_app.archive import archive_done_tasks
+from tasks_app.authentication import CachedTokenAuthentication, token_cache
+from tasks_app.due import scan
+from tasks_app.events import RESYNC_EVENT, Subscription
+from tasks_app.models import ArchivedTask, StaleTaskVersion, Task, TaskTombstone
+from tasks_app.seeding import DEFAULT_PRIORITY_WEIGHTS, DEFAULT_STATUS_WEIGHTS, parse_weights, seed
+from tasks_app.sync import encode_cursor
+from tasks_app.user_directory import user_directory
+from tasks_app.working_set import task_working_set
+
+# The agent runs on the stub model: no network access or API key needed
+STUB_LLM = override_settings(AI_LLM_BACKEND='stub', AI_LLM_MODELS='', AI_STUB_LLM_LATENCY=0.0)
+
+
+def run_django(code: str, **env) -> subprocess.CompletedProcess:
+    """Run ``code`` in a fresh process with Django set up and ``env`` set."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'task_manager.settings', **env}
+    return subprocess.run([sys.executable, '-c', f"import sys, django; django.setup(); {code}"],
+                          cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120)
+
+
+class ToolContractTests(TestCase):
+    """
+    Query and row budgets of the agent tools. Latency budgets are machine
+    dependent and are checked by ``manage.py check_tool_contracts`` instead.
+    """
+
+    def test_tools_stay_within_their_contracts(self):
+        reference = ReferenceData(tasks_per_user=200)
+        for result in check_contracts(reference, iterations=3, latency_factor=0):
+            with self.subTest(tool=result['tool']):
+                self.assertEqual(result['violations'], [])
+
+
+class TaskAPITestMixin:
+    """Users alice and bob, with alice logged in, and fresh process caches."""
+
+    def setUp(self):
+        # In-process caches outlive the rolled back rows of earlier tests
+        cache.clear()
+        task_working_set.clear()
+        user_directory.invalidate()
+        token_cache.clear_local()
+        self.alice = User.objects.create_user('alice', password='secret', first_name='Alice')
+        self.bob = User.objects.create_user('bob', password='secret', first_name='Bob')
+        self.client.force_authenticate(self.alice)
+
+    def create_task(self, title='Write report', created_by=None, **fields):
+        return Task.objects.create(
+            title=title, description=fields.pop('description', title), created_by=created_by or self.alice, **fields)
+
+    def tool_config(self, user=None, **configurable):
+        return {'configurable': {'created_by': (user or self.alice).id, **configurable}}
+
+
+class ReplicaRoutingTests(TestCase):
+    """Reads go to a replica until the request writes, then to the primary."""
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_reads_are_pinned_to_the_primary_after_a_write(self):
+        router = PrimaryReplicaRouter()
+        token = db_router.start_request()
+        try:
+            self.assertEqual(router.db_for_read(Task), 'replica')
+            self.assertEqual(router.db_for_write(Task), 'default')
+            self.assertEqual(router.db_for_read(Task), 'default')
+        finally:
+            db_router.end_request(token)
+        # A new request starts unpinned again
+        token = db_router.start_request()
+        try:
+            self.assertEqual(router.db_for_read(Task), 'replica')
+        finally:
+            db_router.end_request(token)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_versioned_update_reads_back_from_the_primary(self):
+        task = Task.objects.create(title='Pinned', version=2)
+        token = db_router.start_request()
+        try:
+            # The conflicting task is read after the UPDATE, on the pinned primary
+            with self.assertRaises(StaleTaskVersion) as raised, transaction.atomic():
+                Task.objects.filter(pk=task.pk).update_versioned(expected_version=1, title='Stale')
+            self.assertEqual(raised.exception.current._state.db, 'default')
+        finally:
+            db_router.end_request(token)
+
+    def test_without_replicas_everything_goes_to_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Task), 'default')
+
+
+class EnvironmentSettingsTests(TestCase):
+    def test_empty_variables_fall_back_to_the_defaults(self):
+        result = run_django(
+            "from django.conf import settings; "
+            "print(settings.DATABASES['default']['NAME'], settings.TASK_CACHE_TIMEOUT)",
+            DB_NAME='', TASK_CACHE_TIMEOUT='',
+        )
+        self.assertEqual(result.stdout.split()[-2:], [str(settings.BASE_DIR / 'db.sqlite3'), '300'], result.stderr)
+
+
+class WriteSerializerTests(TestCase):
+    """Lock errors are retried, other errors are not."""
+
+    def test_retries_locked_writes(self):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return 'written'
+
+        self.assertEqual(WriteSerializer(retries=2, backoff=0).run(write), 'written')
+        self.assertEqual(len(calls), 2)
+
+    def test_does_not_retry_other_errors(self):
+        calls = []
+
+        def write():
+            calls.append(1)
+            raise OperationalError('no such table: tasks_app_task')
+
+        with self.assertRaises(OperationalError):
+            WriteSerializer(retries=2, backoff=0).run(write)
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(SQLITE_PRODUCTION_MODE=True)
+    def test_production_pragmas_keep_the_configured_busy_timeout(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'pragmas.sqlite3'),
+                             'OPTIONS': {'timeout': 7}}
+            wrapper = connections['default'].__class__(settings_dict)
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 7000)
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+            finally:
+                wrapper.close()
+
+
+class TaskActionTests(TaskAPITestMixin, APITestCase):
+    """complete and assign write their columns with one UPDATE."""
+
+    def updated_columns(self, queries):
+        """SET clauses of the UPDATE statements run."""
+        return [query['sql'].partition(' WHERE ')[0] for query in queries if query['sql'].startswith('UPDATE')]
+
+    def test_complete_updates_only_the_status(self):
+        task = self.create_task()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/tasks/{task.id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        (update,) = self.updated_columns(queries)
+        self.assertIn('"status"', update)
+        self.assertNotIn('"description"', update)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+
+    def test_assign_by_username(self):
+        task = self.create_task()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/tasks/{task.id}/assign/', {'username': 'bob'}, format='json')
+        self.assertEqual((response.status_code, response.data['assigned_to_username']), (200, 'bob'))
+        (update,) = self.updated_columns(queries)
+        self.assertNotIn('"title"', update)
+        response = self.client.post(f'/api/tasks/{task.id}/assign/', {'username': 'nobody'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskPermissionTests(TaskAPITestMixin, APITestCase):
+    """Assignees see, update and complete tasks; only creators reassign or delete them."""
+
+    def setUp(self):
+        super().setUp()
+        self.carol = User.objects.create_user('carol', password='secret')
+        self.task = self.create_task(assigned_to=self.bob)
+        self.client.force_authenticate(self.bob)
+
+    def test_assignee_can_update_and_complete(self):
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(f'/api/tasks/{self.task.id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.status), ('Renamed', 'done'))
+
+    def test_assignee_cannot_reassign_or_delete(self):
+        response = self.client.post(f'/api/tasks/{self.task.id}/assign/', {'username': 'carol'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'assigned_to': self.carol.id}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete(f'/api/tasks/{self.task.id}/')
+        self.assertEqual(response.status_code, 403)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.assigned_to, self.bob)
+
+    def test_other_users_tasks_are_not_found(self):
+        self.client.force_authenticate(self.carol)
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/tasks/{self.task.id}/complete/').status_code, 404)
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 0)
+
+
+class TaskScopeTests(TaskAPITestMixin, APITestCase):
+    """Users only see the tasks they created or are assigned to."""
+
+    def test_tasks_of_other_users_are_not_found(self):
+        carol = User.objects.create_user('carol')
+        task = self.create_task(assigned_to=self.bob)
+        self.create_task('Private', created_by=carol)
+        self.assertEqual([t['id'] for t in self.client.get('/api/tasks/').data['results']], [task.id])
+
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(self.client.get(f'/api/tasks/{task.id}/').status_code, 200)
+        self.client.force_authenticate(carol)
+        self.assertEqual(self.client.get(f'/api/tasks/{task.id}/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/tasks/{task.id}/complete/').status_code, 404)
+
+
+class TaskCacheTests(TaskAPITestMixin, APITestCase):
+    """Cached lists and tasks are never served after a committed change."""
+
+    def test_list_reflects_updates(self):
+        task = self.create_task()
+        self.assertEqual(self.client.get('/api/tasks/').data['results'][0]['title'], 'Write report')
+        self.assertEqual(self.client.get(f'/api/tasks/{task.id}/').data['title'], 'Write report')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{task.id}/', {'title': 'Write summary'}, format='json')
+        self.assertEqual(self.client.get('/api/tasks/').data['results'][0]['title'], 'Write summary')
+        self.assertEqual(self.client.get(f'/api/tasks/{task.id}/').data['title'], 'Write summary')
+
+
+@override_settings(TASK_SYNC_SAFETY_WINDOW=0)
+class DeltaSyncTests(TaskAPITestMixin, APITestCase):
+    """Changes and deletes since a cursor, in order."""
+
+    def test_changes_since_cursor_include_deletes(self):
+        task = self.create_task()
+        first = self.client.get('/api/tasks/changes/').data
+        self.assertEqual([(c['type'], c['id']) for c in first['changes']], [('upsert', task.id)])
+
+        other = self.create_task('Plan offsite')
+        self.client.delete(f'/api/tasks/{task.id}/')
+        second = self.client.get('/api/tasks/changes/', {'cursor': first['cursor']}).data
+        self.assertEqual(
+            [(c['type'], c['id']) for c in second['changes']], [('upsert', other.id), ('delete', task.id)])
+
+        third = self.client.get('/api/tasks/changes/', {'cursor': second['cursor']}).data
+        self.assertEqual(third['changes'], [])
+
+    def test_reassigned_task_is_removed_for_the_previous_assignee(self):
+        task = self.create_task(assigned_to=self.bob)
+        self.client.force_authenticate(self.bob)
+        cursor = self.client.get('/api/tasks/changes/').data['cursor']
+        self.client.force_authenticate(self.alice)
+        carol = User.objects.create_user('carol')
+        self.client.post(f'/api/tasks/{task.id}/assign/', {'username': carol.username}, format='json')
+        self.client.force_authenticate(self.bob)
+        changes = self.client.get('/api/tasks/changes/', {'cursor': cursor}).data['changes']
+        self.assertEqual([(c['type'], c['id']) for c in changes], [('delete', task.id)])
+
+    def test_rejects_invalid_cursors(self):
+        naive = datetime(2024, 1, 1)
+        cursor = encode_cursor({'tasks': (naive, 0), 'tombstones': (naive, 0)})
+        self.assertEqual(self.client.get('/api/tasks/changes/', {'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/changes/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class TaskEventTests(TaskAPITestMixin, APITestCase):
+    """Committed changes are published; slow consumers get coalesced events."""
+
+    def test_update_is_published_to_creator_and_assignee(self):
+        task = self.create_task(assigned_to=self.bob)
+        with mock.patch('tasks_app.events.publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{task.id}/', {'priority': 'high'}, format='json')
+        user_ids, event = publish.call_args.args
+        self.assertEqual(set(user_ids), {self.alice.id, self.bob.id})
+        self.assertEqual((event['type'], event['id']), ('task.updated', task.id))
+        self.assertEqual((event['task']['priority'], event['task']['version']), ('high', 2))
+
+    def test_subscription_coalesces_events_per_task(self):
+        async def consume(max_pending):
+            subscription = Subscription(self.alice.id, asyncio.get_running_loop(), max_pending)
+            subscription.push({'type': 'task.created', 'id': 1, 'task': {'title': 'Draft'}})
+            subscription.push({'type': 'task.updated', 'id': 1, 'task': {'title': 'Final'}})
+            subscription.push({'type': 'task.deleted', 'id': 2})
+            return await subscription.get()
+
+        self.assertEqual(asyncio.run(consume(max_pending=10)), [
+            {'type': 'task.created', 'id': 1, 'task': {'title': 'Final'}},
+            {'type': 'task.deleted', 'id': 2},
+        ])
+        self.assertEqual(asyncio.run(consume(max_pending=1)), [RESYNC_EVENT])
+
+
+class BulkImportExportTests(TaskAPITestMixin, APITestCase):
+    """CSV/JSONL import creates the user's tasks, export streams them back."""
+
+    def test_import_csv_and_export_jsonl(self):
+        body = (
+            'title,description,status,priority,due_date,assigned_to\n'
+            'Write report,Quarterly numbers,todo,high,2030-01-31,bob\n'
+            'Broken row,,unknown,low,,\n'
+        )
+        response = self.client.post('/api/tasks/import/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        task = Task.objects.get(title='Write report')
+        self.assertEqual((task.created_by, task.assigned_to, task.priority), (self.alice, self.bob, 'high'))
+
+        response = self.client.get('/api/tasks/export/', {'file_format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['id'], row['title'], row['assigned_to']) for row in rows],
+                         [(task.id, 'Write report', 'bob')])
+
+    def test_import_rejects_unknown_formats(self):
+        response = self.client.post('/api/tasks/import/', 'title\nx\n', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+
+
+class TitleResolutionTests(TaskAPITestMixin, APITestCase):
+    """Reads may resolve a misspelt title, writes only an exact one."""
+
+    def setUp(self):
+        super().setUp()
+        self.task = self.create_task('Write quarterly report')
+        self.create_task('Plan team offsite')
+
+    def test_get_task_resolves_a_close_title(self):
+        from ai_agent.tools import get_task
+
+        result = json.loads(get_task.invoke({'title': 'quarterly reprot'}, config=self.tool_config()))
+        self.assertEqual(result['id'], self.task.id)
+
+    def test_delete_task_refuses_a_fuzzy_title(self):
+        from ai_agent.tools import delete_task
+        from ai_agent.tools_validator import TaskToolsError
+
+        with self.assertRaisesMessage(TaskToolsError, 'Write quarterly report'):
+            delete_task.invoke({'title': 'quarterly reprot'}, config=self.tool_config())
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_update_task_refuses_a_fuzzy_title(self):
+        from ai_agent.tools import update_task
+        from ai_agent.tools_validator import TaskToolsError
+
+        with self.assertRaisesMessage(TaskToolsError, 'Write quarterly report'):
+            update_task.invoke({'title': 'quarterly reprot', 'status': 'done'}, config=self.tool_config())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'todo')
+
+        update_task.invoke({'title': 'Write quarterly report', 'status': 'done'}, config=self.tool_config())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'done')
+
+    def test_identical_titles_are_ambiguous(self):
+        from ai_agent.tools import get_task
+        from ai_agent.tools_validator import TaskToolsError
+
+        self.create_task('Write quarterly report')
+        with self.assertRaisesMessage(TaskToolsError, 'Multiple tasks match'):
+            get_task.invoke({'title': 'Write quarterly report'}, config=self.tool_config())
+
+
+class RequestIdTests(TaskAPITestMixin, APITestCase):
+    def test_request_id_is_echoed(self):
+        response = self.client.get('/api/tasks/', HTTP_X_REQUEST_ID='req-42')
+        self.assertEqual(response['X-Request-ID'], 'req-42')
+        self.assertTrue(self.client.get('/api/tasks/')['X-Request-ID'])
+
+
+class TokenAuthenticationTests(TaskAPITestMixin, APITestCase):
+    """Cached tokens stop working as soon as they are deleted."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.alice)
+        self.token_client = APIClient()
+        self.token_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_deleted_token_is_rejected(self):
+        self.assertEqual(self.token_client.get('/api/tasks/').status_code, 200)
+        self.assertEqual(self.token_client.get('/api/tasks/').status_code, 200)
+        self.token.delete()
+        response = self.token_client.get('/api/tasks/')
+        # 403 rather than 401: SessionAuthentication comes first and sends no challenge
+        self.assertEqual((response.status_code, response.data['detail']), (403, 'Invalid token.'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.token_client.get('/api/tasks/').status_code, 200)
+        self.alice.is_active = False
+        self.alice.save()
+        response = self.token_client.get('/api/tasks/')
+        self.assertEqual((response.status_code, response.data['detail']), (403, 'User inactive or deleted.'))
+
+    def test_cache_holds_no_password_hash(self):
+        from tasks_app.authentication import _cache_key
+
+        self.assertEqual(self.token_client.get('/api/tasks/').status_code, 200)
+        entry = cache.get(_cache_key(self.token.key))
+        self.assertNotIn(self.alice.password.encode(), pickle.dumps(entry))
+
+        token_cache.clear_local()
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual((user.username, token.key), ('alice', self.token.key))
+        # The password is deferred, so saving the user leaves it alone
+        user.first_name = 'Ali'
+        user.save()
+        self.alice.refresh_from_db()
+        self.assertTrue(self.alice.check_password('secret'))
+
+
+class SeedingTests(TestCase):
+    def test_seed_creates_users_tokens_and_tasks(self):
+        result = seed(users=3, tasks_per_user=4, skew=0, username_prefix='seeded', seed_value=1)
+        self.assertEqual((result['users'], result['tokens']), (3, 3))
+        self.assertEqual(Task.objects.filter(created_by__username__startswith='seeded_').count(), result['tasks'])
+        self.assertEqual(Token.objects.filter(user__username__startswith='seeded_').count(), 3)
+
+        # Existing users with the prefix are reused
+        self.assertEqual(seed(users=3, tasks_per_user=1, username_prefix='seeded', seed_value=1)['users'], 0)
+
+    def test_weights_cover_every_model_choice(self):
+        self.assertEqual(set(DEFAULT_STATUS_WEIGHTS), {value for value, _ in STATUS_CHOICES})
+        self.assertEqual(set(DEFAULT_PRIORITY_WEIGHTS), {value for value, _ in PRIORITY_CHOICES})
+        weights = parse_weights('blocked=5,done=0', DEFAULT_STATUS_WEIGHTS)
+        self.assertEqual((weights['blocked'], weights['done']), (5, 0))
+        with self.assertRaisesMessage(ValueError, "Unknown choice 'archived'"):
+            parse_weights('archived=1', DEFAULT_STATUS_WEIGHTS)
+
+        seed(users=1, tasks_per_user=5, skew=0, status_weights=parse_weights(
+            'todo=0,in_progress=0,done=0,blocked=1', DEFAULT_STATUS_WEIGHTS), username_prefix='seeded', seed_value=1)
+        self.assertEqual(set(Task.objects.values_list('status', flat=True)), {'blocked'})
+
+
+class LoadGeneratorTests(TransactionTestCase):
+    def test_duration_run_measures_requests(self):
+        from benchmarks.loadgen import run_load
+
+        seed(users=2, tasks_per_user=3, skew=0, username_prefix='load_user', seed_value=1)
+        report = run_load({'list_tasks': 1}, concurrency=2, duration=0.2, seed_value=1)
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual(report['errors'], 0)
+
+
+class LazyImportTests(TestCase):
+    def test_rest_api_does_not_load_the_ai_stack(self):
+        result = run_django(
+            "import task_manager.urls; "
+            "print('LOADED' if any(m.split('.')[0] in ('langchain_core', 'langgraph') for m in sys.modules) "
+            "else 'LAZY')",
+            AI_AGENT_PRELOAD='false',
+        )
+        self.assertIn('LAZY', result.stdout, result.stderr)
+
+
+class DueScanTests(TaskAPITestMixin, APITestCase):
+    """The digest lists overdue and due-soon tasks as of the last scan."""
+
+    def test_scan_builds_and_updates_the_digest(self):
+        today = timezone.localdate()
+        overdue = self.create_task('Late task', due_date=today - timedelta(days=2))
+        self.create_task('Soon task', due_date=today + timedelta(days=1))
+        self.create_task('Later task', due_date=today + timedelta(days=30))
+        self.assertEqual(scan()['mode'], 'full')
+
+        digest = self.client.get('/api/tasks/digest/').data
+        self.assertEqual([item['title'] for item in digest['overdue']], ['Late task'])
+        self.assertEqual([item['title'] for item in digest['due_soon']], ['Soon task'])
+
+        Task.objects.filter(pk=overdue.pk).update_returning(status='done')
+        self.assertEqual(scan()['mode'], 'incremental')
+        digest = self.client.get('/api/tasks/digest/').data
+        self.assertEqual(digest['overdue_count'], 0)
+        self.assertEqual(digest['due_soon_count'], 1)
+
+
+class UserSearchTests(TaskAPITestMixin, APITestCase):
+    """Users are found by prefix, but tasks are only assigned to exact usernames."""
+
+    def test_search_by_prefix(self):
+        User.objects.create_user('alexander', first_name='Sasha')
+        response = self.client.get('/api/users/', {'q': 'ali'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['alice'])
+        response = self.client.get('/api/users/', {'q': 'sasha'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['alexander'])
+
+    def test_unknown_username_is_reported(self):
+        from ai_agent.tools import update_task
+        from ai_agent.tools_validator import TaskToolsError
+
+        task = self.create_task()
+        with self.assertRaisesMessage(TaskToolsError, 'User with username zed does not exist'):
+            update_task.invoke({'task_id': task.id, 'assigned_to': 'zed'}, config=self.tool_config())
+        task.refresh_from_db()
+        self.assertIsNone(task.assigned_to)
+
+    def test_update_task_suggests_but_does_not_pick_a_user(self):
+        from ai_agent.tools import update_task
+        from ai_agent.tools_validator import TaskToolsError
+
+        task = self.create_task()
+        with self.assertRaisesMessage(TaskToolsError, 'Closest matches: bob'):
+            update_task.invoke({'task_id': task.id, 'assigned_to': 'bobb'}, config=self.tool_config())
+        task.refresh_from_db()
+        self.assertIsNone(task.assigned_to)
+
+
+@STUB_LLM
+class AgentTraceTests(TaskAPITestMixin, APITransactionTestCase):
+    """Recorded agent runs round-trip through the trace store and replay."""
+
+    def test_trace_records_and_replays_a_run(self):
+        from ai_agent.chat_service import ChatService
+        from ai_agent.tracing import AgentTrace, TraceStore, read_traces, replay
+
+        trace = AgentTrace('trace-1', self.alice.id, "create task 'Traced task'")
+        ChatService().process_chat(trace.user_input, self.alice.id, trace=trace)
+        record = trace.to_record()
+        tool_steps = [step for step in record['steps'] if step['type'] == 'tool']
+        self.assertEqual([step['name'] for step in tool_steps], ['create_task'])
+        self.assertTrue(tool_steps[0]['queries'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            TraceStore(directory).write(record)
+            (stored,) = read_traces(directory)
+        self.assertEqual(stored['trace_id'], 'trace-1')
+
+        # Replays run the recorded LLM answers against the current data
+        replayed = replay(stored, user_id=self.bob.id)
+        self.assertIsNone(replayed['error'])
+        self.assertTrue(Task.objects.filter(title='Traced task', created_by=self.bob).exists())
+
+
+@STUB_LLM
+class ChatTests(TaskAPITestMixin, APITransactionTestCase):
+    """Chat responses and batches, answered by the stub model."""
+
+    def test_chat_returns_the_first_tool_message_by_default(self):
+        response = self.client.post('/api/ai/chat/', {'message': "create task 'Chat task'"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['name'], 'create_task')
+        self.assertEqual(body['content']['title'], 'Chat task')
+
+    @override_settings(AI_CHAT_RESPONSE_MODE='full')
+    def test_full_mode_returns_every_tool_message(self):
+        response = self.client.post('/api/ai/chat/', {'message': 'show my tasks'}, format='json')
+        body = response.json()
+        self.assertEqual([message['name'] for message in body['data']], ['get_tasks'])
+        self.assertFalse(body['truncated'])
+
+    def test_batch_streams_one_line_per_message(self):
+        messages = [
+            {'id': 'a', 'message': "create task 'Batch task'"},
+            {'id': 'b', 'message': ''},
+            {'id': 'c', 'message': 'show my tasks', 'username': 'bob'},
+        ]
+        response = self.client.post('/api/ai/chat/batch/', {'messages': messages[:2]}, format='json')
+        lines = {line['id']: line for line in map(json.loads, b''.join(response.streaming_content).splitlines())}
+        self.assertEqual(lines['b']['error'], 'Message is required and cannot be empty')
+        self.assertEqual(lines['a']['data'][0]['name'], 'create_task')
+        self.assertTrue(Task.objects.filter(title='Batch task', created_by=self.alice).exists())
+
+        # Only staff may send messages as other users
+        response = self.client.post('/api/ai/chat/batch/', {'messages': messages}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class IdempotencyTests(TaskAPITestMixin, APITestCase):
+    """Retried writes with the same Idempotency-Key are applied once."""
+
+    def test_retry_is_replayed(self):
+        data = {'title': 'Pay invoice', 'description': 'Before Friday'}
+        first = self.client.post('/api/tasks/', data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.post('/api/tasks/', data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(Task.objects.filter(title='Pay invoice').count(), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.client.post('/api/tasks/', {'title': 'One', 'description': 'x'}, format='json',
+                         HTTP_IDEMPOTENCY_KEY='key-2')
+        response = self.client.post('/api/tasks/', {'title': 'Two', 'description': 'x'}, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='key-2')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Task.objects.filter(title='Two').exists())
+
+    def test_keys_are_scoped_per_user(self):
+        data = {'title': 'Shared key', 'description': 'x'}
+        self.client.post('/api/tasks/', data, format='json', HTTP_IDEMPOTENCY_KEY='key-3')
+        self.client.force_authenticate(self.bob)
+        response = self.client.post('/api/tasks/', data, format='json', HTTP_IDEMPOTENCY_KEY='key-3')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.filter(title='Shared key').count(), 2)
+
+
+class RepeatedWriteToolTests(TaskAPITestMixin, APITestCase):
+    """Identical write tool calls of one agent run are applied once."""
+
+    def test_repeated_create_task_is_collapsed(self):
+        from ai_agent.tools import create_task
+
+        run = RunContext()
+        config = self.tool_config(run=run)
+        first = create_task.invoke({'title': 'Once', 'description': 'x'}, config=config)
+        self.assertEqual(create_task.invoke({'title': 'Once', 'description': 'x'}, config=config), first)
+        self.assertEqual(run.collapsed_writes, 1)
+        self.assertEqual(Task.objects.filter(title='Once').count(), 1)
+
+        # Without a run, e.g. from a management command, every call writes
+        create_task.invoke({'title': 'Once', 'description': 'x'}, config=self.tool_config())
+        self.assertEqual(Task.objects.filter(title='Once').count(), 2)
+
+
+class ReadToolCacheTests(TaskAPITestMixin, APITestCase):
+    """Read tools are memoized within a run until the run writes."""
+
+    def test_reads_are_memoized_until_a_write(self):
+        from ai_agent.tools import create_task, get_tasks
+
+        self.create_task()
+        run = RunContext()
+        config = self.tool_config(run=run)
+        first = get_tasks.invoke({'limit': 5}, config=config)
+        self.assertEqual(get_tasks.invoke({'limit': 5}, config=config), first)
+        self.assertEqual(run.read_counts['run_hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_task.invoke({'title': 'Second task', 'description': 'x'}, config=config)
+        titles = [task['title'] for task in json.loads(get_tasks.invoke({'limit': 5}, config=config))]
+        self.assertEqual(sorted(titles), ['Second task', 'Write report'])
+        self.assertEqual(run.read_counts['misses'], 2)
+
+    @override_settings(AI_TOOL_CACHE_ACROSS_RUNS=True)
+    def test_reads_are_shared_across_runs(self):
+        from ai_agent.tools import get_tasks
+
+        self.create_task()
+        get_tasks.invoke({'limit': 5}, config=self.tool_config(run=RunContext()))
+        run = RunContext()
+        get_tasks.invoke({'limit': 5}, config=self.tool_config(run=run))
+        self.assertEqual(run.read_counts['shared_hits'], 1)
+
+
+class ArchiveTests(TaskAPITestMixin, APITestCase):
+    """Long completed tasks move to the archive and leave tombstones."""
+
+    @override_settings(TASK_SYNC_SAFETY_WINDOW=0)
+    def test_archived_tasks_leave_the_task_list(self):
+        old = self.create_task('Old task', status='done', assigned_to=self.bob)
+        recent = self.create_task('Recent task', status='done')
+        Task.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=40))
+        cursor = self.client.get('/api/tasks/changes/').data['cursor']
+
+        self.assertEqual(archive_done_tasks(days=30)['archived'], 1)
+        self.assertEqual([task['id'] for task in self.client.get('/api/tasks/').data['results']], [recent.id])
+        archived = self.client.get('/api/tasks/archived/', {'q': 'old'}).data['results']
+        self.assertEqual([task['id'] for task in archived], [old.id])
+        self.assertTrue(ArchivedTask.objects.filter(pk=old.pk, assigned_to=self.bob).exists())
+        self.assertEqual(
+            set(TaskTombstone.objects.filter(task_id=old.pk).values_list('user_id', flat=True)),
+            {self.alice.id, self.bob.id})
+
+        changes = self.client.get('/api/tasks/changes/', {'cursor': cursor}).data['changes']
+        self.assertEqual([(c['type'], c['id']) for c in changes], [('delete', old.id)])
+
+
+class LLMRouterTests(TestCase):
+    """The router falls back to the next model when one fails."""
+
+    def setUp(self):
+        from ai_agent import llm_health
+
+        llm_health.reset()
+
+    @override_settings(AI_LLM_HEDGE=False)
+    def test_falls_back_to_the_next_model(self):
+        from ai_agent.llm_health import health_snapshot
+        from ai_agent.llm_router import build_router
+        from langchain_core.messages import HumanMessage
+
+        router = build_router('stub:broken?failure_ratio=1,stub:backup')
+        message = router.invoke([HumanMessage(content='show my tasks')])
+        self.assertEqual(message.tool_calls[0]['name'], 'get_tasks')
+        health = health_snapshot()
+        self.assertEqual(health['stub:broken']['failures'], 1)
+        self.assertEqual(health['stub:backup']['requests'], 1)
+
+    def test_model_options_are_typed(self):
+        from ai_agent.llm_router import parse_model_specs
+        from django.core.exceptions import ImproperlyConfigured
+
+        self.assertEqual(parse_model_specs('stub:fast?latency=0.5&max_retries=1'),
+                         [('stub', 'fast', {'latency': 0.5, 'max_retries': 1})])
+        with self.assertRaises(ImproperlyConfigured):
+            parse_model_specs('stub:fast?latency=slow')
+
+
+@override_settings(AI_TASK_WORKING_SET=True)
+class WorkingSetTests(TaskAPITestMixin, APITestCase):
+    """The working set follows committed writes without reloading."""
+
+    def test_updates_are_applied_to_a_loaded_user(self):
+        task = self.create_task()
+        self.assertEqual([t['title'] for t in task_working_set.latest(self.alice.id, 5)], ['Write report'])
+        loads = task_working_set.stats()['loads']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{task.id}/', {'title': 'Write summary'}, format='json')
+        self.assertEqual([t['title'] for t in task_working_set.latest(self.alice.id, 5)], ['Write summary'])
+        self.assertEqual(task_working_set.stats()['loads'], loads)
+
+    def test_bulk_changes_invalidate_the_user(self):
+        self.create_task()
+        task_working_set.latest(self.alice.id, 5)
+        loads = task_working_set.stats()['loads']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/import/', '{"title": "Imported", "description": "x"}\n',
+                             content_type='application/x-ndjson')
+        titles = [t['title'] for t in task_working_set.latest(self.alice.id, 5)]
+        self.assertEqual(sorted(titles), ['Imported', 'Write report'])
+        self.assertEqual(task_working_set.stats()['loads'], loads + 1)
+
+
+class ProfilingTests(TaskAPITestMixin, APITestCase):
+    """Requests carrying the profiling secret are profiled."""
+
+    def test_profile_is_written_on_request(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                PROFILING_ENABLED=True, PROFILING_SECRET='let-me-profile', PROFILING_ENGINE='cprofile',
+                PROFILING_DIR=directory):
+            # The middleware stack is built on a client's first request
+            client = APIClient()
+            client.force_authenticate(self.alice)
+            self.assertNotIn('X-Profile-Id', client.get('/api/tasks/'))
+            response = client.get('/api/tasks/', HTTP_X_PROFILE='let-me-profile')
+            self.assertEqual(response.status_code, 200)
+            profile_id = response['X-Profile-Id']
+            with open(os.path.join(directory, f'{profile_id}.json')) as summary:
+                self.assertEqual(json.load(summary)['status'], 200)
+
+            # Client-sent request ids cannot steer the profile out of the directory
+            response = client.get('/api/tasks/', HTTP_X_PROFILE='let-me-profile',
+                                  HTTP_X_REQUEST_ID='../../etc/passwd' + 'x' * 100)
+            profile_id = response['X-Profile-Id']
+            self.assertRegex(profile_id, r'^[0-9T]+-etcpasswdx{55}$')
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{profile_id}.json')))
+
+
+class TaskVersioningTests(TaskAPITestMixin, APITestCase):
+    """Writes based on an outdated version or an invalid transition get 409."""
+
+    def test_stale_if_match_is_rejected_with_the_current_task(self):
+        task = self.create_task()
+        response = self.client.patch(f'/api/tasks/{task.id}/', {'title': 'First'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual((response.status_code, response.data['version']), (200, 2))
+
+        response = self.client.patch(f'/api/tasks/{task.id}/', {'title': 'Second'}, format='json', HTTP_IF_MATCH='1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data['current']['title'], response.data['current']['version']), ('First', 2))
+
+        response = self.client.post(f'/api/tasks/{task.id}/complete/', {'version': 2}, format='json')
+        self.assertEqual((response.status_code, response.data['version']), (200, 3))
+
+    def test_invalid_if_match_is_a_bad_request(self):
+        task = self.create_task()
+        response = self.client.patch(f'/api/tasks/{task.id}/', {'title': 'x'}, format='json', HTTP_IF_MATCH='abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_blocked_task_cannot_be_completed(self):
+        task = self.create_task(status='blocked')
+        response = self.client.post(f'/api/tasks/{task.id}/complete/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['current']['status'], 'blocked')
+        response = self.client.patch(f'/api/tasks/{task.id}/', {'status': 'todo'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post(f'/api/tasks/{task.id}/complete/').status_code, 200)
+
+    def test_save_of_a_stale_instance_raises(self):
+        task = self.create_task()
+        stale = Task.objects.get(pk=task.pk)
+        task.title = 'Changed'
+        task.save()
+        stale.title = 'Overwritten'
+        with self.assertRaises(StaleTaskVersion), transaction.atomic():
+            stale.save()
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Changed')
+
+    def test_versioned_update_without_returning(self):
+        task = self.create_task()
+        with mock.patch('tasks_app.models.RETURNING_VENDORS', ()):
+            (updated,) = Task.objects.filter(pk=task.pk).update_versioned(expected_version=1, title='Changed')
+            self.assertEqual((updated.title, updated.version), ('Changed', 2))
+            with self.assertRaises(StaleTaskVersion), transaction.atomic():
+                Task.objects.filter(pk=task.pk).update_versioned(expected_version=1, title='Overwritten')
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Changed')
@@ -0,0 +1,161 @@
+"""
+In-memory directory of users for assignment lookups.
+
+``UserDirectory`` keeps every user's username, names and email in one
+process-wide index: a sorted term list for prefix search and a
+``TrigramIndex`` for fuzzy search, so approximate names coming from the LLM
+or a search box are looked up without a query. Matches are only suggested;
+tasks are assigned by exact username. It is loaded with one query on
+first use, updated in place by the User signal receivers and reloaded when
+the directory version in the shared cache was bumped by another process.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tasks_app.search import TrigramIndex, normalize
+
+DIRECTORY_VERSION_KEY = 'users:directory-version'
+
+_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email')
+
+
+def get_directory_version() -> int:
+    version = cache.get(DIRECTORY_VERSION_KEY)
+    if version is None:
+        # See tasks_app.cache.get_user_data_version
+        cache.add(DIRECTORY_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(DIRECTORY_VERSION_KEY)
+    return version
+
+
+def bump_directory_version():
+    try:
+        cache.incr(DIRECTORY_VERSION_KEY)
+    except ValueError:
+        cache.set(DIRECTORY_VERSION_KEY, time.time_ns(), None)
+
+
+def _terms(username: str, first_name: str, last_name: str, email: str) -> List[str]:
+    """Normalized strings a user can be found by, most specific first."""
+    terms = [normalize(username), normalize(email), normalize(f'{first_name} {last_name}'),
+             normalize(first_name), normalize(last_name), normalize(email.partition('@')[0])]
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+class UserDirectory:
+    """Prefix and fuzzy search over all users. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # user id -> (username, first_name, last_name, email)
+        self._users: Dict[int, Tuple[str, str, str, str]] = {}
+        self._terms: Dict[int, List[str]] = {}
+        # Sorted (term, user id) pairs for prefix search
+        self._sorted: List[Tuple[str, int]] = []
+        self._fuzzy = TrigramIndex()
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Users matching ``query`` by prefix or approximately.
+
+        Returns:
+            Up to ``limit`` user dictionaries with a ``score`` in [0, 1],
+            best first; 1 is an exact username, email or full name match
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        min_score = getattr(settings, 'USER_MATCH_THRESHOLD', 0.5)
+        self._ensure_loaded()
+        with self._lock:
+            scores: Dict[int, float] = {}
+            start = bisect_left(self._sorted, (normalized, -1))
+            for term, user_id in self._sorted[start:]:
+                if not term.startswith(normalized):
+                    break
+                # A longer typed prefix is a stronger hint
+                score = 1.0 if term == normalized else 0.7 + 0.25 * len(normalized) / len(term)
+                scores[user_id] = max(scores.get(user_id, 0), score)
+            for score, (user_id, _) in self._fuzzy.search(normalized, limit=limit * 4, min_score=min_score):
+                # Equal trigram sets are not an exact match ("0001" vs "00001")
+                scores[user_id] = max(scores.get(user_id, 0), min(score, 0.99))
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self._users[item[0]][0]))[:limit]
+            return [self._as_dict(user_id, round(score, 4)) for user_id, score in ranked]
+
+    def apply(self, user_id: int, fields: Optional[Tuple[str, str, str, str]]):
+        """
+        Update a loaded directory right after a committed write bumped the
+        directory version (``fields=None`` removes the user).
+        """
+        version = get_directory_version()
+        with self._lock:
+            if self._version is None:
+                return
+            if version != self._version + 1:
+                # Someone else changed users too: reload lazily
+                self._version = None
+                return
+            self._remove(user_id)
+            if fields is not None:
+                self._add(user_id, fields)
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def _ensure_loaded(self):
+        version = get_directory_version()
+        with self._lock:
+            if self._version == version:
+                return
+
+        from django.contrib.auth.models import User
+
+        rows = list(User.objects.order_by().values_list(*_FIELDS))
+        with self._lock:
+            self._users, self._terms, self._sorted = {}, {}, []
+            self._fuzzy = TrigramIndex()
+            for user_id, *fields in rows:
+                self._add(user_id, tuple(fields), sort=False)
+            self._sorted.sort()
+            self._version = version
+
+    def _add(self, user_id: int, fields: Tuple[str, str, str, str], sort: bool = True):
+        terms = _terms(*fields)
+        self._users[user_id] = fields
+        self._terms[user_id] = terms
+        for number, term in enumerate(terms):
+            if sort:
+                insort(self._sorted, (term, user_id))
+            else:
+                self._sorted.append((term, user_id))
+            self._fuzzy.add((user_id, number), term)
+
+    def _remove(self, user_id: int):
+        terms = self._terms.pop(user_id, None)
+        if terms is None:
+            return
+        del self._users[user_id]
+        for number, term in enumerate(terms):
+            position = bisect_left(self._sorted, (term, user_id))
+            if position < len(self._sorted) and self._sorted[position] == (term, user_id):
+                del self._sorted[position]
+            self._fuzzy.remove((user_id, number))
+
+    def _as_dict(self, user_id: int, score: float) -> Dict:
+        username, first_name, last_name, email = self._users[user_id]
+        return {
+            'id': user_id, 'username': username, 'email': email,
+            'first_name': first_name, 'last_name': last_name, 'score': score,
+        }
+
+
+user_directory = UserDirectory()
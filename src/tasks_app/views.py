@@ -1,52 +1,276 @@
+import codecs
 import json
 import logging
 from uuid import uuid4
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from django.contrib.auth.models import User
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from .models import Task
-from ai_agent import get_agent
-from ai_agent.chat_service import ChatService
-from .serializers import TaskSerializer, UserSerializer
+from task_manager.sqlite import serialized_write
+from .bulk import CONTENT_TYPES, FORMATS, TaskImporter, export_rows, format_for_content_type, read_records, render_rows
+from .cache import cache_timeout, user_cache_key
+from .due import get_digest
+from .idempotency import idempotent
+from .models import ArchivedTask, Task, TaskConflict
+from .sync import InvalidCursor, get_changes
+from .user_directory import user_directory
+from .serializers import ArchivedTaskSerializer, TaskSerializer, UserSerializer
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Create your views here.
 
 
+def _expected_version(request):
+    """
+    The task version a write is based on: the ``If-Match`` header (the
+    version, optionally quoted) or the ``version`` field of the body.
+    None when the client sent neither.
+    """
+    value = request.headers.get('If-Match')
+    if value is not None:
+        value = value.strip().removeprefix('W/').strip('"')
+    elif isinstance(request.data, dict):
+        value = request.data.get('version')
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({'version': 'A task version must be an integer.'})
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling Task CRUD operations with additional custom actions.
+
+    Users see, update and complete the tasks they created or are assigned
+    to; only the creator may reassign or delete a task (403 otherwise).
     """
     queryset = Task.objects.all().order_by('-created_at')
     serializer_class = TaskSerializer
     # Requires authentication for all actions
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        """Only tasks the user created or was assigned to."""
+        user = self.request.user
+        return (
+            Task.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+            .select_related('assigned_to', 'created_by')
+            .order_by('-created_at')
+        )
+
+    def list(self, request, *args, **kwargs):
+        """List tasks, served from the per-user cache when possible."""
+        cache_key = user_cache_key(request.user.id, 'list', request.query_params.urlencode())
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, cache_timeout())
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a task, served from the per-user cache when possible."""
+        cache_key = user_cache_key(request.user.id, 'retrieve', kwargs.get(self.lookup_field))
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().retrieve(request, *args, **kwargs)
+        cache.set(cache_key, response.data, cache_timeout())
+        return response
+
+    # Retried writes with the same Idempotency-Key are applied once
+    @idempotent('tasks')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    # Also covers partial_update, which calls update
+    @idempotent('tasks')
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except TaskConflict as e:
+            return self._conflict(e)
+
+    @idempotent('tasks')
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
     # Override the create method to set the created_by field
+    @serialized_write
     def perform_create(self, serializer):
         """Set the created_by field when creating a task."""
-        logger.info(f"Saving task for user: {self.request.user.username}")
+        logger.info("Saving task for user: %s", self.request.user.username)
         serializer.save(created_by=self.request.user)
 
+    @serialized_write
+    def perform_update(self, serializer):
+        """
+        Write only the validated columns with a compare-and-swap UPDATE, so
+        concurrent writers neither lose each other's changes nor take locks.
+        """
+        instance = serializer.instance
+        if instance.created_by_id != self.request.user.id:
+            for field in ('created_by', 'assigned_to'):
+                user = serializer.validated_data.get(field, getattr(instance, field))
+                if getattr(user, 'pk', None) != getattr(instance, f'{field}_id'):
+                    raise PermissionDenied("Only the creator of a task can reassign it.")
+        tasks = Task.objects.filter(pk=instance.pk).update_versioned(
+            _expected_version(self.request), **serializer.validated_data)
+        if not tasks:
+            raise NotFound()
+        task = tasks[0]
+        # Reuse the users we already have instead of fetching them again
+        for field in ('created_by', 'assigned_to'):
+            user = serializer.validated_data.get(field, getattr(instance, field))
+            if getattr(user, 'pk', None) == getattr(task, f'{field}_id'):
+                setattr(task, field, user)
+        serializer.instance = task
+
+    @serialized_write
+    def perform_destroy(self, instance):
+        if instance.created_by_id != self.request.user.id:
+            raise PermissionDenied("Only the creator of a task can delete it.")
+        instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync: tasks changed or removed since the given cursor.
+
+        Query parameters:
+            cursor: Cursor returned by the previous call (omit for a full sync)
+            limit: Maximum number of changes (default 100, max 500)
+        """
+        try:
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = get_changes(request.user, request.query_params.get('cursor'), limit)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def digest(self, request):
+        """
+        The user's overdue and due-soon tasks, as of the last scan.
+
+        Computed by ``manage.py scan_due_tasks``; ``as_of`` is the date the
+        digest was built for.
+        """
+        return Response(get_digest(request.user.id), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """
+        The user's archived (long completed) tasks, newest first.
+
+        Query parameters:
+            q: Only tasks with this text in the title or description
+        """
+        user = request.user
+        queryset = (
+            ArchivedTask.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+            .select_related('assigned_to', 'created_by')
+            .order_by('-created_at')
+        )
+        query = request.query_params.get('q', '').strip()
+        if query:
+            queryset = queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(ArchivedTaskSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Import tasks from a CSV or JSONL request body.
+
+        The format comes from the Content-Type (text/csv or
+        application/x-ndjson) or the ``file_format`` query parameter. Rows use
+        the export columns; ``assigned_to`` is a username. All imported tasks
+        are created by the requesting user.
+        """
+        file_format = request.query_params.get('file_format') or format_for_content_type(request.content_type)
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f"Unsupported format. Use one of: {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.stream is None:
+            return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', 500))
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Decode line by line so the body is never held in memory at once
+        stream = codecs.iterdecode(request.stream, 'utf-8')
+        try:
+            result = TaskImporter(request.user, batch_size).run(read_records(stream, file_format))
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response({'error': f'Could not read import: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(
+            "Imported %s tasks (%s failed) for user %s",
+            result['created'], result['failed'], request.user.username)
+        response_status = status.HTTP_400_BAD_REQUEST if result['failed'] and not result['created'] else status.HTTP_200_OK
+        return Response(result, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the user's tasks as CSV or JSONL (``file_format``, default jsonl)."""
+        file_format = request.query_params.get('file_format', 'jsonl')
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f"Unsupported format. Use one of: {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = request.user
+        queryset = Task.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+        response = StreamingHttpResponse(
+            render_rows(export_rows(queryset), file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{file_format}"'
+        return response
+
     # Optional: Custom action to mark a task as done
     @action(detail=True, methods=['post'])
+    @idempotent('tasks')
     def complete(self, request, pk=None):
-        """Mark a task as completed."""
+        """Mark a task as completed (``If-Match``: only at this version)."""
+        expected_version = _expected_version(request)
         try:
-            task = get_object_or_404(Task, pk=pk)
-            task.status = 'completed'
-            task.save()
+            # Single conditional UPDATE touching only status/updated_at/version
+            # Assignees may complete the tasks they see too
+            tasks = serialized_write(
+                self.get_queryset().filter(pk=pk).update_versioned
+            )(expected_version, status='done')
+            if not tasks:
+                return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            logger.info(f"Task {pk} completed by user {request.user.username}")
-            return Response({'status': 'task completed'}, status=status.HTTP_200_OK)
+            logger.info("Task %s completed by user %s", pk, request.user.username)
+            return Response({'status': 'task completed', 'version': tasks[0].version}, status=status.HTTP_200_OK)
+        except TaskConflict as e:
+            return self._conflict(e)
         except Exception as e:
-            logger.error(f"Error completing task {pk}: {str(e)}")
+            logger.error("Error completing task %s: %s", pk, e)
             return Response(
                 {'error': 'Failed to complete task'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -54,52 +278,101 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     # Optional: Custom action to assign a task by username
     @action(detail=True, methods=['post'])
+    @idempotent('tasks')
     def assign(self, request, pk=None, username=None):
-        """Assign a task to a user by username."""
+        """
+        Assign a task to a user by username (``If-Match``: only at this
+        version). Only the task's creator may reassign it.
+        """
+        expected_version = _expected_version(request)
         try:
-            task = get_object_or_404(Task, pk=pk)
             username = request.data.get('username')
             if not username:
                 return Response({'error': 'Username is required'}, status=status.HTTP_400_BAD_REQUEST)
 
             try:
                 user = User.objects.get(username=username)
-                task.assigned_to = user
-                task.save()
-                serializer = self.get_serializer(task)
-                logger.info(
-                    f"Task {pk} assigned to {username} by {request.user.username}")
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
             except User.DoesNotExist:
                 logger.warning(
-                    f"Attempted to assign task {pk} to non-existent user: {username}")
+                    "Attempted to assign task %s to non-existent user: %s", pk, username)
                 return Response(
                     {'error': f'User "{username}" does not exist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
+            tasks = serialized_write(
+                Task.objects.filter(pk=pk, created_by=request.user).update_versioned
+            )(expected_version, assigned_to=user)
+            if not tasks:
+                if self.get_queryset().filter(pk=pk).exists():
+                    return Response(
+                        {'error': 'Only the creator of a task can reassign it'},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+                return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            task = tasks[0]
+            # Reuse the users we already have instead of fetching them again
+            task.assigned_to = user
+            task.created_by = request.user
+            serializer = self.get_serializer(task)
+            logger.info(
+                "Task %s assigned to %s by %s", pk, username, request.user.username)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        except TaskConflict as e:
+            return self._conflict(e)
         except Exception as e:
-            logger.error(f"Error assigning task {pk}: {str(e)}")
+            logger.error("Error assigning task %s: %s", pk, e)
             return Response(
                 {'error': 'Failed to assign task'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _conflict(self, error: TaskConflict):
+        """409 with the task as stored, for the client to retry from."""
+        logger.info("Conflicting write by user %s: %s", self.request.user.username, error)
+        return Response(
+            {'error': str(error), 'current': self.get_serializer(error.current).data},
+            status=status.HTTP_409_CONFLICT
+        )
+
 
 class UserViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling User operations.
     """
-    queryset = User.objects.all().order_by('username')
+    # Only the serialized columns, not password hashes and the like
+    queryset = User.objects.only(*UserSerializer.Meta.fields).order_by('username')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     lookup_field = 'username'  # Allows fetching users by username
 
+    def list(self, request, *args, **kwargs):
+        """
+        List users, or search them with ``?q=``.
+
+        Query parameters:
+            q: Prefix or approximate username, name or email; the matches
+               come from the in-memory user directory, best first
+            limit: Maximum number of matches (default 10, max 50)
+        """
+        query = request.query_params.get('q')
+        if query is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        results = user_directory.search(query, limit=limit)
+        return Response({'count': len(results), 'results': results}, status=status.HTTP_200_OK)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+# Client retries of a message still being answered wait for its response
+@idempotent('chat', dedupe_identical=True)
 def chat_with_agent(request):
     """
     API endpoint to initiate a chat with the LangGraph AI agent.
@@ -109,17 +382,18 @@ def chat_with_agent(request):
         "message": "Your message here"
     }
 
-    Returns:
+    Retries that send the same ``Idempotency-Key`` header get the response
+    of the first attempt instead of running the message again.
+
+    Returns the first tool message of the turn:
     {
-        "data": [
-            {
-                "content": "...",
-                "name": "...",
-                "status": "...",
-                "tool_call_id": "..."
-            }
-        ]
+        "content": "...",
+        "name": "...",
+        "status": "...",
+        "tool_call_id": "..."
     }
+    or the last one, or {"data": [...], "truncated": false} with all of
+    them, see AI_CHAT_RESPONSE_MODE.
     """
     try:
         # Parse request data
@@ -127,7 +401,7 @@ def chat_with_agent(request):
             data = json.loads(request.body)
         except json.JSONDecodeError:
             logger.warning(
-                f"Invalid JSON received from user {request.user.username}")
+                "Invalid JSON received from user %s", request.user.username)
             return JsonResponse(
                 {"error": "Invalid JSON format"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -143,37 +417,163 @@ def chat_with_agent(request):
 
         # Initialize and use chat service
         try:
+            # Imported here: the AI stack is only loaded once chat is used
+            from ai_agent.chat_service import ChatService
+
+            from ai_agent.response import render_chat_response
+
             chat_service = ChatService()
             result = chat_service.process_chat(user_input, request.user.id)
-            # is result is list then return first element
-            if isinstance(result["data"], list):
-                if len(result["data"]) > 0:
-                    result = result["data"][0]
-                else:
-                    return JsonResponse(
-                        {"error": "No response generated by the agent"},
-                        status=status.HTTP_204_NO_CONTENT  # or 200 with an empty message
-                    )
-            return JsonResponse(result, status=status.HTTP_200_OK)
+            # First, last or all messages per AI_CHAT_RESPONSE_MODE, size capped
+            body = render_chat_response(result["data"])
+            if body is None:
+                return JsonResponse(
+                    {"error": "No response generated by the agent"},
+                    status=status.HTTP_204_NO_CONTENT  # or 200 with an empty message
+                )
+            return HttpResponse(body, content_type="application/json", status=status.HTTP_200_OK)
 
         except ValueError as e:
             logger.error(
-                f"Validation error for user {request.user.username}: {str(e)}")
+                "Validation error for user %s: %s", request.user.username, e)
             return JsonResponse(
                 {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         except Exception as e:
             logger.error(
-                f"Unexpected error in chat processing for user {request.user.username}: {str(e)}")
+                "Unexpected error in chat processing for user %s: %s", request.user.username, e)
             return JsonResponse(
                 {"error": "An unexpected error occurred while processing your request"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
     except Exception as e:
-        logger.error(f"Critical error in chat_with_agent: {str(e)}")
+        logger.error("Critical error in chat_with_agent: %s", e)
         return JsonResponse(
             {"error": "A critical error occurred"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def tool_cache_stats(request):
+    """
+    Hit counters of the agent's read tool cache in this process, per tool:
+    ``run_hits``, ``shared_hits`` (AI_TOOL_CACHE_ACROSS_RUNS), ``misses``
+    and ``hit_ratio``. ``?reset=true`` starts counting again.
+    """
+    from ai_agent.run_context import tool_cache_stats as stats
+
+    snapshot = stats.snapshot()
+    if request.query_params.get('reset', 'false').lower() == 'true':
+        stats.reset()
+    return Response(snapshot, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_health(request):
+    """
+    Health of the LLM router's models in this process, per model: breaker
+    ``state``, ``requests``, ``failures``, ``hedges`` sent to the model and
+    ``hedge_wins``, and the p50/p95 latency of recent successful requests.
+    """
+    from ai_agent.llm_health import health_snapshot
+
+    return Response(health_snapshot(), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chat_batch(request):
+    """
+    Run several chat messages concurrently and stream the results.
+
+    Expected JSON payload:
+    {
+        "messages": [
+            {"id": "optional client id", "message": "...", "username": "optional"}
+        ]
+    }
+
+    Messages run as the requesting user; staff users may set ``username``
+    to run a message as another user (integrations acting for many users).
+    One JSON line per message is streamed back as soon as it finishes:
+    {"index": 0, "id": "...", "duration_ms": 812.4, "data": [...], "truncated": false}
+    or {"index": 1, "id": "...", "error": "..."} when it failed.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=status.HTTP_400_BAD_REQUEST)
+
+    messages = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return JsonResponse({"error": "messages must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    max_messages = settings.AI_CHAT_BATCH_MAX_MESSAGES
+    if len(messages) > max_messages:
+        return JsonResponse(
+            {"error": f"At most {max_messages} messages per batch"}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(item, dict) for item in messages):
+        return JsonResponse({"error": "Every message must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+
+    usernames = {item['username'] for item in messages if item.get('username')}
+    if usernames - {request.user.username} and not request.user.is_staff:
+        return JsonResponse(
+            {"error": "Only staff users can send messages for other users"}, status=status.HTTP_403_FORBIDDEN)
+    user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    # Messages that cannot run are answered right away
+    runnable, rejected = [], []
+    for index, item in enumerate(messages):
+        username = item.get('username')
+        user_input = str(item.get('message') or '').strip()
+        if username and username not in user_ids:
+            rejected.append({"index": index, "error": f"User {username} does not exist"})
+        elif not user_input:
+            rejected.append({"index": index, "error": "Message is required and cannot be empty"})
+        else:
+            runnable.append((index, user_input, user_ids.get(username, request.user.id)))
+
+    logger.info("Chat batch of %d messages from user %s", len(messages), request.user.username)
+
+    def stream():
+        # Imported here: the AI stack is only loaded once chat is used
+        from ai_agent.chat_service import ChatService
+
+        for result in rejected:
+            yield _batch_line(result, messages)
+        if not runnable:
+            return
+        # One agent and LLM client for the whole batch
+        service = ChatService()
+        results = service.process_batch(
+            [(user_input, user_id) for _, user_input, user_id in runnable],
+            max_workers=settings.AI_CHAT_BATCH_WORKERS,
+            request_id=getattr(request, 'request_id', None),
+        )
+        try:
+            for result in results:
+                result['index'] = runnable[result['index']][0]
+                yield _batch_line(result, messages)
+        finally:
+            results.close()
+
+    return StreamingHttpResponse(stream(), content_type=CONTENT_TYPES['jsonl'], status=status.HTTP_200_OK)
+
+
+def _batch_line(result, messages) -> bytes:
+    from ai_agent.response import render_chat_response
+
+    client_id = messages[result['index']].get('id')
+    if client_id is not None:
+        result = {'index': result['index'], 'id': client_id, **result}
+    data = result.pop('data', None)
+    line = json.dumps(result, default=str).encode()
+    if data is not None:
+        # Every message of the turn, under the same size cap as a chat response
+        body = render_chat_response(data, mode='full') or b'{"data":[],"truncated":false}'
+        line = line[:-1] + b', ' + body[1:]
+    return line + b'\n'
@@ -0,0 +1,299 @@
+"""
+In-memory working set of the tasks each active user created.
+
+Agent turns read the same user's few dozen tasks over and over. With
+``AI_TASK_WORKING_SET`` set, ``TaskWorkingSet`` keeps them per process as
+compact ``TaskRecord`` objects holding the serialized field values, so the
+read tools answer without a query or a serializer pass:
+
+* a user's tasks are loaded with one query on first use and checked against
+  the user's data version (see ``tasks_app.cache``) on every read, so writes
+  of other processes make the next read reload them,
+* writes keep going to the database; the Task signal receivers then update
+  loaded records in place (``apply``), like they do for the title index,
+* users are spread over ``AI_TASK_WORKING_SET_SHARDS`` shards, each with its
+  own lock and least recently used order. Users beyond
+  ``AI_TASK_WORKING_SET_MAX_USERS`` or ``AI_TASK_WORKING_SET_MAX_TASKS``
+  records are evicted, users with more than
+  ``AI_TASK_WORKING_SET_MAX_TASKS_PER_USER`` tasks are not held at all.
+
+Every read returns None when the user's tasks are not held; callers then
+query the database as before.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from tasks_app.cache import get_user_data_version
+
+
+class TaskRecord:
+    """One task as ``TaskSerializer`` represents it."""
+
+    FIELDS = ('id', 'title', 'description', 'status', 'priority', 'due_date',
+              'assigned_to', 'assigned_to_username', 'created_by', 'created_by_username',
+              'created_at', 'updated_at', 'version')
+
+    __slots__ = FIELDS + ('sort_key',)
+
+    def __init__(self, task, created_by_username: Optional[str], assigned_to_username: Optional[str]):
+        fields = _serializer_fields()
+        self.id = task.id
+        self.title = task.title
+        self.description = task.description
+        self.status = task.status
+        self.priority = task.priority
+        self.due_date = None if task.due_date is None else fields['due_date'].to_representation(task.due_date)
+        self.assigned_to = task.assigned_to_id
+        self.assigned_to_username = assigned_to_username
+        self.created_by = task.created_by_id
+        self.created_by_username = created_by_username
+        self.created_at = fields['created_at'].to_representation(task.created_at)
+        self.updated_at = fields['updated_at'].to_representation(task.updated_at)
+        self.version = task.version
+        # Newest first, like order_by('-created_at')
+        self.sort_key = (-task.created_at.timestamp(), -task.id)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def matches(self, needle: str) -> bool:
+        """Whether the case-folded ``needle`` occurs in the title or description."""
+        return needle in self.title.casefold() or needle in self.description.casefold()
+
+
+_fields = None
+
+
+def _serializer_fields():
+    global _fields
+    if _fields is None:
+        from tasks_app.serializers import TaskSerializer
+
+        _fields = TaskSerializer().fields
+    return _fields
+
+
+class _UserTasks:
+    __slots__ = ('version', 'records', '_ordered')
+
+    def __init__(self, version, records: Optional[Dict[int, TaskRecord]]):
+        self.version = version
+        # None: the user has too many tasks to be held
+        self.records = records
+        self._ordered = None
+
+    @property
+    def size(self) -> int:
+        return len(self.records) if self.records else 0
+
+    def ordered(self) -> List[TaskRecord]:
+        if self._ordered is None:
+            self._ordered = sorted(self.records.values(), key=lambda record: record.sort_key)
+        return self._ordered
+
+    def put(self, record: TaskRecord):
+        self.records[record.id] = record
+        self._ordered = None
+
+    def remove(self, task_id: int):
+        if self.records.pop(task_id, None) is not None:
+            self._ordered = None
+
+
+class _Shard:
+    __slots__ = ('lock', 'users', 'tasks', 'hits', 'loads', 'evictions')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users: 'OrderedDict[int, _UserTasks]' = OrderedDict()
+        self.tasks = 0
+        self.hits = self.loads = self.evictions = 0
+
+
+class TaskWorkingSet:
+    """Per-user task records, sharded by user id. Thread-safe."""
+
+    def __init__(self, shards: Optional[int] = None):
+        count = shards or getattr(settings, 'AI_TASK_WORKING_SET_SHARDS', 16)
+        self._shards = [_Shard() for _ in range(count)]
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'AI_TASK_WORKING_SET', False)
+
+    def latest(self, user_id: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """The user's ``limit`` newest tasks, or None if not held."""
+        entry = self._entry(user_id)
+        if entry is None:
+            return None
+        return [record.as_dict() for record in entry.ordered()[:limit]]
+
+    def get(self, user_id: int, task_id: int) -> Optional[Dict[str, Any]]:
+        """
+        One of the user's tasks, or None if the user's tasks are not held.
+
+        Raises:
+            Task.DoesNotExist: The user's tasks are held and this is not one
+        """
+        entry = self._entry(user_id)
+        if entry is None:
+            return None
+        record = entry.records.get(task_id)
+        if record is None:
+            from tasks_app.models import Task
+
+            raise Task.DoesNotExist(f"Task {task_id} of user {user_id} does not exist")
+        return record.as_dict()
+
+    def search(self, user_id: int, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        The user's newest tasks whose title or description contains
+        ``query`` (case-insensitive), or None if not held.
+        """
+        entry = self._entry(user_id)
+        if entry is None:
+            return None
+        needle = query.casefold()
+        results = []
+        for record in entry.ordered():
+            if record.matches(needle):
+                results.append(record.as_dict())
+                if len(results) >= limit:
+                    break
+        return results
+
+    def apply(self, user_id: int, task_id: int, task=None):
+        """
+        Update a loaded user's records right after a committed write bumped
+        the user's data version (``task=None`` removes the task).
+        """
+        if not self.enabled():
+            return
+        version = get_user_data_version(user_id)
+        shard = self._shard(user_id)
+        with shard.lock:
+            entry = shard.users.get(user_id)
+            if entry is None:
+                return
+            if version != entry.version + 1:
+                # Someone else changed the user's tasks too: reload lazily
+                self._drop(shard, user_id)
+                return
+            if entry.records is not None:
+                shard.tasks -= entry.size
+                if task is None or task.created_by_id != user_id:
+                    entry.remove(task_id)
+                else:
+                    record = self._record_from_write(task, entry.records.get(task_id))
+                    if record is None:
+                        # Reload lazily rather than query for a username
+                        del shard.users[user_id]
+                        return
+                    entry.put(record)
+                shard.tasks += entry.size
+            entry.version = version
+
+    def invalidate(self, *user_ids: int):
+        for user_id in user_ids:
+            shard = self._shard(user_id)
+            with shard.lock:
+                self._drop(shard, user_id)
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.users.clear()
+                shard.tasks = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Users and records held, and hit/load/eviction counters."""
+        totals = dict.fromkeys(('users', 'tasks', 'hits', 'loads', 'evictions'), 0)
+        for shard in self._shards:
+            with shard.lock:
+                totals['users'] += len(shard.users)
+                totals['tasks'] += shard.tasks
+                totals['hits'] += shard.hits
+                totals['loads'] += shard.loads
+                totals['evictions'] += shard.evictions
+        return totals
+
+    def _shard(self, user_id: int) -> _Shard:
+        return self._shards[user_id % len(self._shards)]
+
+    def _entry(self, user_id: int) -> Optional[_UserTasks]:
+        if not self.enabled():
+            return None
+        version = get_user_data_version(user_id)
+        shard = self._shard(user_id)
+        with shard.lock:
+            entry = shard.users.get(user_id)
+            if entry is not None and entry.version == version:
+                shard.users.move_to_end(user_id)
+                shard.hits += 1
+                return entry if entry.records is not None else None
+
+        entry = _UserTasks(version, self._load(user_id))
+        with shard.lock:
+            shard.loads += 1
+            self._drop(shard, user_id)
+            shard.users[user_id] = entry
+            shard.tasks += entry.size
+            self._evict(shard, keep=user_id)
+        return entry if entry.records is not None else None
+
+    @staticmethod
+    def _load(user_id: int) -> Optional[Dict[int, TaskRecord]]:
+        from tasks_app.models import Task
+
+        max_tasks = getattr(settings, 'AI_TASK_WORKING_SET_MAX_TASKS_PER_USER', 500)
+        tasks = list(
+            Task.objects.filter(created_by_id=user_id).select_related('created_by', 'assigned_to')
+            .order_by()[:max_tasks + 1]
+        )
+        if len(tasks) > max_tasks:
+            return None
+        return {
+            task.id: TaskRecord(
+                task, task.created_by.username, task.assigned_to.username if task.assigned_to else None)
+            for task in tasks
+        }
+
+    @staticmethod
+    def _record_from_write(task, previous: Optional[TaskRecord]) -> Optional[TaskRecord]:
+        """Record of a written task, or None if a username is not at hand."""
+        usernames = []
+        for field, user_id in (('created_by', task.created_by_id), ('assigned_to', task.assigned_to_id)):
+            if user_id is None:
+                usernames.append(None)
+            elif task._meta.get_field(field).is_cached(task):
+                usernames.append(getattr(task, field).username)
+            elif previous is not None and getattr(previous, field) == user_id:
+                usernames.append(getattr(previous, f'{field}_username'))
+            else:
+                return None
+        return TaskRecord(task, *usernames)
+
+    def _evict(self, shard: _Shard, keep: int):
+        count = len(self._shards)
+        max_users = math.ceil(getattr(settings, 'AI_TASK_WORKING_SET_MAX_USERS', 1000) / count)
+        max_tasks = math.ceil(getattr(settings, 'AI_TASK_WORKING_SET_MAX_TASKS', 100000) / count)
+        while len(shard.users) > max_users or shard.tasks > max_tasks:
+            user_id = next(iter(shard.users))
+            if user_id == keep:
+                break
+            self._drop(shard, user_id)
+            shard.evictions += 1
+
+    @staticmethod
+    def _drop(shard: _Shard, user_id: int):
+        entry = shard.users.pop(user_id, None)
+        if entry is not None:
+            shard.tasks -= entry.size
+
+
+task_working_set = TaskWorkingSet()